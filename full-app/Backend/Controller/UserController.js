@@ -13,6 +13,12 @@ const EmailService = require('../services/emailService');
 
 const JWT_SECRET = process.env.JWT_SECRET || 'default_secret_key';
 
+// === Précalculer l'embedding de la photo de visage côté service IA ===
+const enrollFace = (userId) => {
+  axios.post('http://localhost:5000/api/enroll-face', { user_id: userId.toString() })
+    .catch(err => console.error('Face enrollment error:', err.message));
+};
+
 // === Générer un token JWT ===
 const generateToken = (user) => {
   return jwt.sign({ id: user._id, role: user.role }, JWT_SECRET, { expiresIn: '1d' });
@@ -114,6 +120,8 @@ exports.createUser = async (req, res) => {
       faceIdPhoto,
     });
 
+    if (faceIdPhoto) enrollFace(user._id);
+
     res.status(201).json({
       message: 'User created successfully',
       user: { id: user._id, email: user.email, role: user.role },
@@ -228,6 +236,8 @@ exports.updateUser = [
 
       if (!user) return res.status(404).json({ error: 'Utilisateur non trouvé' });
 
+      if (updates.faceIdPhoto) enrollFace(user._id);
+
       res.status(200).json({ message: 'Utilisateur mis à jour', user });
     } catch (err) {
       console.error('Error updating user:', err);
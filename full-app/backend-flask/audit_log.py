@@ -0,0 +1,202 @@
+# audit_log.py
+"""Journal des tentatives de connexion, hors des documents utilisateur.
+
+Chaque tentative est un document de la collection loginAttempts, indexée
+par (userId, timestamp) et purgée par un index TTL après
+AUDIT_RETENTION_DAYS jours. Les écritures passent par un thread qui les
+regroupe en insert_many : la réponse HTTP n'attend pas Mongo.
+
+Migration des anciens tableaux users.loginAttempts (rejouable ; les
+tentatives hors rétention ne sont pas copiées) :
+    python audit_log.py migrate [--dry-run]
+"""
+import argparse
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+AUDIT_COLLECTION = "loginAttempts"
+AUDIT_RETENTION_DAYS = int(os.environ.get("AUDIT_RETENTION_DAYS", 90))
+MAX_QUERY_LIMIT = 500
+
+
+def index_specs(retention_days=AUDIT_RETENTION_DAYS):
+    """(collection, clés, options) des index de la collection d'audit, créés par mongo_setup.ensure_indexes."""
+    specs = [(AUDIT_COLLECTION, [("userId", ASCENDING), ("timestamp", DESCENDING)], {"name": "userId_1_timestamp_-1"})]
+    if retention_days > 0:
+        specs.append((AUDIT_COLLECTION, [("timestamp", ASCENDING)], {
+            "name": "timestamp_1", "expireAfterSeconds": retention_days * 86400
+        }))
+    return specs
+
+
+class AuditWriter:
+    """Écrit les tentatives par lots depuis un thread dédié.
+
+    Un lot part dès que `batch_size` entrées sont en attente ou après
+    `flush_interval` secondes. Si la file est pleine (Mongo indisponible),
+    les entrées sont abandonnées et comptées dans `dropped` plutôt que de
+    bloquer la requête.
+    """
+
+    def __init__(self, collection, batch_size=100, flush_interval=1.0, max_pending=10000):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, user_id, success, ip=None, method="face", **extra):
+        entry = {
+            "userId": str(user_id),
+            "timestamp": datetime.utcnow(),
+            "success": bool(success),
+            "ip": ip,
+            "method": method
+        }
+        entry.update(extra)
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self, timeout=5.0):
+        """Attend que les entrées en file soient écrites (arrêt, benchmarks), au plus `timeout` secondes."""
+        deadline = time.monotonic() + timeout
+        try:
+            # File pleine (Mongo bloqué) : ne pas bloquer l'arrêt du processus
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks and time.monotonic() < deadline:
+                self._queue.all_tasks_done.wait(deadline - time.monotonic())
+
+    def close(self):
+        if self._thread.is_alive():
+            self.flush()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                entry = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                entry = False
+            if entry:
+                batch.append(entry)
+            # None : demande de vidage immédiat
+            if batch and (entry is None or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+                batch = []
+            if entry is None:
+                self._queue.task_done()
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+    def _write(self, batch):
+        try:
+            self.collection.insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except Exception as e:
+            print(f"Erreur d'écriture du journal d'audit ({len(batch)} entrées perdues) : {e}")
+            self.dropped += len(batch)
+
+
+def recent_attempts(collection, user_id, limit=50, before=None, success=None):
+    """Tentatives les plus récentes d'un utilisateur, de la plus récente à la plus ancienne."""
+    query = {"userId": str(user_id)}
+    if before is not None:
+        query["timestamp"] = {"$lt": before}
+    if success is not None:
+        query["success"] = success
+    # Les champs de migration (migrated, sourceIndex) ne font pas partie de la réponse
+    cursor = collection.find(query, {"_id": 0, "userId": 0, "migrated": 0, "sourceIndex": 0}).sort("timestamp", DESCENDING)
+    return list(cursor.limit(min(limit, MAX_QUERY_LIMIT)))
+
+
+# =============================
+#   MIGRATION
+# =============================
+def migrate_embedded_attempts(users_collection, audit_collection, batch_size=500, dry_run=False,
+                              retention_days=AUDIT_RETENTION_DAYS):
+    """Déplace les tableaux users.loginAttempts vers la collection d'audit.
+
+    Chaque utilisateur est traité séparément : ses tentatives sont écrites,
+    puis le tableau est retiré du document. Les écritures sont des upserts
+    sur (userId, position dans le tableau) : relancer la migration après une
+    interruption, même entre l'écriture et le retrait du tableau, ne crée pas
+    de doublon. Les tentatives plus anciennes que la rétention seraient
+    purgées par l'index TTL dès leur insertion : elles ne sont pas copiées.
+    Retourne (utilisateurs migrés, tentatives déplacées, tentatives expirées).
+    """
+    users = users_collection.find(
+        {"loginAttempts": {"$exists": True}},
+        {"loginAttempts": 1}
+    ).batch_size(batch_size)
+    cutoff = datetime.utcnow() - timedelta(days=retention_days) if retention_days > 0 else None
+
+    migrated_users = moved = expired = 0
+    for user in users:
+        operations = []
+        for index, attempt in enumerate(user.get("loginAttempts") or []):
+            if not isinstance(attempt, dict):
+                continue
+            timestamp = attempt.get("timestamp")
+            if cutoff is not None and isinstance(timestamp, datetime) and timestamp < cutoff:
+                expired += 1
+                continue
+            key = {"userId": str(user["_id"]), "migrated": True, "sourceIndex": index}
+            operations.append(UpdateOne(key, {"$setOnInsert": {
+                "timestamp": timestamp or datetime.utcnow(),
+                "success": bool(attempt.get("success")),
+                "ip": attempt.get("ip"),
+                "method": attempt.get("method", "face")
+            }}, upsert=True))
+
+        if not dry_run:
+            for i in range(0, len(operations), batch_size):
+                audit_collection.bulk_write(operations[i:i + batch_size], ordered=False)
+            users_collection.update_one({"_id": user["_id"]}, {"$unset": {"loginAttempts": ""}})
+        migrated_users += 1
+        moved += len(operations)
+    return migrated_users, moved, expired
+
+
+if __name__ == '__main__':
+    from mongo_setup import create_client, ensure_indexes
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--mongo-uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="dashboardDB")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="compter sans rien modifier")
+    args = parser.parse_args()
+
+    db = create_client(args.mongo_uri)[args.db]
+    if not args.dry_run:
+        ensure_indexes(db, [AUDIT_COLLECTION])
+    users_count, attempts_count, expired_count = migrate_embedded_attempts(
+        db["users"], db[AUDIT_COLLECTION], args.batch_size, args.dry_run
+    )
+    action = "à migrer" if args.dry_run else "migrées"
+    print(f"{attempts_count} tentative(s) {action} pour {users_count} utilisateur(s), "
+          f"{expired_count} plus ancienne(s) que {AUDIT_RETENTION_DAYS} jours ignorée(s).")
@@ -0,0 +1,327 @@
+# benchmarks/bench_backend.py
+"""Benchmarks reproductibles des chemins critiques du backend Flask.
+
+Cas mesurés :
+- /api/verify : décodage, détection, inférence, puis bout en bout ;
+- /api/predict-failure et /api/predict-machine-failure avec 10, 1k et 100k
+  documents de métriques ;
+- /api/predict-fleet sur 100 machines (avec --mongo-uri uniquement) ;
+- débit d'ingestion de /api/machine-metrics.
+
+Par défaut, MongoDB est remplacé en mémoire par mongomock. Avec --mongo-uri,
+les données sont écrites dans une base dédiée (benchmarkDB), jamais dans
+dashboardDB. Les images de visage sont synthétiques, générées à partir
+d'une graine fixe.
+
+Exemples :
+    python benchmarks/bench_backend.py --output results.json
+    python benchmarks/bench_backend.py --baseline results.json --tolerance 0.2
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_DB = "benchmarkDB"
+
+
+# =============================
+#   MESURES
+# =============================
+def summarize(samples, total_seconds=None):
+    """Percentiles (ms) d'une série de durées en secondes."""
+    ms = np.asarray(samples) * 1000
+    result = {
+        'n': len(ms),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p90_ms': round(float(np.percentile(ms, 90)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'min_ms': round(float(ms.min()), 3),
+        'max_ms': round(float(ms.max()), 3)
+    }
+    if total_seconds:
+        result['throughput_per_s'] = round(len(ms) / total_seconds, 1)
+    return result
+
+
+def measure(fn, iterations, warmup=3):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, time.perf_counter() - start)
+
+
+# =============================
+#   DONNÉES SYNTHÉTIQUES
+# =============================
+def synthetic_face(seed, size=(480, 640)):
+    """Image BGR d'un visage schématique (ovale, yeux, bouche) sur fond bruité."""
+    rng = np.random.default_rng(seed)
+    h, w = size
+    img = rng.integers(60, 120, (h, w, 3), dtype=np.uint8)
+    center = (w // 2 + int(rng.integers(-20, 20)), h // 2)
+    axes = (w // 8, h // 5)
+    skin = tuple(int(c) for c in rng.integers(150, 220, 3))
+    cv2.ellipse(img, center, axes, 0, 0, 360, skin, -1)
+    for dx in (-axes[0] // 2, axes[0] // 2):
+        cv2.circle(img, (center[0] + dx, center[1] - axes[1] // 4), axes[0] // 6, (40, 40, 40), -1)
+    cv2.ellipse(img, (center[0], center[1] + axes[1] // 2), (axes[0] // 2, axes[1] // 8), 0, 0, 180, (60, 40, 120), -1)
+    return cv2.GaussianBlur(img, (5, 5), 0)
+
+
+def seed_dashboards(collection, count):
+    now = datetime.utcnow()
+    rng = np.random.default_rng(count)
+    collection.delete_many({})
+    docs = [{
+        'timestamp': now - timedelta(seconds=2 * i),
+        'cpu': float(rng.uniform(0, 100)),
+        'ram': float(rng.uniform(0, 100)),
+        'disk': float(rng.uniform(0, 100)),
+        'battery': float(rng.uniform(0, 100)),
+        'charging': bool(rng.integers(0, 2))
+    } for i in range(count)]
+    for i in range(0, count, 10000):
+        collection.insert_many(docs[i:i + 10000])
+
+
+def seed_machine_metrics(collection, machine_id, components, count):
+    now = time.time()
+    rng = np.random.default_rng(count)
+    collection.delete_many({})
+    docs = []
+    for i in range(count):
+        doc = {'machineId': machine_id, 'timestamp': now - 2 * i}
+        doc.update({name: float(rng.uniform(0, 100)) for name in components})
+        docs.append(doc)
+    for i in range(0, count, 10000):
+        collection.insert_many(docs[i:i + 10000])
+
+
+# =============================
+#   CAS DE BENCHMARK
+# =============================
+def bench_verify(app, iterations):
+    import face_pipeline
+    from face_embeddings import compute_embedding
+
+    results = {}
+    frame = synthetic_face(0)
+    ok, jpeg = cv2.imencode('.jpg', frame)
+    jpeg = jpeg.tobytes()
+    frame_base64 = base64.b64encode(jpeg).decode()
+
+    results['verify.decode_base64'] = measure(
+        lambda: face_pipeline.decode_frame(base64.b64decode(frame_base64), 1), iterations)
+    results['verify.decode_raw'] = measure(lambda: face_pipeline.decode_frame(jpeg, 1), iterations)
+    results['verify.decode_reduced_2'] = measure(lambda: face_pipeline.decode_frame(jpeg, 2), iterations)
+
+    cascade = face_pipeline.load_cascade()
+    results['verify.detect'] = measure(lambda: face_pipeline.detect_first_face(frame, cascade), iterations)
+
+    face_region = frame[120:360, 200:440]
+    results['verify.infer'] = measure(lambda: compute_embedding(face_region), max(iterations // 5, 5))
+
+    # Bout en bout : utilisateur et photo de référence dans un répertoire temporaire
+    reference_dir = tempfile.mkdtemp(prefix="bench_faces_")
+    cv2.imwrite(os.path.join(reference_dir, "reference.jpg"), synthetic_face(1))
+    app.config["FACE_IMAGE_ROOT"] = reference_dir
+    user_id = app.extensions["face_auth"].users_collection.insert_one({'faceIdPhoto': '/reference.jpg'}).inserted_id
+
+    client = app.test_client()
+    results['verify.end_to_end_json'] = measure(lambda: client.post(
+        '/api/verify', json={'user_id': str(user_id), 'frame': frame_base64}), max(iterations // 5, 5))
+    results['verify.end_to_end_raw'] = measure(lambda: client.post(
+        f'/api/verify?user_id={user_id}', data=jpeg, content_type='image/jpeg'), max(iterations // 5, 5))
+    return results
+
+
+def bench_predict_failure(app, sizes, iterations):
+    results = {}
+    client = app.test_client()
+    for size in sizes:
+        seed_dashboards(app.extensions["mongo_client"][BENCH_DB]["dashboards"], size)
+        results[f'predict_failure.docs_{size}'] = measure(
+            lambda: client.get('/api/predict-failure'), iterations)
+    return results
+
+
+def bench_predict_machine_failure(app, sizes, iterations):
+    from metric_store import MachineMetricStore
+
+    results = {}
+    state = app.extensions["machine_state"]
+    components = ['cpu', 'ram', 'disk', 'temperature', 'vibration']
+    machine_id = state.machines_collection.insert_one({
+        'name': 'bench-machine',
+        'components': [{'name': name, 'unit': '%'} for name in components]
+    }).inserted_id
+    client = app.test_client()
+    url = f'/api/predict-machine-failure?machineId={machine_id}'
+
+    for size in sizes:
+        seed_machine_metrics(state.metrics_collection, str(machine_id), components, size)
+        state.metric_store = MachineMetricStore(window_size=50)
+        start = time.perf_counter()
+        state.metric_store.rebuild(state.metrics_collection)
+        results[f'predict_machine_failure.rebuild_{size}'] = summarize([time.perf_counter() - start])
+
+        # Sans cache (TTL négatif) puis avec cache
+        state.prediction_cache.ttl = -1
+        results[f'predict_machine_failure.uncached_{size}'] = measure(lambda: client.get(url), iterations)
+        state.prediction_cache.ttl = 300
+        results[f'predict_machine_failure.cached_{size}'] = measure(lambda: client.get(url), iterations)
+    return results
+
+
+def bench_predict_fleet(app, sizes, iterations, machine_count=100):
+    """/api/predict-fleet : `size` métriques réparties sur `machine_count` machines.
+
+    L'agrégation ($lookup avec pipeline, $type) n'est pas prise en charge
+    par mongomock : ce cas ne tourne qu'avec --mongo-uri.
+    """
+    if "mongomock" in type(app.extensions["mongo_client"]).__module__:
+        print("predict_fleet ignoré : nécessite --mongo-uri (MongoDB 5.0+)")
+        return {}
+
+    results = {}
+    state = app.extensions["machine_state"]
+    components = ['cpu', 'ram', 'disk', 'temperature', 'vibration']
+    state.machines_collection.delete_many({})
+    machine_ids = state.machines_collection.insert_many([{
+        'name': f'bench-machine-{i}',
+        'status': 'active',
+        'components': [{'name': name, 'unit': '%'} for name in components]
+    } for i in range(machine_count)]).inserted_ids
+    client = app.test_client()
+
+    for size in sizes:
+        per_machine = max(size // machine_count, 1)
+        state.metrics_collection.delete_many({})
+        rng = np.random.default_rng(size)
+        now = time.time()
+        docs = [{
+            'machineId': str(machine_id), 'timestamp': now - 2 * i,
+            **{name: float(rng.uniform(0, 100)) for name in components}
+        } for machine_id in machine_ids for i in range(per_machine)]
+        for i in range(0, len(docs), 10000):
+            state.metrics_collection.insert_many(docs[i:i + 10000])
+        results[f'predict_fleet.machines_{machine_count}.docs_{size}'] = measure(
+            lambda: client.get('/api/predict-fleet?pageSize=500'), iterations)
+    return results
+
+
+def bench_ingest(app, count):
+    client = app.test_client()
+    app.extensions["machine_state"].metrics_collection.delete_many({})
+    rng = np.random.default_rng(42)
+    payloads = [{
+        'machineId': f'bench-{i % 100}',
+        'cpu': float(rng.uniform(0, 100)),
+        'ram': float(rng.uniform(0, 100)),
+        'disk': float(rng.uniform(0, 100))
+    } for i in range(count)]
+    it = iter(payloads)
+    return {'ingest.machine_metrics': measure(
+        lambda: client.post('/api/machine-metrics', json=next(it)), count - 3, warmup=3)}
+
+
+# =============================
+#   RÉGRESSIONS
+# =============================
+def compare(results, baseline, tolerance, metric='p50_ms'):
+    """Liste des cas dont le percentile dépasse la référence de plus de `tolerance`."""
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if not reference or metric not in reference or metric not in current:
+            continue
+        if reference[metric] > 0 and current[metric] > reference[metric] * (1 + tolerance):
+            regressions.append((name, reference[metric], current[metric]))
+    return regressions
+
+
+def load_app(mongo_uri):
+    """Crée une application avec tous les blueprints, rattachée à la base de benchmark."""
+    if mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(mongo_uri)
+    else:
+        import mongomock
+        client = mongomock.MongoClient()
+        # mongomock n'est pas sûr entre threads : pas de suivi des écritures externes
+        os.environ.setdefault("METRICS_SYNC_INTERVAL", "0")
+    client.drop_database(BENCH_DB)
+
+    from services import create_app
+    return create_app(config={"DB_NAME": BENCH_DB}, service_name="benchmark", mongo_client=client)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", help="MongoDB local (sinon mongomock en mémoire)")
+    parser.add_argument("--sizes", default="10,1000,100000", help="tailles des jeux de métriques")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--ingest-count", type=int, default=2000)
+    parser.add_argument("--only", choices=["verify", "predict", "ingest"], action="append",
+                        help="limiter aux cas indiqués (répétable)")
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    parser.add_argument("--baseline", help="résultats de référence pour détecter les régressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="écart toléré sur p50 (0.2 = +20 %%)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    only = set(args.only or ["verify", "predict", "ingest"])
+    app = load_app(args.mongo_uri)
+
+    results = {}
+    if "verify" in only:
+        results.update(bench_verify(app, args.iterations))
+    if "predict" in only:
+        results.update(bench_predict_failure(app, sizes, args.iterations))
+        results.update(bench_predict_machine_failure(app, sizes, args.iterations))
+        results.update(bench_predict_fleet(app, sizes, args.iterations))
+    if "ingest" in only:
+        results.update(bench_ingest(app, args.ingest_count))
+
+    report = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'backend': 'mongodb' if args.mongo_uri else 'mongomock',
+        'results': results
+    }
+    for name, stats in results.items():
+        print(f"{name:50s} p50={stats['p50_ms']:>10.3f}ms p99={stats['p99_ms']:>10.3f}ms")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for name, before, after in regressions:
+            print(f"RÉGRESSION {name}: p50 {before:.3f}ms -> {after:.3f}ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/bench_startup.py
+"""Temps de démarrage et mémoire (RSS) selon les blueprints chargés.
+
+Chaque configuration est mesurée dans un interpréteur neuf : import du
+paquet services, puis create_app(). Le pool d'inférence n'est pas démarré
+(ses workers sont des processus séparés) ; la colonne « lourds » indique
+si OpenCV, DeepFace ou TensorFlow ont été importés.
+
+Exemples :
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --mongo-uri mongodb://localhost:27017 --repeat 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGURATIONS = {
+    "face_auth": ["face_auth"],
+    "recognition": ["recognition"],
+    "dashboard": ["dashboard"],
+    "prediction": ["prediction"],
+    "ingest": ["ingest"],
+    "app.py": ["face_auth", "recognition", "dashboard"],
+    "machine_failure_predictor.py": ["prediction", "ingest"],
+    "all": ["face_auth", "recognition", "dashboard", "prediction", "ingest"],
+}
+
+HEAVY_MODULES = ("cv2", "deepface", "tensorflow")
+
+# Exécuté dans un interpréteur neuf ; mongomock est importé avant la mesure
+CHILD = """
+import json, sys, time
+import psutil
+blueprints, mongo_uri = json.loads(sys.argv[1]), sys.argv[2]
+client = None
+if not mongo_uri:
+    import mongomock
+    client = mongomock.MongoClient()
+baseline = psutil.Process().memory_info().rss
+start = time.perf_counter()
+from services import create_app
+imported = time.perf_counter()
+create_app(blueprints, config={"INFERENCE_PRELOAD": False, "MONGO_URI": mongo_uri or "mongodb://localhost:27017",
+                               "DB_NAME": "benchmarkDB"}, mongo_client=client)
+created = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "create_ms": (created - imported) * 1000,
+    "rss_mb": psutil.Process().memory_info().rss / 2**20,
+    "rss_delta_mb": (psutil.Process().memory_info().rss - baseline) / 2**20,
+    "heavy": [name for name in %r if name in sys.modules]
+}))
+""" % (HEAVY_MODULES,)
+
+
+def measure(blueprints, mongo_uri, repeat):
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD, json.dumps(blueprints), mongo_uri or ""],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        # La dernière ligne est le résultat (les services peuvent écrire avant)
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "blueprints": blueprints,
+        "import_ms": round(statistics.median(r["import_ms"] for r in runs), 1),
+        "create_ms": round(statistics.median(r["create_ms"] for r in runs), 1),
+        "rss_mb": round(statistics.median(r["rss_mb"] for r in runs), 1),
+        "rss_delta_mb": round(statistics.median(r["rss_delta_mb"] for r in runs), 1),
+        "heavy": runs[-1]["heavy"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", help="MongoDB local (sinon mongomock en mémoire)")
+    parser.add_argument("--repeat", type=int, default=3, help="mesures par configuration (médiane)")
+    parser.add_argument("--only", choices=sorted(CONFIGURATIONS), action="append")
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'configuration':30s} {'import':>9s} {'create':>9s} {'RSS':>8s} {'ΔRSS':>8s}  lourds")
+    for name in args.only or CONFIGURATIONS:
+        result = results[name] = measure(CONFIGURATIONS[name], args.mongo_uri, args.repeat)
+        print(f"{name:30s} {result['import_ms']:>7.1f}ms {result['create_ms']:>7.1f}ms "
+              f"{result['rss_mb']:>6.1f}Mo {result['rss_delta_mb']:>6.1f}Mo  {', '.join(result['heavy']) or '-'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
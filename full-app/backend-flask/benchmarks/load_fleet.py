@@ -0,0 +1,628 @@
+# benchmarks/load_fleet.py
+"""Simulateur de flotte pour la chaîne d'ingestion des métriques.
+
+Des milliers de machines virtuelles publient des échantillons au format de
+metrics_publisher.py (JSON ou compact), en MQTT vers le broker lu par
+mqtt_bridge.py ou directement en HTTP sur /api/machine-metrics. Chaque
+machine suit une trajectoire : stable, montée vers la panne ou en rafales.
+Pendant l'envoi, des sondes interrogent /api/predict-machine-failure et
+/api/predict-fleet.
+
+Pour chaque taille de flotte, le rapport donne :
+- la latence d'ingestion de bout en bout (HTTP : aller-retour de la requête,
+  insertion et recalcul compris ; MQTT : de l'envoi à l'apparition du
+  document dans Mongo, à l'intervalle de sondage près) ;
+- les échantillons perdus : envois en erreur, échéances manquées parce que
+  la machine attendait encore la réponse précédente, documents jamais
+  arrivés dans Mongo (MQTT) ;
+- la latence des endpoints de prédiction, sur des réponses non vides
+  (une prédiction vide signifie que le service n'a pas vu les métriques de
+  la machine : elle est comptée à part et signalée) ;
+- le retard du générateur lui-même : s'il grimpe, c'est le simulateur qui
+  sature, pas le service.
+
+Les machines simulées sont créées dans une base dédiée (loadtestDB), jamais
+dans dashboardDB, et supprimées à la fin (sauf --keep). Les services et le
+pont doivent donc tourner avec DB_NAME=loadtestDB.
+
+Exemples :
+    DB_NAME=loadtestDB python machine_failure_predictor.py
+    python benchmarks/load_fleet.py --transport http --fleet-sizes 100,1000,5000
+
+    DB_NAME=loadtestDB python mqtt_bridge.py --broker localhost
+    python benchmarks/load_fleet.py --transport mqtt --broker localhost --payload compact
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import numpy as np
+from bson.objectid import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOAD_DB = "loadtestDB"
+TOPIC_PREFIX = "system/metrics"
+PROFILES = ("steady", "ramp", "bursty")
+COMPONENTS = [
+    {"name": "cpu", "type": "processor"},
+    {"name": "ram", "type": "memory"},
+    {"name": "disk", "type": "storage"},
+    {"name": "gpu", "type": "processor"},
+]
+
+
+# =============================
+#   TRAJECTOIRES
+# =============================
+class Steady:
+    """Valeur qui oscille autour d'un niveau de base (retour à la moyenne)."""
+
+    def __init__(self, rng, base, noise=3.0):
+        self.rng = rng
+        self.base = base
+        self.noise = noise
+        self.value = base
+
+    def level(self, elapsed):
+        return self.base
+
+    def next(self, elapsed):
+        self.value += 0.3 * (self.level(elapsed) - self.value) + self.rng.gauss(0, self.noise)
+        self.value = min(max(self.value, 0.0), 100.0)
+        return self.value
+
+
+class RampToFailure(Steady):
+    """Stable pendant `delay` secondes, puis montée linéaire jusqu'à 100 en `duration` secondes."""
+
+    def __init__(self, rng, base, delay, duration, noise=2.0):
+        super().__init__(rng, base, noise)
+        self.delay = delay
+        self.duration = max(duration, 1e-6)
+
+    def level(self, elapsed):
+        progress = min(max((elapsed - self.delay) / self.duration, 0.0), 1.0)
+        return self.base + (100 - self.base) * progress
+
+
+class Bursty(Steady):
+    """Niveau de base avec des pics aléatoires (en moyenne `rate` pics par minute)."""
+
+    def __init__(self, rng, base, rate, burst_seconds, interval, noise=3.0):
+        super().__init__(rng, base, noise)
+        self.probability = rate * interval / 60
+        self.burst_seconds = burst_seconds
+        self.burst_level = base
+        self.burst_until = -1.0
+
+    def level(self, elapsed):
+        if elapsed >= self.burst_until and self.rng.random() < self.probability:
+            self.burst_until = elapsed + self.rng.uniform(0.5, 1.5) * self.burst_seconds
+            self.burst_level = self.rng.uniform(85, 100)
+        return self.burst_level if elapsed < self.burst_until else self.base
+
+
+class VirtualMachine:
+    """Machine simulée : échantillons au format de metrics_publisher.py."""
+
+    def __init__(self, machine_id, profile, rng, args):
+        self.id = machine_id
+        self.profile = profile
+        self.rng = rng
+        self.encoder = None
+
+        def trajectory(base):
+            if profile == "ramp":
+                delay = rng.uniform(0, args.ramp_seconds / 2)
+                return RampToFailure(rng, base, delay, args.ramp_seconds)
+            if profile == "bursty":
+                return Bursty(rng, base, args.burst_rate, args.burst_seconds, args.interval)
+            return Steady(rng, base)
+
+        self.trajectories = {
+            "cpu": trajectory(rng.uniform(10, 40)),
+            "ram": trajectory(rng.uniform(30, 60)),
+            "gpu": trajectory(rng.uniform(0, 30)),
+            "gpuMem": trajectory(rng.uniform(10, 40)),
+        }
+        # Le disque se remplit lentement, la batterie suit le secteur
+        self.disk = Steady(rng, rng.uniform(20, 70), noise=0.1)
+        self.battery = Steady(rng, rng.uniform(60, 100), noise=0.5)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def sample(self, elapsed, interval):
+        metrics = {name: round(t.next(elapsed), 1) for name, t in self.trajectories.items()}
+        sent_rate = self.rng.uniform(1e4, 1e6) * (1 + metrics["cpu"] / 50)
+        received_rate = self.rng.uniform(1e4, 5e6)
+        self.bytes_sent += int(sent_rate * interval)
+        self.bytes_received += int(received_rate * interval)
+        metrics.update({
+            "disk": round(self.disk.next(elapsed), 1),
+            "bytesSent": self.bytes_sent,
+            "bytesReceived": self.bytes_received,
+            "bytesSentPerSec": round(sent_rate, 1),
+            "bytesReceivedPerSec": round(received_rate, 1),
+            "battery": round(self.battery.next(elapsed), 1),
+            "charging": True,
+            "collectorMs": round(self.rng.uniform(0.2, 2.0), 3),
+            "collectorCpuPercent": round(self.rng.uniform(0.1, 1.0), 3),
+            "timestamp": time.time(),
+            "bufferDepth": 0,
+            "replayLagSeconds": 0.0,
+        })
+        return metrics
+
+
+def parse_mix(mix):
+    """'steady=0.8,ramp=0.1,bursty=0.1' -> (profils, poids)."""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name not in PROFILES:
+            raise argparse.ArgumentTypeError(f"profil inconnu : {name} (attendu : {', '.join(PROFILES)})")
+        weights[name] = float(weight or 1)
+    return list(weights), list(weights.values())
+
+
+def build_fleet(machine_ids, args):
+    profiles, weights = parse_mix(args.mix)
+    fleet = []
+    for i, machine_id in enumerate(machine_ids):
+        rng = random.Random(args.seed * 1000003 + i)
+        fleet.append(VirtualMachine(machine_id, rng.choices(profiles, weights)[0], rng, args))
+    return fleet
+
+
+# =============================
+#   MESURES
+# =============================
+def summarize(samples):
+    """Percentiles (ms) d'une série de durées en secondes."""
+    if not samples:
+        return None
+    ms = np.asarray(samples) * 1000
+    return {
+        'n': len(ms),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p90_ms': round(float(np.percentile(ms, 90)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms.max()), 3)
+    }
+
+
+class StageStats:
+    def __init__(self):
+        self.sent = 0
+        self.errors = 0
+        self.missed = 0
+        self.observed = 0
+        self.ingest = []
+        self.generator_lag = []
+        self.probes = {"machine": [], "fleet": []}
+        self.probe_errors = 0
+        self.probe_empty = 0
+
+    def report(self, fleet_size, seconds, transport):
+        # MQTT : un échantillon publié mais jamais arrivé dans Mongo est perdu
+        lost = self.sent - self.observed if transport == "mqtt" else 0
+        dropped = self.errors + self.missed + max(lost, 0)
+        expected = self.sent + self.errors + self.missed
+        return {
+            'fleet_size': fleet_size,
+            'sent_per_s': round(self.sent / seconds, 1),
+            'sent': self.sent,
+            'errors': self.errors,
+            'missed': self.missed,
+            'lost': max(lost, 0),
+            'dropped': dropped,
+            'dropped_percent': round(100 * dropped / expected, 2) if expected else 0.0,
+            'ingest_latency': summarize(self.ingest),
+            'generator_lag': summarize(self.generator_lag),
+            'predict_machine': summarize(self.probes["machine"]),
+            'predict_fleet': summarize(self.probes["fleet"]),
+            'probe_errors': self.probe_errors,
+            'probe_empty': self.probe_empty
+        }
+
+
+# =============================
+#   TRANSPORTS
+# =============================
+class HttpConnection:
+    """Connexion HTTP/1.1 minimale (keep-alive si le serveur l'accepte), sans dépendance."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = body.encode() if isinstance(body, str) else (body or b'')
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        self.writer.write(head.encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connexion fermée par le serveur")
+        version, status = status_line.split(b' ', 2)[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            data = b''
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                data += await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif 'content-length' in headers:
+            data = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            data = await self.reader.read()
+            headers['connection'] = 'close'
+
+        keep_alive = version == b'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        return int(status), data, keep_alive
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class HttpClient:
+    """Au plus `connections` requêtes simultanées, connexions réutilisées."""
+
+    def __init__(self, url, connections, timeout):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(connections)
+        self._idle = []
+
+    async def request(self, method, path, body=None):
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else HttpConnection(self.host, self.port)
+            try:
+                status, data, keep_alive = await asyncio.wait_for(connection.request(method, path, body), self.timeout)
+            except BaseException:
+                connection.close()
+                raise
+            if keep_alive:
+                self._idle.append(connection)
+            else:
+                connection.close()
+            return status, data
+
+    def close(self):
+        for connection in self._idle:
+            connection.close()
+        self._idle.clear()
+
+
+class HttpTransport:
+    """Envoi direct sur /api/machine-metrics ; la latence d'ingestion est l'aller-retour."""
+
+    name = "http"
+
+    def __init__(self, args):
+        self.client = HttpClient(args.url, args.connections, args.timeout)
+
+    async def send(self, vm, sample, stats):
+        start = time.perf_counter()
+        try:
+            status, _ = await self.client.request("POST", "/api/machine-metrics", json.dumps({**sample, "machineId": vm.id}))
+        except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            stats.errors += 1
+            return
+        if status == 200:
+            stats.sent += 1
+            stats.ingest.append(time.perf_counter() - start)
+        else:
+            stats.errors += 1
+
+    async def drain(self, stats, timeout):
+        # Les requêtes sont synchrones : tout échantillon accepté est déjà en base
+        stats.observed = stats.sent
+
+    def close(self):
+        self.client.close()
+
+
+class MqttTransport:
+    """Publication MQTT (un topic par machine, comme metrics_publisher.py).
+
+    La latence de bout en bout est mesurée en relisant les documents écrits
+    par mqtt_bridge.py dans Mongo.
+    """
+
+    name = "mqtt"
+
+    def __init__(self, args, db):
+        import paho.mqtt.client as mqtt
+        from metrics_codec import MetricsEncoder
+
+        self.mqtt = mqtt
+        self.encoder_factory = (lambda: MetricsEncoder(keyframe_interval=args.keyframe_interval)) \
+            if args.payload == "compact" else None
+        self.qos = args.qos
+        self.poll_interval = args.poll_interval
+        self.collection = db[metrics_collection_name()]
+        self.fleet_ids = set()
+        self.clients = []
+        for i in range(args.mqtt_clients):
+            client = mqtt.Client(client_id=f"load-fleet-{os.getpid()}-{i}")
+            # File bornée côté client : au-delà, la publication échoue et l'échantillon est compté perdu
+            client.max_queued_messages_set(args.mqtt_queue)
+            client.connect(args.broker, args.port, 60)
+            client.loop_start()
+            self.clients.append(client)
+        self._cursor = ObjectId.from_datetime(datetime.now(timezone.utc))
+
+    async def send(self, vm, sample, stats):
+        if vm.encoder is None and self.encoder_factory:
+            vm.encoder = self.encoder_factory()
+        payload = vm.encoder.encode(sample, sample["timestamp"]) if vm.encoder else json.dumps(sample)
+        client = self.clients[hash(vm.id) % len(self.clients)]
+        info = client.publish(f"{TOPIC_PREFIX}/{vm.id}", payload, qos=self.qos)
+        if info.rc == self.mqtt.MQTT_ERR_SUCCESS:
+            stats.sent += 1
+        else:
+            stats.errors += 1
+
+    def _poll(self, stats):
+        """Documents écrits depuis le dernier passage (l'_id généré par le pont est croissant)."""
+        now = time.time()
+        for doc in self.collection.find({"_id": {"$gt": self._cursor}}, {"machineId": 1, "timestamp": 1}).sort("_id", 1):
+            self._cursor = doc["_id"]
+            if doc.get("machineId") not in self.fleet_ids:
+                continue
+            timestamp = doc["timestamp"]
+            if isinstance(timestamp, datetime):
+                timestamp = timestamp.replace(tzinfo=timezone.utc).timestamp()
+            stats.observed += 1
+            stats.ingest.append(max(now - timestamp, 0.0))
+
+    async def watch(self, stats, stop):
+        while not stop.is_set():
+            await asyncio.to_thread(self._poll, stats)
+            try:
+                await asyncio.wait_for(stop.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def drain(self, stats, timeout):
+        """Attend que les échantillons publiés arrivent en base, au plus `timeout` secondes."""
+        deadline = time.monotonic() + timeout
+        while stats.observed < stats.sent and time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            await asyncio.to_thread(self._poll, stats)
+
+    def close(self):
+        for client in self.clients:
+            client.loop_stop()
+            client.disconnect()
+
+
+def metrics_collection_name():
+    """Collection où le pont écrit, selon METRICS_STORAGE_MODE (comme mqtt_bridge.py)."""
+    import metrics_storage
+    return metrics_storage.TIERS[0].collection_name if metrics_storage.timeseries_enabled() else "machineMetrics"
+
+
+# =============================
+#   MACHINES SIMULÉES
+# =============================
+def seed_machines(db, count, run_id):
+    """Crée `count` machines (composants cpu, ram, disk, gpu) ; retourne leurs identifiants."""
+    now = datetime.utcnow()
+    docs = []
+    for i in range(count):
+        machine_id = ObjectId()
+        docs.append({
+            "_id": machine_id,
+            "name": f"sim-{i:05d}",
+            "serialNumber": f"LOAD-{run_id}-{i:05d}",
+            "status": "active",
+            "components": [{**c, "unit": "%", "status": "active",
+                            "thresholds": {"low": 30, "medium": 60, "high": 85, "critical": 95}} for c in COMPONENTS],
+            "mqttTopic": f"{TOPIC_PREFIX}/{machine_id}",
+            "overallHealth": 100,
+            "loadRun": run_id,
+            "createdAt": now,
+            "updatedAt": now
+        })
+    for i in range(0, count, 1000):
+        db["machines"].insert_many(docs[i:i + 1000])
+    return [str(doc["_id"]) for doc in docs]
+
+
+def cleanup(db, run_id, machine_ids):
+    db["machines"].delete_many({"loadRun": run_id})
+    for i in range(0, len(machine_ids), 1000):
+        batch = machine_ids[i:i + 1000]
+        db[metrics_collection_name()].delete_many({"machineId": {"$in": batch}})
+        db["predictions"].delete_many({"machineId": {"$in": batch}})
+
+
+# =============================
+#   EXÉCUTION
+# =============================
+async def run_machine(vm, transport, stats, args, origin, start_at, deadline):
+    loop = asyncio.get_running_loop()
+    next_tick = start_at
+    while next_tick < deadline:
+        await asyncio.sleep(max(next_tick - loop.time(), 0))
+        lag = loop.time() - next_tick
+        stats.generator_lag.append(lag)
+        if lag >= args.interval:
+            # La machine attendait encore l'envoi précédent : ces échantillons ne partiront jamais
+            skipped = int(lag // args.interval)
+            stats.missed += skipped
+            next_tick += skipped * args.interval
+        await transport.send(vm, vm.sample(time.time() - origin, args.interval), stats)
+        next_tick += args.interval
+
+
+async def run_probe(client, machine_ids, stats, rng, interval, deadline):
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
+        paths = {
+            "machine": f"/api/predict-machine-failure?machineId={rng.choice(machine_ids)}",
+            "fleet": "/api/predict-fleet?pageSize=50"
+        }
+        for name, path in paths.items():
+            start = time.perf_counter()
+            try:
+                status, body = await client.request("GET", path)
+            except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                status = None
+            elapsed = time.perf_counter() - start
+            if status != 200:
+                stats.probe_errors += 1
+            elif name == "machine" and not json.loads(body).get("predictions"):
+                # Réponse vide sans calcul : ne mesurerait que le chemin court
+                stats.probe_empty += 1
+            else:
+                stats.probes[name].append(elapsed)
+        await asyncio.sleep(interval)
+
+
+async def run_stage(fleet, transport, probe_client, args, origin):
+    loop = asyncio.get_running_loop()
+    stats = StageStats()
+    rng = random.Random(args.seed + len(fleet))
+    start = loop.time()
+    deadline = start + args.duration
+    if isinstance(transport, MqttTransport):
+        transport.fleet_ids = {vm.id for vm in fleet}
+
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(transport.watch(stats, stop)) if isinstance(transport, MqttTransport) else None
+    # Départs étalés sur un intervalle : pas de rafale synchronisée de toute la flotte
+    tasks = [run_machine(vm, transport, stats, args, origin, start + rng.uniform(0, args.interval), deadline)
+             for vm in fleet]
+    if probe_client is not None:
+        machine_ids = [vm.id for vm in fleet]
+        tasks += [run_probe(probe_client, machine_ids, stats, random.Random(args.seed + i), args.probe_interval, deadline)
+                  for i in range(args.probe_clients)]
+    await asyncio.gather(*tasks)
+
+    stop.set()
+    if watcher is not None:
+        await watcher
+    await transport.drain(stats, args.drain)
+    return stats.report(len(fleet), loop.time() - start, transport.name)
+
+
+def print_report(result):
+    def fmt(summary):
+        return f"{summary['p50_ms']:>8.1f}/{summary['p99_ms']:<8.1f}" if summary else f"{'-':>8s}/{'-':<8s}"
+
+    print(f"{result['fleet_size']:>7d} {result['sent_per_s']:>9.1f} {fmt(result['ingest_latency'])} "
+          f"{result['dropped']:>7d} ({result['dropped_percent']:>5.2f}%) {fmt(result['predict_machine'])} "
+          f"{fmt(result['predict_fleet'])} {fmt(result['generator_lag'])}")
+    if result['probe_empty']:
+        print(f"        ATTENTION : {result['probe_empty']} prédiction(s) vide(s), "
+              f"le service ne voit pas les métriques ingérées (METRICS_SYNC_INTERVAL ?)")
+
+
+async def main_async(args):
+    from mongo_setup import create_client
+
+    fleet_sizes = sorted(int(s) for s in args.fleet_sizes.split(',') if s)
+    run_id = f"{datetime.utcnow():%Y%m%d%H%M%S}-{os.getpid()}"
+    db = create_client(args.mongo_uri)[args.db]
+    machine_ids = seed_machines(db, fleet_sizes[-1], run_id)
+    fleet = build_fleet(machine_ids, args)
+    print(f"{len(machine_ids)} machine(s) simulée(s) créée(s) dans {args.db} "
+          f"({', '.join(f'{p}={sum(vm.profile == p for vm in fleet)}' for p in PROFILES)})")
+
+    transport = MqttTransport(args, db) if args.transport == "mqtt" else HttpTransport(args)
+    probe_client = None if args.no_probes else HttpClient(args.url, args.probe_clients, args.timeout)
+    origin = time.time()
+    results = []
+    print(f"{'flotte':>7s} {'envois/s':>9s} {'ingest p50/p99 ms':>17s} {'perdus':>16s} "
+          f"{'machine p50/p99':>17s} {'fleet p50/p99':>17s} {'retard gén.':>17s}")
+    try:
+        for size in fleet_sizes:
+            result = await run_stage(fleet[:size], transport, probe_client, args, origin)
+            results.append(result)
+            print_report(result)
+    finally:
+        transport.close()
+        if probe_client is not None:
+            probe_client.close()
+        if not args.keep:
+            cleanup(db, run_id, machine_ids)
+    return {
+        'timestamp': datetime.utcnow().isoformat(),
+        'transport': args.transport,
+        'payload': args.payload,
+        'interval_s': args.interval,
+        'duration_s': args.duration,
+        'mix': args.mix,
+        'results': results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", choices=["http", "mqtt"], default="http")
+    parser.add_argument("--fleet-sizes", default="100,1000,5000", help="tailles de flotte successives")
+    parser.add_argument("--duration", type=float, default=30, help="secondes d'envoi par taille de flotte")
+    parser.add_argument("--interval", type=float, default=2, help="secondes entre deux échantillons d'une machine")
+    parser.add_argument("--mix", default="steady=0.8,ramp=0.1,bursty=0.1", help="répartition des trajectoires")
+    parser.add_argument("--ramp-seconds", type=float, default=120, help="durée de la montée vers la panne")
+    parser.add_argument("--burst-rate", type=float, default=2, help="pics par minute (bursty)")
+    parser.add_argument("--burst-seconds", type=float, default=6, help="durée moyenne d'un pic")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--url", default="http://localhost:5000", help="service d'ingestion et de prédiction")
+    parser.add_argument("--connections", type=int, default=100, help="(http) requêtes d'ingestion simultanées")
+    parser.add_argument("--timeout", type=float, default=10, help="secondes avant d'abandonner une requête")
+    parser.add_argument("--broker", default=os.environ.get("MQTT_BROKER", "localhost"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("MQTT_PORT", 1883)))
+    parser.add_argument("--qos", type=int, choices=[0, 1], default=1)
+    parser.add_argument("--payload", choices=["json", "compact"], default="json", help="(mqtt) format des messages")
+    parser.add_argument("--keyframe-interval", type=int, default=10)
+    parser.add_argument("--mqtt-clients", type=int, default=4, help="(mqtt) connexions au broker")
+    parser.add_argument("--mqtt-queue", type=int, default=10000, help="(mqtt) messages en attente par connexion")
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="(mqtt) secondes entre deux lectures de Mongo")
+    parser.add_argument("--drain", type=float, default=10, help="secondes d'attente des derniers échantillons")
+    parser.add_argument("--probe-clients", type=int, default=2, help="sondes de prédiction simultanées")
+    parser.add_argument("--probe-interval", type=float, default=0.5)
+    parser.add_argument("--no-probes", action="store_true", help="ne pas interroger les endpoints de prédiction")
+    parser.add_argument("--mongo-uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default=LOAD_DB, help="base des machines simulées (DB_NAME des services)")
+    parser.add_argument("--keep", action="store_true", help="conserver machines et métriques à la fin")
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+    parse_mix(args.mix)
+
+    report = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# face_embeddings.py
+import functools
+import os
+import threading
+
+import numpy as np
+
+# DeepFace (et TensorFlow) n'est importé qu'au premier calcul d'embedding
+MODEL_NAME = 'VGG-Face'
+DISTANCE_METRIC = 'cosine'
+
+
+@functools.lru_cache(maxsize=None)
+def find_threshold(model_name=MODEL_NAME, distance_metric=DISTANCE_METRIC):
+    """Retourne le seuil de vérification utilisé par DeepFace.verify."""
+    try:
+        from deepface.modules.verification import find_threshold
+        return find_threshold(model_name, distance_metric)
+    except ImportError:
+        from deepface.commons import distance as dst
+        return dst.findThreshold(model_name, distance_metric)
+
+
+def compute_embedding(img):
+    """Calcule l'embedding VGG-Face d'une image (chemin ou tableau BGR)."""
+    from deepface import DeepFace
+    representations = DeepFace.represent(
+        img_path=img,
+        model_name=MODEL_NAME,
+        enforce_detection=False
+    )
+    return np.asarray(representations[0]["embedding"], dtype=np.float32)
+
+
+def cosine_distance(a, b):
+    """Distance cosinus, identique à celle de DeepFace.verify."""
+    denom = np.linalg.norm(a) * np.linalg.norm(b)
+    if denom == 0:
+        return 1.0
+    return float(1 - np.dot(a, b) / denom)
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+class EmbeddingStore:
+    """Cache des embeddings de référence, indexé par utilisateur.
+
+    Chaque entrée est associée au chemin de la photo ainsi qu'à son mtime et
+    sa taille : si la photo change (nouveau fichier ou fichier réécrit),
+    l'entrée est recalculée au prochain accès.
+    """
+
+    def __init__(self, embed=compute_embedding):
+        self._embed = embed
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def enroll(self, user_id, image_path):
+        """(Re)calcule et stocke l'embedding de référence d'un utilisateur."""
+        signature = file_signature(image_path)
+        embedding = self._embed(image_path)
+        with self._lock:
+            self._entries[str(user_id)] = (signature, embedding)
+        return embedding
+
+    def get(self, user_id, image_path):
+        """Retourne l'embedding en cache, ou le calcule s'il est absent ou périmé."""
+        signature = file_signature(image_path)
+        with self._lock:
+            entry = self._entries.get(str(user_id))
+        if entry and entry[0] == signature:
+            return entry[1]
+        return self.enroll(user_id, image_path)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def verify(face_region, reference_embedding, threshold=None):
+    """Compare un visage à un embedding de référence.
+
+    Retourne un dict au même format que DeepFace.verify ('verified', 'distance').
+    Sans seuil explicite, celui de DeepFace pour VGG-Face/cosinus est utilisé.
+    """
+    if threshold is None:
+        threshold = find_threshold()
+    distance = cosine_distance(compute_embedding(face_region), reference_embedding)
+    return {
+        'verified': distance <= threshold,
+        'distance': distance,
+        'threshold': threshold
+    }
@@ -0,0 +1,105 @@
+# face_index.py
+import os
+
+import numpy as np
+
+from face_embeddings import compute_embedding, file_signature
+
+
+class FaceIndex:
+    """Index d'identification 1:N des visages enrôlés.
+
+    Les embeddings de référence sont normalisés et rangés dans une matrice
+    contiguë : une recherche se résume à un seul produit matrice-vecteur,
+    quel que soit le nombre d'utilisateurs.
+    """
+
+    def __init__(self, index_path=None):
+        self.index_path = index_path
+        self.ids = []
+        self.names = []
+        self.signatures = []
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def build(self, users, image_field="faceImage"):
+        """Construit l'index à partir des utilisateurs Mongo.
+
+        Les lignes dont la photo n'a pas changé depuis le dernier index sur
+        disque sont réutilisées ; seules les nouvelles photos sont calculées.
+        """
+        previous = {}
+        if self.index_path and os.path.exists(self.index_path):
+            previous = self._load_rows()
+
+        ids, names, signatures, rows = [], [], [], []
+        for user in users:
+            path = user.get(image_field)
+            if not path or not os.path.exists(path):
+                continue
+            user_id = str(user["_id"])
+            signature = file_signature(path)
+            cached = previous.get(user_id)
+            if cached is not None and cached[0] == signature:
+                embedding = cached[1]
+            else:
+                try:
+                    embedding = compute_embedding(path)
+                except Exception as e:
+                    print(f"Erreur DeepFace pour {user.get('name', user_id)} : {e}")
+                    continue
+            ids.append(user_id)
+            names.append(user.get("name", ""))
+            signatures.append(signature)
+            rows.append(embedding)
+
+        self.ids, self.names, self.signatures = ids, names, signatures
+        self.matrix = self._normalize(np.vstack(rows)) if rows else np.empty((0, 0), dtype=np.float32)
+
+        if self.index_path:
+            self.save()
+        return self
+
+    def search(self, embedding, top_k=1):
+        """Retourne les top_k correspondances [(id, nom, distance cosinus)]."""
+        if not self.ids:
+            return []
+        query = self._normalize(np.asarray(embedding, dtype=np.float32)[np.newaxis, :])[0]
+        distances = 1.0 - self.matrix @ query
+        top_k = min(top_k, len(self.ids))
+        best = np.argpartition(distances, top_k - 1)[:top_k]
+        best = best[np.argsort(distances[best])]
+        return [(self.ids[i], self.names[i], float(distances[i])) for i in best]
+
+    def identify(self, face_region):
+        """Calcule l'embedding d'un visage et retourne la meilleure correspondance, ou None."""
+        matches = self.search(compute_embedding(face_region))
+        return matches[0] if matches else None
+
+    def save(self):
+        np.savez(
+            self.index_path,
+            ids=np.array(self.ids, dtype=object),
+            names=np.array(self.names, dtype=object),
+            signatures=np.array(self.signatures, dtype=object),
+            matrix=self.matrix
+        )
+
+    def _load_rows(self):
+        try:
+            data = np.load(self.index_path, allow_pickle=True)
+            return {
+                user_id: (tuple(signature), row)
+                for user_id, signature, row in zip(data["ids"], data["signatures"], data["matrix"])
+            }
+        except Exception as e:
+            print(f"Index illisible, reconstruction complète : {e}")
+            return {}
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(matrix / norms, dtype=np.float32)
@@ -0,0 +1,109 @@
+# face_pipeline.py
+import time
+
+import cv2
+import numpy as np
+
+from face_embeddings import verify as verify_embedding
+from inference_pool import REDUCE_FACTORS
+
+# Décodage à résolution réduite (facteur demandé via ?reduce=2|4|8)
+REDUCED_DECODE_FLAGS = dict(zip(REDUCE_FACTORS, (
+    cv2.IMREAD_COLOR,
+    cv2.IMREAD_REDUCED_COLOR_2,
+    cv2.IMREAD_REDUCED_COLOR_4,
+    cv2.IMREAD_REDUCED_COLOR_8
+)))
+# Au-delà de cette taille, une image est décodée en demi-résolution par défaut
+OVERSIZED_FRAME_BYTES = 1024 * 1024
+
+
+def load_cascade():
+    return cv2.CascadeClassifier(
+        cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+    )
+
+
+def decode_frame(frame_data, reduce=None):
+    """Décode l'image sans copie intermédiaire, éventuellement à résolution réduite.
+
+    reduce=None choisit la demi-résolution au-delà de OVERSIZED_FRAME_BYTES ;
+    les appelants qui doivent garder la pleine résolution passent reduce=1.
+    """
+    if reduce is None:
+        reduce = 2 if len(frame_data) > OVERSIZED_FRAME_BYTES else 1
+    if reduce not in REDUCED_DECODE_FLAGS:
+        raise ValueError(f'reduce must be one of {sorted(REDUCED_DECODE_FLAGS)}')
+    nparr = np.frombuffer(frame_data, np.uint8)
+    return cv2.imdecode(nparr, REDUCED_DECODE_FLAGS[reduce])
+
+
+# Marge autour du visage précédent dans laquelle on le cherche d'abord (fraction de sa taille)
+HINT_MARGIN = 0.5
+
+
+def detect_first_face(frame, cascade):
+    """Retourne la région du premier visage détecté, ou None."""
+    region, _ = detect_face(frame, cascade)
+    return region
+
+
+def detect_face(frame, cascade, hint=None):
+    """Retourne (région du visage, roi (x, y, w, h)), ou (None, None).
+
+    Avec `hint` (roi du visage dans l'image précédente), la détection est
+    d'abord tentée dans cette zone élargie, bien plus petite que l'image ;
+    l'image entière n'est parcourue que si le visage n'y est plus.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if hint is not None:
+        x, y, w, h = hint
+        dx, dy = int(w * HINT_MARGIN), int(h * HINT_MARGIN)
+        x0, y0 = max(x - dx, 0), max(y - dy, 0)
+        x1, y1 = min(x + w + dx, gray.shape[1]), min(y + h + dy, gray.shape[0])
+        if x1 > x0 and y1 > y0:
+            faces = cascade.detectMultiScale(
+                gray[y0:y1, x0:x1], scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
+            )
+            if len(faces) > 0:
+                fx, fy, fw, fh = faces[0]
+                roi = (int(fx + x0), int(fy + y0), int(fw), int(fh))
+                return frame[roi[1]:roi[1]+fh, roi[0]:roi[0]+fw], roi
+
+    faces = cascade.detectMultiScale(
+        gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
+    )
+    if len(faces) == 0:
+        return None, None
+    x, y, w, h = (int(v) for v in faces[0])
+    return frame[y:y+h, x:x+w], (x, y, w, h)
+
+
+def verify_frame(frame_data, reduce, reference_embedding, cascade, hint=None):
+    """Décodage, détection et comparaison d'une image à un embedding de référence.
+
+    Retourne un dict avec 'status' : 'ok' (avec 'verified', 'distance' et
+    'roi', à repasser comme `hint` pour l'image suivante), 'no_face' ou
+    'undecodable', et 'timings' : durée de chaque étape en secondes
+    (decode, detect, embed), mesurée là où elle s'exécute.
+    """
+    timings = {}
+    start = time.perf_counter()
+    frame = decode_frame(frame_data, reduce)
+    timings['decode'] = time.perf_counter() - start
+    if frame is None:
+        return {'status': 'undecodable', 'timings': timings}
+
+    start = time.perf_counter()
+    face_region, roi = detect_face(frame, cascade, hint)
+    timings['detect'] = time.perf_counter() - start
+    if face_region is None:
+        return {'status': 'no_face', 'timings': timings}
+
+    start = time.perf_counter()
+    result = verify_embedding(face_region, reference_embedding)
+    timings['embed'] = time.perf_counter() - start
+    return {
+        'status': 'ok', 'verified': result['verified'], 'distance': result['distance'],
+        'roi': roi, 'timings': timings
+    }
@@ -1,10 +1,21 @@
+import os
+import argparse
 import cv2
-from deepface import DeepFace
-from pymongo import MongoClient
+from face_index import FaceIndex
+from mongo_setup import MONGO_URI, create_client
+from recognition_pipeline import StageTimer, run_pipeline
+
+parser = argparse.ArgumentParser(description="Reconnaissance faciale par webcam")
+parser.add_argument("--pipeline", action="store_true",
+                    help="détection sous-échantillonnée, suivi des visages et reconnaissance en arrière-plan")
+parser.add_argument("--detect-every", type=int, default=5,
+                    help="(pipeline) relancer la détection complète toutes les N images")
+parser.add_argument("--scale", type=float, default=0.5,
+                    help="(pipeline) facteur de réduction de l'image pour la détection")
+args = parser.parse_args()
 
-MONGO_URI = "mongodb://localhost:27017"
 DB_NAME = "dashboardDB"
-client = MongoClient(MONGO_URI)
+client = create_client(MONGO_URI)
 db = client[DB_NAME]
 users_collection = db["users"]
 
@@ -13,6 +24,11 @@ face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_fronta
 # Récupérer tous les utilisateurs avec leur image
 users = list(users_collection.find({}, {"name": 1, "faceImage": 1}))
 
+# Index 1:N des embeddings (mis à jour uniquement pour les photos modifiées)
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "face_index.npz")
+face_index = FaceIndex(INDEX_PATH).build(users)
+print(f"{len(face_index)} visage(s) indexé(s).")
+
 cap = cv2.VideoCapture(0)
 if not cap.isOpened():
     print("Erreur : Impossible d'ouvrir la webcam.")
@@ -26,50 +42,69 @@ verify_count = 0
 verify_threshold = 3
 distance_threshold = 0.4
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        print("Erreur : Impossible de capturer une image.")
-        break
+if args.pipeline:
+    run_pipeline(
+        cap, face_cascade, face_index,
+        verify_threshold=verify_threshold,
+        distance_threshold=distance_threshold,
+        max_attempts=max_attempts,
+        detect_every=args.detect_every,
+        scale=args.scale
+    )
+else:
+    # Boucle d'origine, instrumentée pour comparer avec le mode pipeline
+    timer = StageTimer()
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            print("Erreur : Impossible de capturer une image.")
+            break
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+        with timer.time("detect"):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
 
-    recognized = False
-    for (x, y, w, h) in faces:
-        face_region = frame[y:y+h, x:x+w]
+        recognized = False
+        for (x, y, w, h) in faces:
+            face_region = frame[y:y+h, x:x+w]
 
-        for user in users:
             try:
-                result = DeepFace.verify(face_region, user["faceImage"])
-                if result["verified"] and result["distance"] < distance_threshold:
-                    verify_count += 1
-                    print(f"Utilisateur {user['name']} reconnu {verify_count}/{verify_threshold} fois")
-                    if verify_count >= verify_threshold:
-                        recognized = True
-                        print(f"Connexion réussie pour {user['name']}")
-                        break
-                else:
-                    verify_count = 0
+                with timer.time("recognize"):
+                    match = face_index.identify(face_region)
             except Exception as e:
                 print(f"Erreur DeepFace : {e}")
+                continue
+
+            if match and match[2] < distance_threshold:
+                user_id, user_name, distance = match
+                verify_count += 1
+                print(f"Utilisateur {user_name} reconnu {verify_count}/{verify_threshold} fois (distance {distance:.3f})")
+                if verify_count >= verify_threshold:
+                    recognized = True
+                    print(f"Connexion réussie pour {user_name}")
+            else:
+                verify_count = 0
+
+            if recognized:
+                break
+
+        timer.tick()
+        timer.draw(frame)
+        cv2.imshow('Reconnaissance Faciale', frame)
+
+        if not recognized:
+            attempts += 1
+            if attempts >= max_attempts:
+                print("Échec de la reconnaissance. Essayez le mot de passe.")
+                break
 
         if recognized:
             break
 
-    cv2.imshow('Reconnaissance Faciale', frame)
-
-    if not recognized:
-        attempts += 1
-        if attempts >= max_attempts:
-            print("Échec de la reconnaissance. Essayez le mot de passe.")
+        if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
-    if recognized:
-        break
-
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+    print(timer.summary())
 
 cap.release()
 cv2.destroyAllWindows()
@@ -0,0 +1,112 @@
+# fleet_prediction.py
+import numpy as np
+
+from metrics_storage import numeric_fields
+
+DEFAULT_THRESHOLDS = {'low': 30, 'medium': 60, 'high': 85, 'critical': 95}
+
+
+def component_risk_vectorized(values, low, medium, high):
+    """Version NumPy de calculate_component_risk, appliquée à des tableaux entiers."""
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        return np.select(
+            [values < low, values < medium, values < high],
+            [
+                0.0,
+                1 + 39 * (values - low) / (medium - low),
+                40 + 40 * (values - medium) / (high - medium)
+            ],
+            default=np.minimum(80 + 20 * (1 - np.exp(-0.1 * (values - high))), 100)
+        )
+
+
+def fleet_window_pipeline(machine_ids, window=50, metrics_collection="machineMetrics"):
+    """Agrégation (sur la collection machines) des `window` dernières métriques de chaque machine,
+    moyennées par composant.
+
+    Le $lookup est exécuté machine par machine : égalité sur machineId puis
+    $sort/$limit, servis par l'index (machineId, timestamp). Seuls `window`
+    documents sont lus par machine, quelle que soit la taille de l'historique.
+    Syntaxe localField + pipeline : MongoDB 5.0 ou plus récent.
+    """
+    return [
+        {"$match": {"_id": {"$in": machine_ids}}},
+        {"$project": {"machineId": {"$toString": "$_id"}}},
+        {"$lookup": {
+            "from": metrics_collection,
+            "localField": "machineId",
+            "foreignField": "machineId",
+            "pipeline": [
+                {"$sort": {"timestamp": -1}},
+                {"$limit": window},
+                {"$project": {"_id": 0, "fields": numeric_fields()}}
+            ],
+            "as": "samples"
+        }},
+        {"$unwind": "$samples"},
+        {"$unwind": "$samples.fields"},
+        {"$group": {
+            "_id": {"machineId": "$machineId", "k": "$samples.fields.k"},
+            "mean": {"$avg": "$samples.fields.v"}
+        }}
+    ]
+
+
+def load_fleet_windows(machines_collection, metrics_collection, machine_ids, window=50):
+    """Moyennes par machine (_id) et par composant des `window` dernières métriques, en une agrégation."""
+    pipeline = fleet_window_pipeline(machine_ids, window, metrics_collection.name)
+    means = {}
+    for r in machines_collection.aggregate(pipeline, allowDiskUse=True):
+        means.setdefault(r["_id"]["machineId"], {})[r["_id"]["k"]] = r["mean"]
+    return means
+
+
+def predict_fleet(machines, means):
+    """Calcule la santé de toutes les machines en un seul passage vectorisé.
+
+    Les couples (machine, composant) sont aplatis en tableaux 1D : le risque
+    est évalué d'un coup, puis moyenné par machine avec np.bincount.
+    """
+    machine_idx, names, units, values, lows, mediums, highs = [], [], [], [], [], [], []
+    for i, machine in enumerate(machines):
+        machine_means = means.get(str(machine["_id"]), {})
+        for component in machine.get("components", []):
+            value = machine_means.get(component["name"])
+            if value is None:
+                continue
+            thresholds = component.get("thresholds") or DEFAULT_THRESHOLDS
+            machine_idx.append(i)
+            names.append(component["name"])
+            units.append(component.get("unit", "%"))
+            values.append(value)
+            lows.append(thresholds['low'])
+            mediums.append(thresholds['medium'])
+            highs.append(thresholds['high'])
+
+    machine_idx = np.asarray(machine_idx, dtype=np.intp)
+    risks = component_risk_vectorized(values, np.asarray(lows, dtype=np.float64),
+                                      np.asarray(mediums, dtype=np.float64), np.asarray(highs, dtype=np.float64))
+    counts = np.bincount(machine_idx, minlength=len(machines))
+    totals = np.bincount(machine_idx, weights=risks, minlength=len(machines))
+    max_risks = np.zeros(len(machines))
+    if len(risks):
+        np.maximum.at(max_risks, machine_idx, risks)
+
+    results = [{
+        'machineId': str(machine["_id"]),
+        'machineName': machine.get("name", "Unknown"),
+        'overallHealth': round(float(100 - totals[i] / counts[i]), 2) if counts[i] else None,
+        'maxRisk': round(float(max_risks[i]), 2) if counts[i] else None,
+        'predictions': []
+    } for i, machine in enumerate(machines)]
+    for j, i in enumerate(machine_idx):
+        results[i]['predictions'].append({
+            'component': names[j],
+            'risk_percent': round(float(risks[j]), 2),
+            'value': round(float(values[j]), 2),
+            'unit': units[j]
+        })
+    for result in results:
+        result['predictions'].sort(key=lambda p: p['risk_percent'], reverse=True)
+    return results
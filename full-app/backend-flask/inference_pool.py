@@ -0,0 +1,164 @@
+# inference_pool.py
+import importlib.util
+import multiprocessing
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+# OpenCV et DeepFace ne sont importés que là où l'inférence s'exécute (workers,
+# ou processus principal si workers=0) : le serveur Flask reste léger.
+
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+# Facteurs de réduction acceptés par face_pipeline.decode_frame
+REDUCE_FACTORS = (1, 2, 4, 8)
+# Modules sans lesquels les workers ne peuvent pas s'initialiser
+REQUIRED_MODULES = ("deepface", "cv2")
+
+
+class InferenceBusy(Exception):
+    """Trop de demandes en attente : le client doit réessayer plus tard."""
+
+
+class InferenceTimeout(Exception):
+    """La demande n'a pas été traitée dans le délai imparti."""
+
+
+class InferenceUnavailable(InferenceBusy):
+    """L'inférence ne peut pas s'initialiser (dépendance ou modèle manquant) : réponse 503."""
+
+
+# =============================
+#   CÔTÉ WORKER
+# =============================
+_cascade = None
+_init_error = None
+
+
+def _init_worker():
+    """Charge VGG-Face et la cascade de Haar une seule fois, puis fait une passe de chauffe.
+
+    Une exception ici ferait relancer le worker par le Pool indéfiniment :
+    l'erreur est conservée et chaque tâche échoue aussitôt avec InferenceUnavailable.
+    """
+    global _cascade, _init_error
+    try:
+        from deepface import DeepFace
+        import face_pipeline
+        from face_embeddings import MODEL_NAME, compute_embedding
+        DeepFace.build_model(MODEL_NAME)
+        _cascade = face_pipeline.load_cascade()
+        compute_embedding(np.zeros((224, 224, 3), dtype=np.uint8))
+    except Exception as e:
+        _init_error = f"Inference worker failed to initialize: {e!r}"
+
+
+def _check_worker():
+    if _init_error is not None:
+        raise InferenceUnavailable(_init_error)
+
+
+def _verify(frame_data, reduce, reference_embedding, hint):
+    _check_worker()
+    import face_pipeline
+    return face_pipeline.verify_frame(frame_data, reduce, reference_embedding, _cascade, hint)
+
+
+def _embed(image_path):
+    _check_worker()
+    from face_embeddings import compute_embedding
+    return compute_embedding(image_path)
+
+
+def missing_modules():
+    """Modules requis absents de l'environnement (vérifié sans les importer)."""
+    return [name for name in REQUIRED_MODULES if importlib.util.find_spec(name) is None]
+
+
+# =============================
+#   CÔTÉ SERVEUR
+# =============================
+class InferencePool:
+    """Pool de processus dédié à l'inférence DeepFace, avec contrôle d'admission.
+
+    Au plus `max_pending` demandes sont acceptées à la fois (en cours ou en
+    file) ; au-delà, InferenceBusy est levée immédiatement pour que l'API
+    réponde 503 au lieu de laisser chaque requête expirer. Avec workers=0,
+    l'inférence s'exécute dans le thread de la requête (comportement d'origine),
+    avec la même limite. Si DeepFace ou OpenCV manquent, le pool ne démarre
+    pas et chaque demande lève InferenceUnavailable (503).
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_pending=None, timeout=10):
+        self.workers = workers
+        self.max_pending = max_pending or max(workers, 1) * 4
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pool = None
+        self._cascade = None
+        self._start_lock = threading.Lock()
+        self.unavailable = None
+
+    def start(self):
+        """Démarre les processus (spawn : TensorFlow ne supporte pas fork)."""
+        with self._start_lock:
+            if self._pool is None and self.workers > 0 and self.unavailable is None:
+                missing = missing_modules()
+                if missing:
+                    self.unavailable = f"Inference unavailable, missing modules: {', '.join(missing)}"
+                    print(self.unavailable)
+                    return self
+                context = multiprocessing.get_context("spawn")
+                self._pool = context.Pool(self.workers, initializer=_init_worker)
+        return self
+
+    @contextmanager
+    def _slot(self):
+        if not self._slots.acquire(blocking=False):
+            raise InferenceBusy("Inference queue is full")
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def _submit(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise InferenceBusy("Inference queue is full")
+
+        def release(_):
+            self._slots.release()
+
+        try:
+            self.start()
+            if self.unavailable:
+                raise InferenceUnavailable(self.unavailable)
+            pending = self._pool.apply_async(func, args, callback=release, error_callback=release)
+        except Exception:
+            self._slots.release()
+            raise
+        try:
+            return pending.get(self.timeout)
+        except multiprocessing.TimeoutError:
+            # Le créneau reste occupé jusqu'à la fin réelle de la tâche dans le worker
+            raise InferenceTimeout(f"Inference did not complete within {self.timeout}s")
+
+    def verify(self, frame_data, reduce, reference_embedding, hint=None):
+        if self.workers == 0:
+            import face_pipeline
+            with self._slot():
+                if self._cascade is None:
+                    self._cascade = face_pipeline.load_cascade()
+                return face_pipeline.verify_frame(frame_data, reduce, reference_embedding, self._cascade, hint)
+        return self._submit(_verify, frame_data, reduce, reference_embedding, hint)
+
+    def embed(self, image_path):
+        if self.workers == 0:
+            with self._slot():
+                return _embed(image_path)
+        return self._submit(_embed, image_path)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
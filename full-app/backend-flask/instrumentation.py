@@ -0,0 +1,263 @@
+# instrumentation.py
+"""Latences par route et par étape, compteurs, et profileur par échantillonnage.
+
+    instrumentation = Instrumentation("verify")
+    instrumentation.install(app)          # /api/metrics et /api/profiler
+    with instrumentation.stage("mongo_lookup"):
+        ...
+    instrumentation.count("verify_results_total", result="no_face")
+
+/api/metrics expose tout au format texte Prometheus. Le profileur
+s'active au démarrage avec PROFILER_ENABLED=1, ou à chaud par
+POST /api/profiler {"action": "start"} ; GET /api/profiler retourne les
+piles les plus fréquentes (format « folded », lisible par flamegraph.pl
+avec ?format=folded). /api/profiler n'existe que si PROFILER_TOKEN est
+défini, et exige ce jeton dans l'en-tête X-Profiler-Token.
+"""
+import bisect
+import collections
+import hmac
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, jsonify, request
+
+# Bornes des histogrammes, en secondes (de 1 ms à 30 s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Intervalle minimal du profileur (secondes)
+MIN_PROFILER_INTERVAL = 0.001
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Instrumentation:
+    """Registre de métriques d'un service Flask."""
+
+    def __init__(self, service, buckets=DEFAULT_BUCKETS):
+        self.service = service
+        self.buckets = buckets
+        self._histograms = collections.defaultdict(dict)
+        self._counters = collections.defaultdict(dict)
+        self._lock = threading.Lock()
+        self.profiler = SamplingProfiler()
+
+    # -- enregistrement -------------------------------------------------
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self._histograms[name].get(key)
+            if histogram is None:
+                histogram = self._histograms[name][key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def count(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._counters[name][key] = self._counters[name].get(key, 0) + amount
+
+    def observe_stage(self, stage, seconds, route=None):
+        self.observe("stage_duration_seconds", seconds, route=route or current_route(), stage=stage)
+
+    @contextmanager
+    def stage(self, stage):
+        """Mesure la durée d'une étape de la requête en cours."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - start)
+
+    # -- exposition -----------------------------------------------------
+    def render(self):
+        """Texte au format d'exposition Prometheus 0.0.4."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels + (('service', self.service),))} {value}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    labels = labels + (('service', self.service),)
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def install(self, app):
+        """Mesure chaque requête et ajoute /api/metrics et /api/profiler à l'application."""
+
+        @app.before_request
+        def start_timer():
+            g.instrumentation_start = time.perf_counter()
+
+        @app.after_request
+        def record_request(response):
+            start = g.pop('instrumentation_start', None)
+            if start is not None and request.endpoint not in ('metrics', 'profiler'):
+                route = current_route()
+                self.observe("http_request_duration_seconds", time.perf_counter() - start,
+                             route=route, method=request.method, status=response.status_code)
+                if response.status_code >= 500:
+                    self.count("http_request_errors_total", route=route, status=response.status_code)
+            return response
+
+        @app.route('/api/metrics', methods=['GET'], endpoint='metrics')
+        def metrics():
+            return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+        token = os.environ.get("PROFILER_TOKEN")
+        if token:
+            self._install_profiler_route(app, token)
+
+        if os.environ.get("PROFILER_ENABLED") == "1":
+            self.profiler.start(interval=float(os.environ.get("PROFILER_INTERVAL", 0.01)))
+        return app
+
+    def _install_profiler_route(self, app, token):
+        @app.route('/api/profiler', methods=['GET', 'POST'], endpoint='profiler')
+        def profiler():
+            if not hmac.compare_digest(request.headers.get('X-Profiler-Token', ''), token):
+                return jsonify({'error': 'invalid profiler token'}), 403
+            if request.method == 'POST':
+                data = request.get_json(silent=True) or {}
+                action = data.get('action')
+                if action == 'start':
+                    try:
+                        interval = float(data.get('interval', 0.01))
+                        duration = float(data['duration']) if data.get('duration') is not None else None
+                    except (TypeError, ValueError):
+                        return jsonify({'error': 'interval and duration must be numbers'}), 400
+                    if not interval > 0 or (duration is not None and not duration > 0):
+                        return jsonify({'error': 'interval and duration must be positive numbers'}), 400
+                    self.profiler.start(interval=interval, duration=duration)
+                elif action == 'stop':
+                    self.profiler.stop()
+                elif action == 'reset':
+                    self.profiler.reset()
+                else:
+                    return jsonify({'error': 'action must be one of start, stop, reset'}), 400
+            if request.args.get('format') == 'folded':
+                return Response(self.profiler.folded(), mimetype='text/plain')
+            return jsonify(self.profiler.report(top=request.args.get('top', 30, type=int))), 200
+
+
+def current_route():
+    """Règle de la route en cours (« /api/verify »), ou 'none' hors requête."""
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return "none"
+
+
+# =============================
+#   PROFILEUR
+# =============================
+class SamplingProfiler:
+    """Échantillonne périodiquement les piles de tous les threads Python.
+
+    Le coût est proportionnel à la fréquence (par défaut 100 Hz) et nul
+    quand il est arrêté : aucun hook n'est posé sur l'interpréteur.
+    """
+
+    def __init__(self, max_stacks=5000, max_depth=64):
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self._stacks = collections.Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.samples = 0
+        self.interval = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=0.01, duration=None):
+        """Démarre l'échantillonnage ; s'arrête seul après `duration` secondes si indiqué.
+
+        L'intervalle est ramené à au moins MIN_PROFILER_INTERVAL : plus court, la
+        boucle d'échantillonnage monopoliserait le GIL.
+        """
+        if self.running:
+            return False
+        interval = max(interval, MIN_PROFILER_INTERVAL)
+        self.interval = interval
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval, float(duration) if duration else None), daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _run(self, interval, duration):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + duration if duration else None
+        while not self._stop_event.wait(interval):
+            if deadline and time.monotonic() >= deadline:
+                break
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                with self._lock:
+                    if key in self._stacks or len(self._stacks) < self.max_stacks:
+                        self._stacks[key] += 1
+                    self.samples += 1
+
+    def folded(self):
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def report(self, top=30):
+        with self._lock:
+            return {
+                'running': self.running,
+                'interval': self.interval,
+                'samples': self.samples,
+                'stacks': [{'stack': stack, 'count': count} for stack, count in self._stacks.most_common(top)]
+            }
@@ -0,0 +1,238 @@
+# metric_store.py
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+
+from metrics_storage import INGESTED_AT_FIELD, ingest_time
+
+DEFAULT_WINDOW_SIZE = 50
+DEFAULT_EWMA_ALPHA = 0.2
+MAX_COMPONENTS_PER_MACHINE = 64
+MAX_MACHINES = 10000
+
+DEFAULT_SYNC_LOOKBACK = 30.0
+
+# Champs du document de métriques qui ne sont pas des composants
+RESERVED_FIELDS = {"_id", "machineId", "timestamp", INGESTED_AT_FIELD}
+
+
+class RollingWindow:
+    """Fenêtre glissante préallouée (tampon circulaire) pour un composant.
+
+    La somme est maintenue à l'insertion, ce qui rend la moyenne O(1) ;
+    min/max sont calculés sur le tampon (taille fixe) et l'EWMA est mise
+    à jour à chaque échantillon.
+    """
+
+    __slots__ = ("values", "size", "count", "index", "total", "ewma", "alpha")
+
+    def __init__(self, size=DEFAULT_WINDOW_SIZE, alpha=DEFAULT_EWMA_ALPHA):
+        self.values = np.zeros(size, dtype=np.float64)
+        self.size = size
+        self.count = 0
+        self.index = 0
+        self.total = 0.0
+        self.ewma = None
+        self.alpha = alpha
+
+    def push(self, value):
+        value = float(value)
+        if self.count == self.size:
+            self.total -= float(self.values[self.index])
+        else:
+            self.count += 1
+        self.values[self.index] = value
+        self.total += value
+        self.index = (self.index + 1) % self.size
+        # Recalcul périodique de la somme pour éviter la dérive des flottants
+        if self.index == 0:
+            self.total = float(self.values[:self.count].sum())
+        self.ewma = value if self.ewma is None else self.ewma + self.alpha * (value - self.ewma)
+
+    def _filled(self):
+        return self.values[:self.count]
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def min(self):
+        return float(self._filled().min()) if self.count else None
+
+    @property
+    def max(self):
+        return float(self._filled().max()) if self.count else None
+
+    def stats(self):
+        return {
+            'mean': self.mean,
+            'min': self.min,
+            'max': self.max,
+            'ewma': self.ewma,
+            'count': self.count
+        }
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+
+class MachineMetricStore:
+    """Fenêtres glissantes par machine et par composant, alimentées à l'ingestion.
+
+    Au plus `max_machines` machines sont gardées en mémoire : au-delà, la
+    machine la moins récemment alimentée est oubliée. Une machine absente
+    (oubliée, ou reconstruction échouée au démarrage) est rechargée depuis
+    Mongo par load() à sa prochaine prédiction.
+    """
+
+    def __init__(self, window_size=DEFAULT_WINDOW_SIZE, alpha=DEFAULT_EWMA_ALPHA,
+                 max_components=MAX_COMPONENTS_PER_MACHINE, max_machines=MAX_MACHINES):
+        self.window_size = window_size
+        self.alpha = alpha
+        self.max_components = max_components
+        self.max_machines = max_machines
+        self.evicted = 0
+        self._machines = OrderedDict()
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def ingest(self, machine_id, sample, timestamp=None):
+        """Ajoute un échantillon ; les champs non numériques sont ignorés."""
+        with self._lock:
+            self._ingest(str(machine_id), sample, timestamp)
+
+    def _ingest(self, machine_id, sample, timestamp):
+        windows = self._machines.get(machine_id)
+        if windows is None:
+            windows = self._machines[machine_id] = {}
+            while len(self._machines) > self.max_machines:
+                evicted_id, _ = self._machines.popitem(last=False)
+                self._latest.pop(evicted_id, None)
+                self.evicted += 1
+        else:
+            self._machines.move_to_end(machine_id)
+        for name, value in sample.items():
+            if name in RESERVED_FIELDS or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            window = windows.get(name)
+            if window is None:
+                # Nombre de composants borné pour borner la mémoire
+                if len(windows) >= self.max_components:
+                    continue
+                window = windows[name] = RollingWindow(self.window_size, self.alpha)
+            window.push(value)
+        if timestamp is not None:
+            self._latest[machine_id] = timestamp
+
+    def get(self, machine_id, component):
+        """Statistiques d'un composant, ou None si aucune donnée."""
+        with self._lock:
+            window = self._machines.get(str(machine_id), {}).get(component)
+            return window.stats() if window and window.count else None
+
+    def has_machine(self, machine_id):
+        return str(machine_id) in self._machines
+
+    def latest_timestamp(self, machine_id):
+        return self._latest.get(str(machine_id))
+
+    def memory_usage(self):
+        """Octets occupés par les tampons, par machine."""
+        with self._lock:
+            return {
+                machine_id: {
+                    'components': len(windows),
+                    'bytes': sum(w.nbytes for w in windows.values())
+                }
+                for machine_id, windows in self._machines.items()
+            }
+
+    def load(self, collection, machine_id):
+        """Charge les `window_size` dernières métriques d'une machine absente ; retourne True si elle a des données.
+
+        Si la machine a été alimentée entre-temps (ingestion concurrente), ses
+        fenêtres sont conservées telles quelles.
+        """
+        docs = list(collection.find({"machineId": machine_id}).sort("timestamp", -1).limit(self.window_size))
+        machine_id = str(machine_id)
+        with self._lock:
+            if machine_id not in self._machines and docs:
+                for doc in reversed(docs):
+                    self._ingest(machine_id, doc, doc.get("timestamp"))
+            return machine_id in self._machines
+
+    def rebuild(self, collection):
+        """Reconstruit les fenêtres depuis Mongo (au démarrage)."""
+        for machine_id in collection.distinct("machineId"):
+            self.load(collection, machine_id)
+        return len(self._machines)
+
+
+class MetricsFollower(threading.Thread):
+    """Applique aux fenêtres en mémoire les métriques écrites par d'autres processus.
+
+    Le pont MQTT et les autres workers gunicorn écrivent directement dans
+    Mongo : sans ce suivi, leurs machines n'apparaissent ni dans les
+    fenêtres de ce processus, ni dans son flux de prédictions. Chaque
+    écrivain horodate ses documents juste avant l'insertion (champ indexé
+    INGESTED_AT_FIELD). Le suivi retient le plus grand horodatage déjà lu
+    et relit, toutes les `interval` secondes, les documents horodatés
+    depuis ce repère moins `lookback` secondes ; seuls les documents encore
+    inconnus sont chargés et passés à `on_sample(doc)`.
+
+    Le repère n'avance qu'avec les données : un écrivain bloqué sur un
+    insert_many lent n'est pas dépassé tant que personne d'autre n'écrit.
+    `lookback` couvre le cas où un autre écrivain avance le repère pendant
+    ce temps (insertion plus lente que `lookback`, ou horloges décalées
+    de plus de `lookback`).
+    """
+
+    def __init__(self, collection, on_sample, interval=1.0, lookback=DEFAULT_SYNC_LOOKBACK):
+        super().__init__(daemon=True)
+        self.collection = collection
+        self.on_sample = on_sample
+        self.interval = interval
+        self.lookback = timedelta(seconds=lookback)
+        self.applied = 0
+        # _id -> horodatage d'ingestion des documents déjà appliqués
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        # Les documents antérieurs au démarrage sont déjà chargés par rebuild()
+        self._origin = self._mark = ingest_time()
+
+    def mark_local(self, doc_id, ingested_at):
+        """Document déjà appliqué par ce processus (ingestion HTTP) : ne pas le rejouer."""
+        with self._lock:
+            self._seen[doc_id] = ingested_at
+
+    def poll(self):
+        start = max(self._origin, self._mark - self.lookback)
+        docs = list(self.collection.find({INGESTED_AT_FIELD: {"$gte": start}}, {INGESTED_AT_FIELD: 1}))
+        with self._lock:
+            new_ids = [doc["_id"] for doc in docs if doc["_id"] not in self._seen]
+            self._seen.update((doc["_id"], doc[INGESTED_AT_FIELD]) for doc in docs)
+            if docs:
+                self._mark = max(self._mark, max(doc[INGESTED_AT_FIELD] for doc in docs))
+            # Seuls les documents encore dans la fenêtre relue doivent être retenus
+            horizon = self._mark - self.lookback
+            self._seen = {doc_id: at for doc_id, at in self._seen.items() if at >= horizon}
+        if new_ids:
+            for doc in self.collection.find({"_id": {"$in": new_ids}}).sort([(INGESTED_AT_FIELD, 1), ("_id", 1)]):
+                self.on_sample(doc)
+            self.applied += len(new_ids)
+        return len(new_ids)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Suivi des métriques interrompu : {e}")
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,186 @@
+# metrics_codec.py
+"""Format binaire compact des métriques MQTT, avec compression delta.
+
+Chaque message commence par un en-tête fixe :
+
+    magic 'M' | version | flags | seq (u16) | keyframe seq (u16) | timestamp (f64) | masque (u16)
+
+suivi des valeurs des champs présents dans le masque, dans l'ordre du
+schéma. Une keyframe contient tous les champs ; les messages suivants ne
+contiennent que les champs qui diffèrent de la dernière keyframe. Un
+message perdu n'empêche donc pas de décoder les suivants : seule la
+keyframe de référence est nécessaire.
+
+Tailles (schéma v2) : l'en-tête fait à lui seul 17 octets et une keyframe
+82 octets, contre ~300 octets en JSON. Un delta ne change pas de taille
+avec l'en-tête mais avec les champs modifiés : compteurs réseau (8 octets
+chacun), débits, CPU/RAM et durée de collecte changent presque à chaque
+mesure, soit ~50 octets par delta en pratique.
+
+Pour vérifier sur un broker local :
+    python metrics_codec.py --broker localhost --topic "system/metrics/#"
+"""
+import json
+import struct
+import time
+
+MAGIC = b'M'
+VERSION = 2
+FLAG_KEYFRAME = 0x01
+
+HEADER = struct.Struct('<cBBHHdH')
+
+# Schéma v1 : (nom du champ, format struct). L'ordre ne doit jamais changer
+# pour une version donnée ; ajouter des champs implique une nouvelle version.
+SCHEMA_V1 = [
+    ("cpu", 'f'),
+    ("ram", 'f'),
+    ("disk", 'f'),
+    ("bytesSent", 'Q'),
+    ("bytesReceived", 'Q'),
+    ("bytesSentPerSec", 'f'),
+    ("bytesReceivedPerSec", 'f'),
+    ("gpu", 'f'),
+    ("gpuMem", 'f'),
+    ("battery", 'f'),
+    ("charging", '?'),
+    ("collectorMs", 'f'),
+    ("collectorCpuPercent", 'f'),
+]
+# v2 : ajoute l'état de la file hors ligne du publisher
+SCHEMA_V2 = SCHEMA_V1 + [
+    ("bufferDepth", 'I'),
+    ("replayLagSeconds", 'f'),
+]
+SCHEMAS = {1: SCHEMA_V1, 2: SCHEMA_V2}
+
+_FIELD_STRUCTS = {fmt: struct.Struct('<' + fmt) for _, fmt in SCHEMA_V2}
+
+
+def _pack_field(fmt, value):
+    if fmt in ('Q', 'I'):
+        value = int(value)
+    elif fmt == '?':
+        value = bool(value)
+    else:
+        value = float(value)
+    return _FIELD_STRUCTS[fmt].pack(value)
+
+
+def is_compact(payload):
+    """True si le payload est au format binaire (le JSON commence par '{')."""
+    return payload[:1] == MAGIC
+
+
+class MetricsEncoder:
+    """Encode les dicts de métriques, une keyframe complète tous les `keyframe_interval` messages."""
+
+    def __init__(self, keyframe_interval=10, version=VERSION):
+        self.keyframe_interval = keyframe_interval
+        self.version = version
+        self.schema = SCHEMAS[version]
+        self._seq = 0
+        self._key_seq = 0
+        self._keyframe = None
+
+    def reset(self):
+        """Force une keyframe au prochain message (après une perte de connexion)."""
+        self._keyframe = None
+
+    def encode(self, metrics, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        packed = [
+            _pack_field(fmt, metrics[name]) if name in metrics else None
+            for name, fmt in self.schema
+        ]
+
+        keyframe = self._keyframe is None or self._seq - self._key_seq >= self.keyframe_interval
+        if keyframe:
+            self._key_seq = self._seq
+            self._keyframe = packed
+            mask = sum(1 << i for i, value in enumerate(packed) if value is not None)
+        else:
+            # Seuls les champs différents de la keyframe de référence sont envoyés
+            mask = sum(
+                1 << i for i, value in enumerate(packed)
+                if value is not None and value != self._keyframe[i]
+            )
+
+        body = b''.join(packed[i] for i in range(len(packed)) if mask & (1 << i))
+        header = HEADER.pack(
+            MAGIC, self.version, FLAG_KEYFRAME if keyframe else 0,
+            self._seq & 0xFFFF, self._key_seq & 0xFFFF, timestamp, mask
+        )
+        self._seq += 1
+        return header + body
+
+
+class MetricsDecoder:
+    """Reconstitue le dict de métriques attendu par /api/machine-metrics.
+
+    Un décodeur par émetteur (topic) : il garde la dernière keyframe reçue.
+    """
+
+    def __init__(self):
+        self._keyframe = None
+        self._key_seq = None
+
+    def decode(self, payload):
+        """Retourne le dict décodé (avec 'timestamp'), ou None si la keyframe de référence manque.
+
+        Les lots rejoués depuis la file hors ligne arrivent en JSON : la
+        valeur retournée est alors une liste de dicts.
+        """
+        if not is_compact(payload):
+            return json.loads(payload)
+
+        magic, version, flags, seq, key_seq, timestamp, mask = HEADER.unpack_from(payload)
+        schema = SCHEMAS.get(version)
+        if schema is None:
+            raise ValueError(f"Unsupported metrics payload version: {version}")
+
+        values = {}
+        offset = HEADER.size
+        for i, (name, fmt) in enumerate(schema):
+            if mask & (1 << i):
+                field = _FIELD_STRUCTS[fmt]
+                values[name] = field.unpack_from(payload, offset)[0]
+                offset += field.size
+
+        if flags & FLAG_KEYFRAME:
+            self._keyframe = values
+            self._key_seq = key_seq
+            metrics = dict(values)
+        elif self._keyframe is None or key_seq != self._key_seq:
+            # Delta reçu sans sa keyframe (démarrage ou keyframe perdue)
+            return None
+        else:
+            metrics = {**self._keyframe, **values}
+
+        metrics = {name: round(value, 3) if isinstance(value, float) else value for name, value in metrics.items()}
+        metrics["timestamp"] = timestamp
+        return metrics
+
+
+if __name__ == '__main__':
+    import argparse
+    import paho.mqtt.client as mqtt
+
+    parser = argparse.ArgumentParser(description="Décode les métriques publiées sur un broker MQTT")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--topic", default="system/metrics/#")
+    args = parser.parse_args()
+
+    decoders = {}
+
+    def on_message(client, userdata, msg):
+        decoder = decoders.setdefault(msg.topic, MetricsDecoder())
+        metrics = decoder.decode(msg.payload)
+        print(f"{msg.topic} ({len(msg.payload)} octets) : {metrics}")
+
+    client = mqtt.Client()
+    client.on_message = on_message
+    client.connect(args.broker, args.port, 60)
+    client.subscribe(args.topic)
+    client.loop_forever()
@@ -0,0 +1,124 @@
+# metrics_collector.py
+import time
+
+import psutil
+
+try:
+    import GPUtil
+except ImportError:
+    GPUtil = None
+
+# Période d'échantillonnage par métrique (secondes). Les sondes lentes
+# (GPUtil lance un sous-processus, la batterie interroge l'ACPI) sont
+# rafraîchies moins souvent et leur dernière valeur est réutilisée.
+DEFAULT_INTERVALS = {
+    "cpu": 2,
+    "ram": 2,
+    "net": 2,
+    "disk": 30,
+    "gpu": 30,
+    "battery": 30,
+}
+
+
+class Probe:
+    """Sonde dont la valeur est mise en cache pendant son intervalle."""
+
+    def __init__(self, sample, interval):
+        self.sample = sample
+        self.interval = interval
+        self.value = {}
+        self.last_run = None
+
+    def read(self, now):
+        if self.last_run is None or now - self.last_run >= self.interval:
+            self.value = self.sample()
+            self.last_run = now
+        return self.value
+
+
+class MetricsCollector:
+    """Collecte non bloquante des métriques système.
+
+    - le CPU est mesuré par delta depuis l'appel précédent (interval=None),
+      sans bloquer une seconde ;
+    - le réseau est exprimé en octets/s à partir des deltas de compteurs ;
+    - chaque sonde a sa propre période ;
+    - le coût du collecteur lui-même est publié (collectorCpuPercent).
+    """
+
+    def __init__(self, intervals=None, disk_path='/'):
+        intervals = {**DEFAULT_INTERVALS, **(intervals or {})}
+        self.disk_path = disk_path
+
+        # Amorcer les mesures par delta : sans point de départ, le premier
+        # appel non bloquant de cpu_percent retourne 0
+        psutil.cpu_percent(interval=None)
+        self._last_net = (psutil.net_io_counters(), time.monotonic())
+
+        self.probes = {
+            "cpu": Probe(self._sample_cpu, intervals["cpu"]),
+            "ram": Probe(self._sample_ram, intervals["ram"]),
+            "net": Probe(self._sample_net, intervals["net"]),
+            "disk": Probe(self._sample_disk, intervals["disk"]),
+            "gpu": Probe(self._sample_gpu, intervals["gpu"]),
+            "battery": Probe(self._sample_battery, intervals["battery"]),
+        }
+        self._last_cpu_time = time.process_time()
+        self._last_wall = time.monotonic()
+
+    def _sample_cpu(self):
+        return {"cpu": psutil.cpu_percent(interval=None)}
+
+    def _sample_ram(self):
+        return {"ram": psutil.virtual_memory().percent}
+
+    def _sample_disk(self):
+        return {"disk": psutil.disk_usage(self.disk_path).percent}
+
+    def _sample_net(self):
+        counters = psutil.net_io_counters()
+        now = time.monotonic()
+        last_counters, last_time = self._last_net
+        elapsed = max(now - last_time, 1e-6)
+        sent_rate = max(counters.bytes_sent - last_counters.bytes_sent, 0) / elapsed
+        received_rate = max(counters.bytes_recv - last_counters.bytes_recv, 0) / elapsed
+        self._last_net = (counters, now)
+        return {
+            "bytesSent": counters.bytes_sent,
+            "bytesReceived": counters.bytes_recv,
+            "bytesSentPerSec": round(sent_rate, 1),
+            "bytesReceivedPerSec": round(received_rate, 1),
+        }
+
+    def _sample_gpu(self):
+        gpus = GPUtil.getGPUs() if GPUtil else []
+        return {
+            "gpu": gpus[0].load * 100 if gpus else 0,
+            "gpuMem": gpus[0].memoryUtil * 100 if gpus else 0,
+        }
+
+    def _sample_battery(self):
+        battery = psutil.sensors_battery() if hasattr(psutil, "sensors_battery") else None
+        return {
+            "battery": battery.percent if battery else 100,
+            "charging": battery.power_plugged if battery else False,
+        }
+
+    def collect(self):
+        """Retourne un dict de métriques au même format que l'ancienne boucle."""
+        start_cpu = time.process_time()
+        now = time.monotonic()
+
+        metrics = {}
+        for probe in self.probes.values():
+            metrics.update(probe.read(now))
+
+        # Surcoût du collecteur : temps CPU consommé par le processus depuis le dernier cycle
+        end_cpu = time.process_time()
+        wall = max(now - self._last_wall, 1e-6)
+        metrics["collectorMs"] = round((end_cpu - start_cpu) * 1000, 3)
+        metrics["collectorCpuPercent"] = round((end_cpu - self._last_cpu_time) / wall * 100, 3)
+        self._last_cpu_time = end_cpu
+        self._last_wall = now
+        return metrics
@@ -1,63 +1,99 @@
 # metrics_publisher.py
-import psutil
 import paho.mqtt.client as mqtt
+import os
 import time
 import json
-import GPUtil
+from metrics_collector import MetricsCollector
+from metrics_codec import MetricsEncoder
+from offline_buffer import OfflineBuffer, Replayer
 
 # --- Configuration MQTT ---
-MQTT_BROKER = "broker.hivemq.com"  # Broker public pour les tests
-MQTT_PORT = 1883
-MQTT_TOPIC = "system/metrics/rouzd-pc" # Utilisez un topic unique !
+MQTT_BROKER = os.environ.get("MQTT_BROKER", "broker.hivemq.com")  # Broker public pour les tests
+MQTT_PORT = int(os.environ.get("MQTT_PORT", 1883))
+MQTT_TOPIC = os.environ.get("MQTT_TOPIC", "system/metrics/rouzd-pc") # Utilisez un topic unique !
+PUBLISH_INTERVAL = 2  # secondes entre deux publications
+
+# Format des messages : "json" (par défaut) ou "compact" (binaire, delta par rapport à une keyframe)
+PAYLOAD_FORMAT = os.environ.get("METRICS_PAYLOAD_FORMAT", "json")
+KEYFRAME_INTERVAL = int(os.environ.get("METRICS_KEYFRAME_INTERVAL", 10))
+
+# File hors ligne : échantillons conservés sur disque tant que le broker est injoignable
+BUFFER_DIR = os.environ.get("METRICS_BUFFER_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics_buffer"))
+BUFFER_MAX_BYTES = int(os.environ.get("METRICS_BUFFER_MAX_BYTES", 50 * 1024 * 1024))
+REPLAY_BATCH_SIZE = int(os.environ.get("METRICS_REPLAY_BATCH_SIZE", 50))
+REPLAY_BATCHES_PER_SECOND = float(os.environ.get("METRICS_REPLAY_RATE", 2))
 
 # --- Connexion au broker ---
 client = mqtt.Client()
+connected = False
+encoder = MetricsEncoder(keyframe_interval=KEYFRAME_INTERVAL) if PAYLOAD_FORMAT == "compact" else None
 
 def on_connect(client, userdata, flags, rc):
+    global connected
     if rc == 0:
+        # Le pont a pu perdre la dernière keyframe : repartir d'une keyframe complète
+        if encoder:
+            encoder.reset()
+        connected = True
         print("Connecté au broker MQTT !")
     else:
         print(f"Échec de la connexion, code de retour : {rc}")
 
+def on_disconnect(client, userdata, rc):
+    global connected
+    connected = False
+    print(f"Déconnecté du broker MQTT (code {rc}), mise en file des échantillons.")
+
 client.on_connect = on_connect
-client.connect(MQTT_BROKER, MQTT_PORT, 60)
+client.on_disconnect = on_disconnect
+# Connexion asynchrone : le publisher démarre même si le broker est injoignable
+client.connect_async(MQTT_BROKER, MQTT_PORT, 60)
 client.loop_start() # Gère la reconnexion automatiquement
 
+buffer = OfflineBuffer(BUFFER_DIR, max_bytes=BUFFER_MAX_BYTES)
+replayer = Replayer(
+    client, MQTT_TOPIC, buffer, lambda: connected,
+    batch_size=REPLAY_BATCH_SIZE, batches_per_second=REPLAY_BATCHES_PER_SECOND
+)
+replayer.start()
+
 # --- Boucle de publication ---
+collector = MetricsCollector()
+
 try:
     while True:
-        # Collecte des métriques
-        gpus = GPUtil.getGPUs()
-        gpu_percent = gpus[0].load * 100 if gpus else 0
-        gpu_mem_percent = gpus[0].memoryUtil * 100 if gpus else 0
-
-        metrics = {
-            "cpu": psutil.cpu_percent(interval=1),
-            "ram": psutil.virtual_memory().percent,
-            "disk": psutil.disk_usage('/').percent,
-            "bytesSent": psutil.net_io_counters().bytes_sent,
-            "bytesReceived": psutil.net_io_counters().bytes_recv,
-            "gpu": gpu_percent,
-            "gpuMem": gpu_mem_percent,
-            # Pour la batterie, si applicable
-            "battery": psutil.sensors_battery().percent if hasattr(psutil, "sensors_battery") and psutil.sensors_battery() else 100,
-            "charging": psutil.sensors_battery().power_plugged if hasattr(psutil, "sensors_battery") and psutil.sensors_battery() else False,
-        }
-
-        # Publication des données en JSON
-        payload = json.dumps(metrics)
-        result = client.publish(MQTT_TOPIC, payload)
+        cycle_start = time.monotonic()
+
+        # Collecte des métriques (non bloquante, sondes lentes en cache)
+        metrics = collector.collect()
+        metrics["timestamp"] = time.time()
+        metrics["bufferDepth"] = buffer.depth
+        metrics["replayLagSeconds"] = round(buffer.replay_lag(), 1)
+
+        # Publication des données en JSON ou au format compact
+        # L'encodeur n'avance que si le message part : sinon la keyframe finirait dans la file
+        # hors ligne (en JSON) et les deltas suivants n'auraient plus de référence
+        if connected:
+            payload = encoder.encode(metrics, metrics["timestamp"]) if encoder else json.dumps(metrics)
+            status = client.publish(MQTT_TOPIC, payload).rc
+        else:
+            status = mqtt.MQTT_ERR_NO_CONN
         
         # Vérification du statut de la publication
-        status = result.rc
         if status == 0:
-            print(f"Données envoyées sur le topic `{MQTT_TOPIC}`: {payload}")
+            print(f"Données envoyées sur le topic `{MQTT_TOPIC}`: {payload if not encoder else f'{len(payload)} octets'}")
         else:
-            print(f"Échec de l'envoi du message sur le topic `{MQTT_TOPIC}`")
+            # Conserver l'échantillon sur disque, il sera rejoué à la reconnexion
+            if encoder:
+                encoder.reset()
+            buffer.append(metrics)
+            print(f"Échec de l'envoi du message sur le topic `{MQTT_TOPIC}`, {buffer.depth} échantillon(s) en file")
 
-        time.sleep(2) # Attendre 2 secondes
+        # Cadence fixe : le temps de collecte est déduit de l'attente
+        time.sleep(max(PUBLISH_INTERVAL - (time.monotonic() - cycle_start), 0))
 
 except KeyboardInterrupt:
     print("Publication arrêtée.")
+    replayer.stop()
     client.loop_stop()
     client.disconnect()
@@ -0,0 +1,283 @@
+# metrics_storage.py
+import os
+import threading
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+# Mode de stockage opt-in : METRICS_STORAGE_MODE=timeseries
+STORAGE_MODE = os.environ.get("METRICS_STORAGE_MODE", "plain")
+TIMESERIES_COLLECTION = os.environ.get("METRICS_TIMESERIES_COLLECTION", "machineMetricsTS")
+
+# Rétention par niveau de résolution (en secondes)
+RAW_RETENTION = int(os.environ.get("METRICS_RAW_RETENTION", 7 * 24 * 3600))
+MINUTE_RETENTION = int(os.environ.get("METRICS_1M_RETENTION", 30 * 24 * 3600))
+HOUR_RETENTION = int(os.environ.get("METRICS_1H_RETENTION", 365 * 24 * 3600))
+
+ROLLUP_INTERVAL = int(os.environ.get("METRICS_ROLLUP_INTERVAL", 60))
+# Repère d'insertion par niveau, pour recalculer les buckets touchés par des échantillons en retard
+ROLLUP_STATE_COLLECTION = f"{TIMESERIES_COLLECTION}_rollupState"
+ROLLUP_SETTLE_SECONDS = 5
+LATE_BUCKETS_PER_PASS = 200
+
+# Nombre minimal de points qu'un niveau doit fournir pour couvrir une fenêtre
+MIN_POINTS_PER_WINDOW = 20
+
+# Horodatage d'insertion posé par chaque écrivain (pont MQTT, /api/machine-metrics), indexé
+INGESTED_AT_FIELD = "ingestedAt"
+
+RESERVED_FIELDS = ["_id", "machineId", "timestamp", INGESTED_AT_FIELD]
+NUMERIC_TYPES = ["double", "int", "long", "decimal"]
+
+
+class Tier:
+    def __init__(self, name, unit, seconds, retention, collection_name):
+        self.name = name
+        self.unit = unit
+        self.seconds = seconds
+        self.retention = retention
+        self.collection_name = collection_name
+
+
+TIERS = [
+    Tier("raw", None, 0, RAW_RETENTION, TIMESERIES_COLLECTION),
+    Tier("1m", "minute", 60, MINUTE_RETENTION, f"{TIMESERIES_COLLECTION}_1m"),
+    Tier("1h", "hour", 3600, HOUR_RETENTION, f"{TIMESERIES_COLLECTION}_1h"),
+]
+
+
+def timeseries_enabled():
+    return STORAGE_MODE == "timeseries"
+
+
+def ingest_time():
+    """Valeur de INGESTED_AT_FIELD : UTC naïf, comme les dates relues par pymongo."""
+    return datetime.utcnow()
+
+
+def to_datetime(timestamp):
+    """Les collections time-series exigent un timestamp BSON Date."""
+    if isinstance(timestamp, datetime):
+        return timestamp
+    return datetime.utcfromtimestamp(float(timestamp))
+
+
+def ensure_collections(db):
+    """Crée (de façon idempotente) la collection time-series et les collections d'agrégats."""
+    existing = set(db.list_collection_names())
+    raw = TIERS[0]
+    if raw.collection_name not in existing:
+        db.create_collection(
+            raw.collection_name,
+            timeseries={"timeField": "timestamp", "metaField": "machineId", "granularity": "seconds"},
+            expireAfterSeconds=raw.retention
+        )
+    # Index secondaire sur un champ de mesure : MongoDB 6.0+ (sinon MetricsFollower parcourt les buckets)
+    try:
+        db[raw.collection_name].create_index(INGESTED_AT_FIELD, name=INGESTED_AT_FIELD)
+    except OperationFailure as e:
+        print(f"Index {INGESTED_AT_FIELD} non créé sur {raw.collection_name} : {e}")
+    for tier in TIERS[1:]:
+        collection = db[tier.collection_name]
+        collection.create_index(
+            [("machineId", ASCENDING), ("timestamp", ASCENDING)], unique=True
+        )
+        collection.create_index("timestamp", expireAfterSeconds=tier.retention)
+    return db[raw.collection_name]
+
+
+def select_tier(window_seconds):
+    """Niveau le plus grossier qui fournit assez de points et couvre encore la fenêtre."""
+    for tier in reversed(TIERS[1:]):
+        if window_seconds / tier.seconds >= MIN_POINTS_PER_WINDOW and window_seconds <= tier.retention:
+            return tier
+    return TIERS[0]
+
+
+def numeric_fields(root="$$ROOT"):
+    """Expression qui transforme un document en [{k, v}] pour ses seuls champs numériques."""
+    return {"$filter": {
+        "input": {"$objectToArray": root},
+        "cond": {"$and": [
+            {"$not": [{"$in": ["$$this.k", RESERVED_FIELDS]}]},
+            {"$in": [{"$type": "$$this.v"}, NUMERIC_TYPES]}
+        ]}
+    }}
+
+
+def rollup(db, tier, now=None):
+    """Agrège les données brutes en buckets complets (avg/min/max/p95) pour un niveau.
+
+    Le calcul repart du dernier bucket écrit ; $merge remplace les buckets
+    existants sur (machineId, timestamp), ce qui rend le job idempotent.
+    Les échantillons arrivés en retard (rejeu du tampon hors ligne d'un
+    poste) tombent avant ce point de reprise : les buckets qu'ils touchent
+    sont retrouvés par leur date d'insertion (INGESTED_AT_FIELD, indexé), à
+    partir du repère conservé dans ROLLUP_STATE_COLLECTION, puis recalculés
+    en entier.
+
+    p95 utilise $percentile (MongoDB 7.0+) ; sur un serveur plus ancien,
+    le champ vaut None.
+    """
+    now = now or datetime.utcnow()
+    until = _truncate(now, tier.seconds)
+    target = db[tier.collection_name]
+    last = target.find_one(sort=[("timestamp", -1)], projection={"timestamp": 1})
+    since = last["timestamp"] if last else until - timedelta(seconds=RAW_RETENTION)
+    with_p95 = supports_percentile(db)
+
+    late_buckets = _late_buckets(db, tier, since, now)
+    for i in range(0, len(late_buckets), LATE_BUCKETS_PER_PASS):
+        _merge_buckets(db, tier, {"$or": [
+            {"machineId": machine_id, "timestamp": {"$gte": bucket, "$lt": bucket + timedelta(seconds=tier.seconds)}}
+            for machine_id, bucket in late_buckets[i:i + LATE_BUCKETS_PER_PASS]
+        ]}, with_p95)
+
+    if since < until:
+        _merge_buckets(db, tier, {"timestamp": {"$gte": since, "$lt": until}}, with_p95)
+
+
+def _late_buckets(db, tier, since, now):
+    """(machineId, bucket) des échantillons insérés depuis le dernier passage mais datés d'avant `since`.
+
+    Le repère avance jusqu'à now - ROLLUP_SETTLE_SECONDS : un horodatage posé
+    juste avant une insertion encore en cours n'est pas sauté.
+    """
+    state = db[ROLLUP_STATE_COLLECTION]
+    upper = now - timedelta(seconds=ROLLUP_SETTLE_SECONDS)
+    previous = (state.find_one({"_id": tier.name}) or {}).get("ingestedUntil")
+    state.update_one({"_id": tier.name}, {"$set": {"ingestedUntil": upper}}, upsert=True)
+    if previous is None or previous >= upper:
+        return []
+
+    touched = db[TIERS[0].collection_name].aggregate([
+        {"$match": {
+            INGESTED_AT_FIELD: {"$gte": previous, "$lt": upper},
+            "timestamp": {"$lt": since}
+        }},
+        {"$group": {"_id": {
+            "machineId": "$machineId",
+            "bucket": {"$dateTrunc": {"date": "$timestamp", "unit": tier.unit}}
+        }}}
+    ])
+    return [(doc["_id"]["machineId"], doc["_id"]["bucket"]) for doc in touched]
+
+
+def supports_percentile(db):
+    """$percentile n'existe qu'à partir de MongoDB 7.0."""
+    try:
+        return db.client.server_info().get("versionArray", [0])[0] >= 7
+    except Exception:
+        return False
+
+
+def _merge_buckets(db, tier, match, with_p95=True):
+    """Recalcule et remplace les buckets des échantillons bruts sélectionnés par `match`."""
+    p95 = {"$percentile": {"input": "$fields.v", "p": [0.95], "method": "approximate"}} if with_p95 else None
+    pipeline = [
+        {"$match": match},
+        {"$project": {
+            "machineId": 1,
+            "bucket": {"$dateTrunc": {"date": "$timestamp", "unit": tier.unit}},
+            "fields": numeric_fields()
+        }},
+        {"$unwind": "$fields"},
+        {"$group": {
+            "_id": {"machineId": "$machineId", "timestamp": "$bucket", "k": "$fields.k"},
+            "avg": {"$avg": "$fields.v"},
+            "min": {"$min": "$fields.v"},
+            "max": {"$max": "$fields.v"},
+            **({"p95": p95} if p95 else {}),
+            "count": {"$sum": 1}
+        }},
+        {"$group": {
+            "_id": {"machineId": "$_id.machineId", "timestamp": "$_id.timestamp"},
+            "components": {"$push": {"k": "$_id.k", "v": {
+                "avg": "$avg", "min": "$min", "max": "$max",
+                "p95": {"$arrayElemAt": ["$p95", 0]} if p95 else None, "count": "$count"
+            }}}
+        }},
+        {"$project": {
+            "_id": 0,
+            "machineId": "$_id.machineId",
+            "timestamp": "$_id.timestamp",
+            "components": {"$arrayToObject": "$components"}
+        }},
+        {"$merge": {
+            "into": tier.collection_name,
+            "on": ["machineId", "timestamp"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ]
+    db[TIERS[0].collection_name].aggregate(pipeline)
+
+
+def _truncate(moment, seconds):
+    epoch = datetime(1970, 1, 1)
+    elapsed = int((moment - epoch).total_seconds())
+    return epoch + timedelta(seconds=elapsed - elapsed % seconds)
+
+
+def window_means(db, machine_id, window_seconds):
+    """Moyenne de chaque composant sur une fenêtre, lue sur le niveau adapté."""
+    tier = select_tier(window_seconds)
+    since = datetime.utcnow() - timedelta(seconds=window_seconds)
+    match = {"$match": {"machineId": machine_id, "timestamp": {"$gte": since}}}
+
+    if tier.name == "raw":
+        pipeline = [
+            match,
+            {"$project": {"fields": numeric_fields()}},
+            {"$unwind": "$fields"},
+            {"$group": {"_id": "$fields.k", "mean": {"$avg": "$fields.v"}}}
+        ]
+    else:
+        # Moyenne des buckets pondérée par leur nombre d'échantillons
+        pipeline = [
+            match,
+            {"$project": {"fields": {"$objectToArray": "$components"}}},
+            {"$unwind": "$fields"},
+            {"$group": {
+                "_id": "$fields.k",
+                "weighted": {"$sum": {"$multiply": ["$fields.v.avg", "$fields.v.count"]}},
+                "count": {"$sum": "$fields.v.count"}
+            }},
+            {"$project": {"mean": {"$divide": ["$weighted", "$count"]}}}
+        ]
+    results = db[tier.collection_name].aggregate(pipeline)
+    return tier, {r["_id"]: r["mean"] for r in results}
+
+
+def history(db, machine_id, window_seconds):
+    """Points d'historique d'une machine, lus sur le niveau adapté à la fenêtre."""
+    tier = select_tier(window_seconds)
+    since = datetime.utcnow() - timedelta(seconds=window_seconds)
+    points = list(db[tier.collection_name].find(
+        {"machineId": machine_id, "timestamp": {"$gte": since}},
+        {"_id": 0}
+    ).sort("timestamp", 1))
+    return tier, points
+
+
+class RollupScheduler(threading.Thread):
+    """Job d'arrière-plan qui met à jour les agrégats 1 minute et 1 heure."""
+
+    def __init__(self, db, interval=ROLLUP_INTERVAL):
+        super().__init__(daemon=True)
+        self.db = db
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            for tier in TIERS[1:]:
+                try:
+                    rollup(self.db, tier)
+                except Exception as e:
+                    print(f"Erreur lors de l'agrégation {tier.name} : {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,257 @@
+# mongo_setup.py
+"""Connexion MongoDB, index des collections et audit des requêtes.
+
+Les réglages du pool de connexions viennent de l'environnement
+(MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS,
+MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS, MONGO_APP_NAME) plutôt
+que d'être codés dans MONGO_URI. Les index sont créés au démarrage des
+services et peuvent être (re)créés ou vérifiés à la main :
+
+    python mongo_setup.py ensure-indexes
+    python mongo_setup.py explain        # code de sortie 1 si un parcours complet est détecté
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+import audit_log
+import metrics_storage
+
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("DB_NAME", "dashboardDB")
+PREDICTIONS_RETENTION_DAYS = int(os.environ.get("PREDICTIONS_RETENTION_DAYS", 30))
+
+# Variable d'environnement -> option de MongoClient (entiers)
+CLIENT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGO_MIN_POOL_SIZE": "minPoolSize",
+    "MONGO_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+    "MONGO_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+    "MONGO_SOCKET_TIMEOUT_MS": "socketTimeoutMS",
+}
+
+
+# =============================
+#   CONNEXION
+# =============================
+def client_options():
+    """Options de MongoClient définies dans l'environnement (les autres gardent la valeur du driver)."""
+    options = {option: int(os.environ[name]) for name, option in CLIENT_OPTIONS.items() if os.environ.get(name)}
+    if os.environ.get("MONGO_APP_NAME"):
+        options["appname"] = os.environ["MONGO_APP_NAME"]
+    return options
+
+
+def create_client(uri=None):
+    from pymongo import MongoClient
+    return MongoClient(uri or MONGO_URI, **client_options())
+
+
+# =============================
+#   INDEX
+# =============================
+def index_specs():
+    """(collection, clés, options) des index dont dépendent les requêtes des services."""
+    specs = [
+        # /api/predict-failure : dernières métriques du poste
+        ("dashboards", [("timestamp", DESCENDING)], {"name": "timestamp_desc"}),
+        # Fleet et prédictions : filtre par statut
+        ("machines", [("status", ASCENDING)], {"name": "status"}),
+        # Pont MQTT : machine d'un topic
+        ("machines", [("mqttTopic", ASCENDING)], {"name": "mqttTopic"}),
+        # Dernières prédictions d'une machine, purge par ancienneté
+        ("predictions", [("machineId", ASCENDING), ("createdAt", DESCENDING)], {"name": "machineId_createdAt"}),
+    ]
+    if PREDICTIONS_RETENTION_DAYS > 0:
+        specs.append(("predictions", [("createdAt", ASCENDING)], {
+            "name": "createdAt_ttl", "expireAfterSeconds": PREDICTIONS_RETENTION_DAYS * 86400
+        }))
+    # En mode time-series, metrics_storage gère ses propres collections
+    if not metrics_storage.timeseries_enabled():
+        specs.append(("machineMetrics", [("machineId", ASCENDING), ("timestamp", DESCENDING)],
+                      {"name": "machineId_timestamp"}))
+        # Suivi des métriques écrites par les autres processus (MetricsFollower)
+        specs.append(("machineMetrics", [(metrics_storage.INGESTED_AT_FIELD, ASCENDING)], {"name": "ingestedAt"}))
+    # Journal des connexions : lecture par utilisateur, purge après AUDIT_RETENTION_DAYS
+    specs.extend(audit_log.index_specs())
+    return specs
+
+
+def ensure_indexes(db, collections=None):
+    """Crée les index manquants (idempotent) et retourne leurs noms par collection.
+
+    Si un index TTL existe avec une autre durée, elle est mise à jour par
+    collMod au lieu d'échouer.
+    """
+    created = {}
+    for collection_name, keys, options in index_specs():
+        if collections is not None and collection_name not in collections:
+            continue
+        collection = db[collection_name]
+        try:
+            name = collection.create_index(keys, **options)
+        except OperationFailure as e:
+            # IndexOptionsConflict / IndexKeySpecsConflict : même clé, options différentes
+            if e.code not in (85, 86) or "expireAfterSeconds" not in options:
+                raise
+            db.command("collMod", collection_name, index={
+                "keyPattern": dict(keys), "expireAfterSeconds": options["expireAfterSeconds"]
+            })
+            name = options["name"]
+        created.setdefault(collection_name, []).append(name)
+
+    if metrics_storage.timeseries_enabled() and (collections is None or "machineMetrics" in collections):
+        metrics_storage.ensure_collections(db)
+    return created
+
+
+# =============================
+#   AUDIT DES REQUÊTES
+# =============================
+def query_shapes(db):
+    """(nom, collection, commande) des requêtes émises par les services, avec des valeurs d'exemple."""
+    from fleet_prediction import fleet_window_pipeline  # NumPy : inutile aux services sans prédiction
+
+    sample = db["machines"].find_one({}, {"_id": 1}) or {"_id": ObjectId()}
+    machine_id = str(sample["_id"])
+    since = datetime.utcnow() - timedelta(minutes=5)
+    metrics_name = metrics_storage.TIERS[0].collection_name if metrics_storage.timeseries_enabled() else "machineMetrics"
+
+    shapes = [
+        ("predict-failure (limit)", "dashboards", {"aggregate": "dashboards", "pipeline": [
+            {"$sort": {"timestamp": -1}}, {"$limit": 50},
+            {"$project": {"_id": 0, "cpu": 1, "ram": 1, "disk": 1, "battery": 1, "charging": 1}}
+        ], "cursor": {}}),
+        ("predict-failure (seconds)", "dashboards", {"aggregate": "dashboards", "pipeline": [
+            {"$match": {"timestamp": {"$gte": since}}}, {"$sort": {"timestamp": -1}},
+            {"$project": {"_id": 0, "cpu": 1, "ram": 1, "disk": 1, "battery": 1, "charging": 1}}
+        ], "cursor": {}}),
+        ("metric store rebuild", metrics_name, {
+            "find": metrics_name, "filter": {"machineId": machine_id}, "sort": {"timestamp": -1}, "limit": 50
+        }),
+        ("predict-fleet windows", "machines", {
+            "aggregate": "machines", "pipeline": fleet_window_pipeline([sample["_id"]], 50, metrics_name), "cursor": {}
+        }),
+        ("predict-fleet machines", "machines", {
+            "find": "machines", "filter": {"status": "active"}, "projection": {"name": 1, "components": 1}
+        }),
+        ("latest predictions", "predictions", {
+            "find": "predictions", "filter": {"machineId": machine_id}, "sort": {"createdAt": -1}, "limit": 20
+        }),
+        ("login attempts", audit_log.AUDIT_COLLECTION, {
+            "find": audit_log.AUDIT_COLLECTION, "filter": {"userId": "sample-user"}, "sort": {"timestamp": -1}, "limit": 50
+        }),
+    ]
+    if metrics_storage.timeseries_enabled():
+        for tier in metrics_storage.TIERS[1:]:
+            shapes.append((f"history {tier.name}", tier.collection_name, {
+                "find": tier.collection_name,
+                "filter": {"machineId": machine_id, "timestamp": {"$gte": since}},
+                "sort": {"timestamp": 1}
+            }))
+    return shapes
+
+
+def _winning_stages(explain):
+    """Étapes des plans gagnants, quelle que soit la forme de l'explain (find, aggregate, SBE)."""
+    stages = []
+
+    def walk_plan(plan):
+        if isinstance(plan, dict):
+            if "stage" in plan:
+                stages.append(plan)
+            for key in ("inputStage", "queryPlan"):
+                walk_plan(plan.get(key))
+            for child in plan.get("inputStages", []):
+                walk_plan(child)
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "winningPlan":
+                    walk_plan(value)
+                elif key != "rejectedPlans":
+                    walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(explain)
+    return stages
+
+
+def _execution_totals(explain):
+    totals = {"docsExamined": 0, "keysExamined": 0, "nReturned": 0}
+
+    def walk(node):
+        if isinstance(node, dict):
+            stats = node.get("executionStats")
+            if isinstance(stats, dict):
+                totals["docsExamined"] += stats.get("totalDocsExamined", 0)
+                totals["keysExamined"] += stats.get("totalKeysExamined", 0)
+                totals["nReturned"] += stats.get("nReturned", 0)
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(explain)
+    return totals
+
+
+def explain_queries(db):
+    """Exécute explain (executionStats) sur chaque requête et signale les parcours complets."""
+    report = []
+    for name, collection, command in query_shapes(db):
+        try:
+            explain = db.command("explain", command, verbosity="executionStats")
+        except OperationFailure as e:
+            report.append({"query": name, "collection": collection, "error": str(e)})
+            continue
+        stages = _winning_stages(explain)
+        indexes = sorted({s["indexName"] for s in stages if s.get("indexName")})
+        report.append({
+            "query": name,
+            "collection": collection,
+            "collscan": any(s["stage"] == "COLLSCAN" for s in stages),
+            "indexes": indexes,
+            **_execution_totals(explain)
+        })
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["ensure-indexes", "explain"])
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--json", action="store_true", help="rapport au format JSON")
+    args = parser.parse_args()
+
+    db = create_client(args.mongo_uri)[args.db]
+    if args.command == "ensure-indexes":
+        for collection_name, names in ensure_indexes(db).items():
+            print(f"{collection_name}: {', '.join(names)}")
+    else:
+        report = explain_queries(db)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            for entry in report:
+                if "error" in entry:
+                    print(f"ERREUR    {entry['query']:28s} {entry['collection']:20s} {entry['error']}")
+                    continue
+                flag = "COLLSCAN" if entry["collscan"] else "ok"
+                print(f"{flag:9s} {entry['query']:28s} {entry['collection']:20s} "
+                      f"index={','.join(entry['indexes']) or '-'} docs={entry['docsExamined']} "
+                      f"clés={entry['keysExamined']} retournés={entry['nReturned']}")
+        raise SystemExit(1 if any(entry.get("collscan") for entry in report) else 0)
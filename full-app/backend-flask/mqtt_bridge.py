@@ -0,0 +1,289 @@
+# mqtt_bridge.py
+"""Pont d'ingestion MQTT -> MongoDB avec écritures groupées.
+
+Les messages des topics system/metrics/# sont décodés par un pool de
+workers (un topic est toujours traité par le même worker, ce qui préserve
+l'ordre nécessaire au format compact), validés, horodatés puis écrits par
+lots avec insert_many(ordered=False). Les files sont bornées : si Mongo
+ralentit, les workers puis la boucle réseau MQTT se bloquent, et c'est le
+broker (QoS 1) qui retient les messages. Les documents portent l'_id de
+la machine dont le champ mqttTopic correspond au topic, comme les
+métriques envoyées à /api/machine-metrics.
+
+Le service de prédiction relit ces documents (MetricsFollower, toutes les
+METRICS_SYNC_INTERVAL secondes, d'après leur champ ingestedAt) : fenêtres,
+cache et flux SSE restent à jour sans passer par /api/machine-metrics.
+
+    python mqtt_bridge.py --broker localhost --workers 4 --batch-size 500
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+import zlib
+
+import paho.mqtt.client as mqtt
+from pymongo.errors import BulkWriteError
+
+import metrics_storage
+from metrics_codec import MetricsDecoder
+from mongo_setup import create_client
+from offline_buffer import REPLAY_SUFFIX
+from prediction_cache import PredictionCache
+
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("DB_NAME", "dashboardDB")
+
+
+class BridgeStats:
+    """Compteurs de débit, de taille de lot et de retard d'ingestion."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.received = 0
+        self.written = 0
+        self.invalid = 0
+        self.dropped = 0
+        self.batches = 0
+        self.max_lag = 0.0
+        self._lag_total = 0.0
+        self._last_report = (time.monotonic(), 0, 0)
+
+    def add(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def record_batch(self, size, lags):
+        with self._lock:
+            self.batches += 1
+            self.written += size
+            self._lag_total += sum(lags)
+            if lags:
+                self.max_lag = max(self.max_lag, max(lags))
+
+    def report(self):
+        with self._lock:
+            now = time.monotonic()
+            last_time, last_received, last_written = self._last_report
+            elapsed = max(now - last_time, 1e-6)
+            report = {
+                'received_per_s': round((self.received - last_received) / elapsed, 1),
+                'written_per_s': round((self.written - last_written) / elapsed, 1),
+                'avg_batch_size': round(self.written / self.batches, 1) if self.batches else 0,
+                'avg_lag_s': round(self._lag_total / self.written, 3) if self.written else 0,
+                'max_lag_s': round(self.max_lag, 3),
+                'invalid': self.invalid,
+                'dropped': self.dropped
+            }
+            self._last_report = (now, self.received, self.written)
+            self.max_lag = 0.0
+            return report
+
+
+class MachineResolver:
+    """Associe un topic à l'_id de la machine déclarée avec ce mqttTopic (modèle Machine du backend Node).
+
+    Les résultats, y compris les topics inconnus, sont gardés `ttl` secondes :
+    une machine créée après coup est reconnue sans redémarrer le pont.
+    """
+
+    def __init__(self, machines_collection, ttl=60, max_entries=10000):
+        self.machines_collection = machines_collection
+        self._cache = PredictionCache(max_entries=max_entries, ttl=ttl)
+
+    def __call__(self, topic):
+        machine_id = self._cache.get(topic)
+        if machine_id is None:
+            # mqttTopic complet (system/metrics/<machine>) ou seulement son dernier segment
+            machine = self.machines_collection.find_one(
+                {"mqttTopic": {"$in": [topic, topic.rsplit('/', 1)[-1]]}}, {"_id": 1}
+            )
+            machine_id = str(machine["_id"]) if machine else False
+            self._cache.put(topic, machine_id)
+        return machine_id or None
+
+
+def validate(sample, topic, received_at, resolve=None):
+    """Retourne le document à insérer, ou None si l'échantillon est invalide.
+
+    Sans machineId dans l'échantillon, la machine est retrouvée par son
+    mqttTopic (`resolve`) ; un topic non déclaré garde son dernier segment.
+    """
+    if not isinstance(sample, dict):
+        return None
+    doc = dict(sample)
+    if not doc.get("machineId"):
+        # system/metrics/<machine> ou system/metrics/<machine>/replay (file hors ligne)
+        topic = topic.removesuffix(REPLAY_SUFFIX)
+        doc["machineId"] = (resolve and resolve(topic)) or topic.rsplit('/', 1)[-1]
+    doc["machineId"] = str(doc["machineId"])
+    timestamp = doc.get("timestamp", received_at)
+    if not isinstance(timestamp, (int, float)) or isinstance(timestamp, bool):
+        return None
+    # Même convention que /api/machine-metrics selon le mode de stockage
+    doc["timestamp"] = metrics_storage.to_datetime(timestamp) if metrics_storage.timeseries_enabled() else float(timestamp)
+    return doc
+
+
+class DecodeWorker(threading.Thread):
+    def __init__(self, inbox, outbox, stats, put_timeout, resolve=None):
+        super().__init__(daemon=True)
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stats = stats
+        self.put_timeout = put_timeout
+        self.resolve = resolve
+        self.decoders = {}
+
+    def run(self):
+        while True:
+            topic, payload, received_at = self.inbox.get()
+            try:
+                decoder = self.decoders.setdefault(topic, MetricsDecoder())
+                decoded = decoder.decode(payload)
+            except Exception:
+                self.stats.add(invalid=1)
+                continue
+            if decoded is None:
+                self.stats.add(invalid=1)  # delta sans keyframe
+                continue
+            # Un lot rejoué par le publisher arrive sous forme de liste
+            for sample in decoded if isinstance(decoded, list) else [decoded]:
+                try:
+                    doc = validate(sample, topic, received_at, self.resolve)
+                except Exception as e:
+                    # Mongo injoignable : l'écriture échouerait de toute façon
+                    print(f"Impossible de retrouver la machine du topic {topic} : {e}")
+                    self.stats.add(dropped=1)
+                    continue
+                if doc is None:
+                    self.stats.add(invalid=1)
+                    continue
+                try:
+                    # Bloque si l'écrivain est en retard : c'est la contre-pression
+                    self.outbox.put((doc, received_at), timeout=self.put_timeout)
+                except queue.Full:
+                    self.stats.add(dropped=1)
+
+
+class BatchWriter(threading.Thread):
+    """Écrit par lots, dès que `batch_size` documents sont prêts ou après `flush_interval`."""
+
+    def __init__(self, collection, inbox, stats, batch_size, flush_interval):
+        super().__init__(daemon=True)
+        self.collection = collection
+        self.inbox = inbox
+        self.stats = stats
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+    def run(self):
+        batch, received = [], []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(deadline - time.monotonic(), 0)
+            try:
+                doc, received_at = self.inbox.get(timeout=timeout)
+                batch.append(doc)
+                received.append(received_at)
+            except queue.Empty:
+                pass
+            if len(batch) >= self.batch_size or (batch and time.monotonic() >= deadline):
+                self.flush(batch, received)
+                batch, received = [], []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+    def flush(self, batch, received):
+        # Horodatage relu par MetricsFollower : posé au plus près de l'insertion
+        ingested_at = metrics_storage.ingest_time()
+        for doc in batch:
+            doc[metrics_storage.INGESTED_AT_FIELD] = ingested_at
+        try:
+            self.collection.insert_many(batch, ordered=False)
+            written = len(batch)
+        except BulkWriteError as e:
+            written = e.details.get("nInserted", 0)
+            self.stats.add(invalid=len(batch) - written)
+        except Exception as e:
+            print(f"Erreur d'écriture Mongo ({len(batch)} documents perdus) : {e}")
+            self.stats.add(dropped=len(batch))
+            return
+        now = time.time()
+        self.stats.record_batch(written, [now - r for r in received[:written]])
+
+
+class MqttBridge:
+    def __init__(self, collection, workers=4, batch_size=500, flush_interval=1.0,
+                 queue_size=10000, put_timeout=30, resolve=None):
+        self.stats = BridgeStats()
+        self.put_timeout = put_timeout
+        write_queue = queue.Queue(maxsize=queue_size)
+        self.inboxes = [queue.Queue(maxsize=queue_size // workers or 1) for _ in range(workers)]
+        self.workers = [DecodeWorker(inbox, write_queue, self.stats, put_timeout, resolve) for inbox in self.inboxes]
+        self.writer = BatchWriter(collection, write_queue, self.stats, batch_size, flush_interval)
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+        self.writer.start()
+
+    def on_message(self, client, userdata, msg):
+        self.stats.add(received=1)
+        # Même topic -> même worker (ordre garanti pour le décodage delta)
+        inbox = self.inboxes[zlib.crc32(msg.topic.encode()) % len(self.inboxes)]
+        try:
+            inbox.put((msg.topic, msg.payload, time.time()), timeout=self.put_timeout)
+        except queue.Full:
+            self.stats.add(dropped=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--broker", default=os.environ.get("MQTT_BROKER", "localhost"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("MQTT_PORT", 1883)))
+    parser.add_argument("--topic", default="system/metrics/#")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--flush-interval", type=float, default=1.0, help="secondes")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--report-interval", type=float, default=10.0, help="secondes")
+    args = parser.parse_args()
+
+    db = create_client(MONGO_URI)[DB_NAME]
+    if metrics_storage.timeseries_enabled():
+        collection = metrics_storage.ensure_collections(db)
+    else:
+        collection = db["machineMetrics"]
+
+    bridge = MqttBridge(collection, args.workers, args.batch_size, args.flush_interval, args.queue_size,
+                        resolve=MachineResolver(db["machines"]))
+    bridge.start()
+
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            print(f"Connecté au broker MQTT, abonnement à {args.topic}")
+            client.subscribe(args.topic, qos=1)
+        else:
+            print(f"Échec de la connexion, code de retour : {rc}")
+
+    client = mqtt.Client()
+    client.on_connect = on_connect
+    client.on_message = bridge.on_message
+    client.connect(args.broker, args.port, 60)
+    client.loop_start()
+
+    try:
+        while True:
+            time.sleep(args.report_interval)
+            print(f"Pont MQTT -> Mongo : {bridge.stats.report()}")
+    except KeyboardInterrupt:
+        print("Pont arrêté.")
+        client.loop_stop()
+        client.disconnect()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+# offline_buffer.py
+import json
+import os
+import struct
+import threading
+import time
+
+RECORD_HEADER = struct.Struct('<I')
+CURSOR_FILE = "cursor.json"
+# Les lots rejoués partent sur un sous-topic : les tableaux de bord, abonnés au
+# topic exact, ne reçoivent que des échantillons en direct
+REPLAY_SUFFIX = "/replay"
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_SEGMENT_BYTES = 1024 * 1024
+
+
+class OfflineBuffer:
+    """File d'attente sur disque en segments append-only, de taille bornée.
+
+    Les échantillons sont ajoutés à la fin du segment courant ; un curseur
+    persistant (segment, position) indique le prochain enregistrement à
+    rejouer, ce qui permet de reprendre après un redémarrage. Quand la
+    taille totale dépasse `max_bytes`, les plus anciens segments sont
+    supprimés (et comptés dans `dropped`). Un enregistrement tronqué par un
+    arrêt brutal est retiré de la fin du dernier segment à l'ouverture ; un
+    enregistrement illisible est sauté au rejeu (compté dans `corrupted`).
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, segment_bytes=DEFAULT_SEGMENT_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.dropped = 0
+        self.corrupted = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self._segments = sorted(
+            int(name[8:16]) for name in os.listdir(directory)
+            if name.startswith("segment-") and name.endswith(".log")
+        )
+        self._repair_tail()
+        self._cursor = self._load_cursor()
+        self._depth = self._count_pending()
+        self._writer = None
+
+    # --- Segments ---
+    def _path(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:08d}.log")
+
+    def _load_cursor(self):
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE)) as f:
+                cursor = json.load(f)
+            return cursor["segment"], cursor["offset"]
+        except (OSError, ValueError, KeyError):
+            return (self._segments[0] if self._segments else 0), 0
+
+    def _save_cursor(self):
+        path = os.path.join(self.directory, CURSOR_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"segment": self._cursor[0], "offset": self._cursor[1]}, f)
+        os.replace(path + ".tmp", path)
+
+    def _read_records(self, segment, offset, limit=None):
+        """Lit les enregistrements d'un segment à partir d'une position : [(offset suivant, octets)]."""
+        records = []
+        try:
+            with open(self._path(segment), "rb") as f:
+                f.seek(offset)
+                while limit is None or len(records) < limit:
+                    header = f.read(RECORD_HEADER.size)
+                    if len(header) < RECORD_HEADER.size:
+                        break
+                    (length,) = RECORD_HEADER.unpack(header)
+                    data = f.read(length)
+                    if len(data) < length:
+                        break  # enregistrement tronqué (arrêt brutal pendant l'écriture)
+                    records.append((f.tell(), data))
+        except FileNotFoundError:
+            pass
+        return records
+
+    def _repair_tail(self):
+        """Coupe le dernier segment après son dernier enregistrement complet.
+
+        Sans cela, les ajouts suivants (mode "ab") seraient écrits à la suite
+        des octets partiels et rendraient la suite du segment illisible.
+        """
+        if not self._segments:
+            return
+        path = self._path(self._segments[-1])
+        records = self._read_records(self._segments[-1], 0)
+        end = records[-1][0] if records else 0
+        if os.path.getsize(path) > end:
+            with open(path, "r+b") as f:
+                f.truncate(end)
+
+    def _count_pending(self):
+        segment, offset = self._cursor
+        return sum(
+            len(self._read_records(s, offset if s == segment else 0))
+            for s in self._segments if s >= segment
+        )
+
+    def _size(self):
+        return sum(os.path.getsize(self._path(s)) for s in self._segments if os.path.exists(self._path(s)))
+
+    def _enforce_limit(self):
+        while len(self._segments) > 1 and self._size() > self.max_bytes:
+            oldest = self._segments.pop(0)
+            skipped = self._read_records(oldest, self._cursor[1] if self._cursor[0] == oldest else 0)
+            if self._cursor[0] <= oldest:
+                self.dropped += len(skipped)
+                self._depth -= len(skipped)
+                self._cursor = (self._segments[0], 0)
+                self._save_cursor()
+            os.remove(self._path(oldest))
+
+    def _open_writer(self):
+        """Ouvre le segment d'écriture : le dernier s'il a encore de la place, sinon un nouveau."""
+        if self._writer is not None:
+            self._writer.close()
+            segment = self._segments[-1] + 1
+        elif self._segments and os.path.getsize(self._path(self._segments[-1])) < self.segment_bytes:
+            segment = self._segments[-1]
+        else:
+            segment = (self._segments[-1] + 1) if self._segments else self._cursor[0]
+        if segment not in self._segments:
+            self._segments.append(segment)
+        self._writer = open(self._path(segment), "ab")
+
+    # --- API publique ---
+    def append(self, sample):
+        """Ajoute un échantillon (dict sérialisable en JSON)."""
+        data = json.dumps(sample).encode()
+        with self._lock:
+            if self._writer is None or self._writer.tell() >= self.segment_bytes:
+                self._open_writer()
+            self._writer.write(RECORD_HEADER.pack(len(data)) + data)
+            self._writer.flush()
+            self._depth += 1
+            self._enforce_limit()
+
+    def peek(self, count):
+        """Retourne jusqu'à `count` échantillons en attente et le jeton à passer à commit()."""
+        with self._lock:
+            samples = []
+            consumed = bad = 0
+            cursor = self._cursor
+            for segment in [s for s in self._segments if s >= self._cursor[0]]:
+                offset = self._cursor[1] if segment == self._cursor[0] else 0
+                for next_offset, data in self._read_records(segment, offset, count - len(samples)):
+                    cursor = (segment, next_offset)
+                    consumed += 1
+                    try:
+                        samples.append(json.loads(data))
+                    except ValueError:
+                        # Illisible : sauté (le curseur avance quand même) plutôt que de bloquer le rejeu
+                        bad += 1
+                if len(samples) >= count:
+                    break
+            return samples, (cursor, consumed, bad)
+
+    def commit(self, token):
+        """Marque comme rejoués les échantillons retournés par peek()."""
+        cursor, count, bad = token
+        with self._lock:
+            self._cursor = cursor
+            self._depth = max(self._depth - count, 0)
+            self.corrupted += bad
+            # Supprimer les segments entièrement rejoués (sauf celui en cours d'écriture)
+            while len(self._segments) > 1 and self._segments[0] < cursor[0]:
+                os.remove(self._path(self._segments.pop(0)))
+            self._save_cursor()
+
+    @property
+    def depth(self):
+        return self._depth
+
+    def replay_lag(self):
+        """Âge (secondes) du plus ancien échantillon en attente, 0 si la file est vide."""
+        samples, _ = self.peek(1)
+        if not samples or "timestamp" not in samples[0]:
+            return 0.0
+        return max(time.time() - samples[0]["timestamp"], 0.0)
+
+
+class Replayer(threading.Thread):
+    """Rejoue la file hors ligne par lots horodatés, en QoS 1 et à débit limité.
+
+    Chaque lot est publié sous forme de tableau JSON sur `<topic>/replay`
+    (lu par mqtt_bridge.py via system/metrics/#) ; il n'est retiré de la
+    file qu'après l'accusé de réception du broker.
+    """
+
+    def __init__(self, client, topic, buffer, is_connected, batch_size=50, batches_per_second=2, ack_timeout=10):
+        super().__init__(daemon=True)
+        self.client = client
+        self.topic = topic + REPLAY_SUFFIX
+        self.buffer = buffer
+        self.is_connected = is_connected
+        self.batch_size = batch_size
+        self.period = 1.0 / batches_per_second
+        self.ack_timeout = ack_timeout
+        self.replayed = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            if not self.is_connected() or self.buffer.depth == 0:
+                self._stop_event.wait(1)
+                continue
+            start = time.monotonic()
+            try:
+                self._replay_batch()
+            except Exception as e:
+                print(f"Erreur lors du rejeu de la file hors ligne : {e}")
+            self._stop_event.wait(max(self.period - (time.monotonic() - start), 0))
+
+    def _replay_batch(self):
+        samples, token = self.buffer.peek(self.batch_size)
+        if not samples:
+            # Lot entièrement illisible : avancer le curseur
+            self.buffer.commit(token)
+            return
+        info = self.client.publish(self.topic, json.dumps(samples), qos=1)
+        try:
+            info.wait_for_publish(timeout=self.ack_timeout)
+        except (ValueError, RuntimeError):
+            pass
+        if info.is_published():
+            self.buffer.commit(token)
+            self.replayed += len(samples)
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,121 @@
+# prediction_cache.py
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 300
+
+
+class PredictionCache:
+    """Cache LRU à expiration des résultats de prédiction.
+
+    La clé contient l'horodatage de la dernière métrique reçue : tant
+    qu'aucune nouvelle métrique n'arrive, le résultat est réutilisé tel quel.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PredictionWriter:
+    """Persiste les prédictions d'une machine, uniquement quand elles changent.
+
+    Chaque écriture fait un seul insert_many pour tous les composants plus
+    la mise à jour de overallHealth. En mode asynchrone, les écritures
+    passent par un thread dédié et la réponse HTTP n'attend pas Mongo.
+    """
+
+    def __init__(self, machines_collection, predictions_collection, asynchronous=False, max_pending=1000):
+        self.machines_collection = machines_collection
+        self.predictions_collection = predictions_collection
+        self.asynchronous = asynchronous
+        self._last_written = {}
+        self._lock = threading.Lock()
+        if asynchronous:
+            self._queue = queue.Queue(maxsize=max_pending)
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, machine_id, object_id, overall_health, predictions):
+        """Enregistre le résultat s'il diffère du dernier écrit ; retourne True si une écriture a lieu."""
+        signature = (overall_health, tuple(
+            (p['component'], p['risk_percent'], p['value']) for p in predictions
+        ))
+        with self._lock:
+            if self._last_written.get(machine_id) == signature:
+                return False
+            self._last_written[machine_id] = signature
+
+        job = (machine_id, object_id, overall_health, predictions)
+        if self.asynchronous:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                print(f"File d'écriture des prédictions pleine, résultat ignoré pour {machine_id}")
+                with self._lock:
+                    self._last_written.pop(machine_id, None)
+                return False
+        else:
+            try:
+                self._write(*job)
+            except Exception:
+                # Non persisté : le prochain résultat identique doit être réécrit
+                with self._lock:
+                    self._last_written.pop(machine_id, None)
+                raise
+        return True
+
+    def _write(self, machine_id, object_id, overall_health, predictions):
+        self.machines_collection.update_one(
+            {"_id": object_id},
+            {"$set": {"overallHealth": overall_health}}
+        )
+        if predictions:
+            created_at = datetime.utcnow()
+            self.predictions_collection.insert_many([{
+                "machineId": machine_id,
+                "component": p['component'],
+                "risk_percent": p['risk_percent'],
+                "value": p['value'],
+                "unit": p['unit'],
+                "message": p['message'],
+                "createdAt": created_at
+            } for p in predictions])
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._write(*job)
+            except Exception as e:
+                print(f"Erreur lors de l'écriture des prédictions : {e}")
+                with self._lock:
+                    self._last_written.pop(job[0], None)
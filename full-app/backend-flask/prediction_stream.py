@@ -0,0 +1,153 @@
+# prediction_stream.py
+"""Diffusion des prédictions aux clients abonnés (SSE ou long-poll).
+
+Les prédictions sont recalculées à l'ingestion de chaque métrique ; un
+événement n'est publié que si le risque d'un composant a varié de plus de
+`delta` points depuis le dernier envoi (ou si la liste des composants a
+changé). Les événements sont numérotés et conservés dans un tampon
+circulaire : un client se contente de retenir le dernier numéro reçu.
+
+Aucun thread n'est créé par abonné : tous attendent sur une même
+condition, réveillée une fois par événement. En revanche, un flux ouvert
+occupe le thread (ou le worker synchrone) qui le sert : avec le serveur de
+développement ou gunicorn en workers synchrones, le nombre de flux et de
+long-polls simultanés est donc borné par `max_streams`
+(PREDICTION_STREAM_MAX_CLIENTS), au-delà le service répond 503. Avec un
+worker asynchrone (gunicorn -k gevent, à installer), un abonné ne coûte
+qu'une greenlet et la limite peut être relevée.
+
+Les numéros d'événement repartent de zéro au redémarrage du service : un
+client qui présente un numéro plus grand que le curseur courant est traité
+comme un nouveau client (état courant, puis changements).
+"""
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+DEFAULT_DELTA = 2.0
+DEFAULT_HISTORY = 10000
+DEFAULT_MAX_STREAMS = 50
+KEEPALIVE_SECONDS = 15
+
+
+class PredictionHub:
+    def __init__(self, delta=DEFAULT_DELTA, history=DEFAULT_HISTORY, max_streams=DEFAULT_MAX_STREAMS):
+        self.delta = delta
+        self.max_streams = max_streams
+        self.streams = 0
+        self._events = deque(maxlen=history)
+        self._latest = {}
+        self._last_risks = {}
+        self._seq = itertools.count(1)
+        self._cursor = 0
+        self._condition = threading.Condition()
+        self.subscribers = 0
+        self.published = 0
+        self.suppressed = 0
+
+    def _changed(self, machine_id, risks):
+        previous = self._last_risks.get(machine_id)
+        if previous is None or previous.keys() != risks.keys():
+            return True
+        return any(abs(risk - previous[name]) > self.delta for name, risk in risks.items())
+
+    def publish(self, machine_id, result):
+        """Publie le résultat si un risque a suffisamment changé ; retourne True si publié."""
+        risks = {p['component']: p['risk_percent'] for p in result['predictions']}
+        with self._condition:
+            self._latest[machine_id] = result
+            if not self._changed(machine_id, risks):
+                self.suppressed += 1
+                return False
+            self._last_risks[machine_id] = risks
+            self._cursor = next(self._seq)
+            self._events.append((self._cursor, machine_id, result))
+            self.published += 1
+            self._condition.notify_all()
+        return True
+
+    @property
+    def cursor(self):
+        return self._cursor
+
+    def open_stream(self):
+        """Réserve une place d'abonné (flux SSE ou long-poll) ; False si la limite est atteinte."""
+        with self._condition:
+            if self.streams >= self.max_streams:
+                return False
+            self.streams += 1
+            return True
+
+    def close_stream(self):
+        with self._condition:
+            self.streams = max(self.streams - 1, 0)
+
+    def is_stale(self, since):
+        """True si `since` vient d'avant un redémarrage (numéro supérieur au curseur)."""
+        return since > self._cursor
+
+    def snapshot(self, machine_ids=None):
+        """Dernier résultat connu de chaque machine (toutes si machine_ids est None)."""
+        with self._condition:
+            if machine_ids is None:
+                return dict(self._latest)
+            return {m: self._latest[m] for m in machine_ids if m in self._latest}
+
+    def _collect(self, since, machine_ids):
+        if self._events and since < self._events[0][0] - 1:
+            # Le client a manqué des événements sortis du tampon
+            since = self._events[0][0] - 1
+        return [
+            event for event in self._events
+            if event[0] > since and (machine_ids is None or event[1] in machine_ids)
+        ]
+
+    def wait(self, since, machine_ids=None, timeout=KEEPALIVE_SECONDS):
+        """Événements publiés après `since` pour ces machines ; attend jusqu'à `timeout` s'il n'y en a pas."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            if since > self._cursor:
+                since = 0
+            self.subscribers += 1
+            try:
+                while True:
+                    if self._cursor > since:
+                        events = self._collect(since, machine_ids)
+                        if events:
+                            return events, self._cursor
+                        # Rien pour ce filtre : inutile de réexaminer ces événements
+                        since = self._cursor
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return [], since
+                    self._condition.wait(remaining)
+            finally:
+                self.subscribers -= 1
+
+
+def format_sse(seq, machine_id, result, event="prediction"):
+    lines = f"event: {event}\n"
+    if seq is not None:
+        lines += f"id: {seq}\n"
+    return lines + f"data: {json.dumps({'machineId': machine_id, **result})}\n\n"
+
+
+def sse_stream(hub, machine_ids=None, last_event_id=None, keepalive=KEEPALIVE_SECONDS):
+    """Générateur de flux text/event-stream pour une réponse Flask."""
+    if last_event_id is None or hub.is_stale(last_event_id):
+        # Nouveau client (ou numéro d'avant un redémarrage) : état courant, puis uniquement les changements
+        cursor = hub.cursor
+        for machine_id, result in hub.snapshot(machine_ids).items():
+            yield format_sse(None, machine_id, result, event="snapshot")
+    else:
+        cursor = last_event_id
+    yield f"retry: 3000\nid: {cursor}\n\n"
+
+    while True:
+        events, cursor = hub.wait(cursor, machine_ids, keepalive)
+        if not events:
+            yield ": keepalive\n\n"
+        for seq, machine_id, result in events:
+            yield format_sse(seq, machine_id, result)
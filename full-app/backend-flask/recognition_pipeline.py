@@ -0,0 +1,226 @@
+# recognition_pipeline.py
+import queue
+import threading
+import time
+
+import cv2
+
+
+class StageTimer:
+    """Mesure le FPS et la latence moyenne (EWMA, en ms) de chaque étape.
+
+    record() est appelé aussi depuis le thread de reconnaissance : les
+    latences sont protégées par un verrou.
+    """
+
+    def __init__(self, alpha=0.1):
+        self.alpha = alpha
+        self.latencies = {}
+        self.fps = 0.0
+        self._last_frame = None
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            previous = self.latencies.get(stage)
+            self.latencies[stage] = ms if previous is None else previous + self.alpha * (ms - previous)
+
+    def time(self, stage):
+        return _StageSpan(self, stage)
+
+    def tick(self):
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            instant = 1.0 / max(now - self._last_frame, 1e-6)
+            self.fps = instant if self.fps == 0 else self.fps + self.alpha * (instant - self.fps)
+        self._last_frame = now
+
+    def summary(self):
+        with self._lock:
+            latencies = list(self.latencies.items())
+        stages = " ".join(f"{name}={ms:.1f}ms" for name, ms in latencies)
+        return f"FPS={self.fps:.1f} {stages}"
+
+    def draw(self, frame):
+        cv2.putText(frame, self.summary(), (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+
+
+class _StageSpan:
+    def __init__(self, timer, stage):
+        self.timer = timer
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class RoiTracker:
+    """Suivi léger d'un visage par corrélation de gabarit autour de sa dernière position."""
+
+    def __init__(self, gray, box, search_margin=0.5, min_score=0.6):
+        self.box = tuple(int(v) for v in box)
+        self.search_margin = search_margin
+        self.min_score = min_score
+        x, y, w, h = self.box
+        self.template = gray[y:y+h, x:x+w].copy()
+
+    def update(self, gray):
+        """Met à jour la position ; retourne False si le visage est perdu."""
+        x, y, w, h = self.box
+        mx, my = int(w * self.search_margin), int(h * self.search_margin)
+        x0, y0 = max(x - mx, 0), max(y - my, 0)
+        x1, y1 = min(x + w + mx, gray.shape[1]), min(y + h + my, gray.shape[0])
+        window = gray[y0:y1, x0:x1]
+        if window.shape[0] < h or window.shape[1] < w:
+            return False
+        scores = cv2.matchTemplate(window, self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (bx, by) = cv2.minMaxLoc(scores)
+        if score < self.min_score:
+            return False
+        self.box = (x0 + bx, y0 + by, w, h)
+        return True
+
+
+class RecognitionWorker(threading.Thread):
+    """Exécute la reconnaissance en arrière-plan pour ne jamais bloquer la capture.
+
+    La file d'entrée ne garde que le visage le plus récent : si DeepFace est
+    plus lent que la caméra, les anciennes demandes sont abandonnées.
+    """
+
+    def __init__(self, face_index, timer):
+        super().__init__(daemon=True)
+        self.face_index = face_index
+        self.timer = timer
+        self.requests = queue.Queue(maxsize=1)
+        self.results = queue.Queue()
+        self.failures = 0
+        self._stop_event = threading.Event()
+        # Vrai de la soumission jusqu'à la fin de la dernière reconnaissance
+        self._busy = False
+        self._lock = threading.Lock()
+
+    def submit(self, face_region):
+        with self._lock:
+            try:
+                self.requests.get_nowait()
+            except queue.Empty:
+                pass
+            self.requests.put_nowait(face_region)
+            self._busy = True
+
+    @property
+    def idle(self):
+        return not self._busy
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                face_region = self.requests.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                with self.timer.time("recognize"):
+                    match = self.face_index.identify(face_region)
+                self.results.put(match)
+            except Exception as e:
+                print(f"Erreur DeepFace : {e}")
+                # Compte comme une tentative sans correspondance : un flux qui échoue en boucle finit par être refusé
+                self.failures += 1
+                self.results.put(None)
+            finally:
+                with self._lock:
+                    if self.requests.empty():
+                        self._busy = False
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def run_pipeline(cap, face_cascade, face_index, verify_threshold=3, distance_threshold=0.4,
+                 max_attempts=100, detect_every=5, scale=0.5):
+    """Boucle webcam optimisée : détection sous-échantillonnée, suivi et reconnaissance asynchrone.
+
+    Les tentatives sont comptées par résultat de reconnaissance et non par image,
+    puisque toutes les images ne passent plus par DeepFace ; une reconnaissance
+    en erreur compte comme une tentative échouée.
+    Retourne le nom de l'utilisateur reconnu, ou None.
+    """
+    timer = StageTimer()
+    worker = RecognitionWorker(face_index, timer)
+    worker.start()
+
+    trackers = []
+    frame_count = 0
+    attempts = 0
+    verify_count = 0
+    recognized_user = None
+
+    try:
+        while True:
+            with timer.time("capture"):
+                ret, frame = cap.read()
+            if not ret:
+                print("Erreur : Impossible de capturer une image.")
+                break
+
+            small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+            if frame_count % detect_every == 0 or not trackers:
+                with timer.time("detect"):
+                    faces = face_cascade.detectMultiScale(
+                        gray, scaleFactor=1.1, minNeighbors=5,
+                        minSize=(max(int(30 * scale), 1), max(int(30 * scale), 1))
+                    )
+                trackers = [RoiTracker(gray, box) for box in faces]
+            else:
+                with timer.time("track"):
+                    trackers = [t for t in trackers if t.update(gray)]
+            frame_count += 1
+
+            # Soumettre le premier visage si le worker est libre
+            if trackers and worker.idle:
+                x, y, w, h = (int(v / scale) for v in trackers[0].box)
+                worker.submit(frame[y:y+h, x:x+w].copy())
+
+            while not worker.results.empty():
+                match = worker.results.get_nowait()
+                attempts += 1
+                if match and match[2] < distance_threshold:
+                    verify_count += 1
+                    print(f"Utilisateur {match[1]} reconnu {verify_count}/{verify_threshold} fois (distance {match[2]:.3f})")
+                    if verify_count >= verify_threshold:
+                        recognized_user = match[1]
+                        print(f"Connexion réussie pour {recognized_user}")
+                else:
+                    verify_count = 0
+
+            for t in trackers:
+                x, y, w, h = (int(v / scale) for v in t.box)
+                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            timer.tick()
+            timer.draw(frame)
+
+            with timer.time("display"):
+                cv2.imshow('Reconnaissance Faciale', frame)
+                key = cv2.waitKey(1) & 0xFF
+
+            if recognized_user:
+                break
+            if attempts >= max_attempts:
+                print("Échec de la reconnaissance. Essayez le mot de passe.")
+                break
+            if key == ord('q'):
+                break
+    finally:
+        worker.stop()
+        print(timer.summary())
+
+    return recognized_user
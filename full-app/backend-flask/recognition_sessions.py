@@ -0,0 +1,123 @@
+# recognition_sessions.py
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_SESSIONS = 100
+DEFAULT_TTL = 60
+DEFAULT_VOTES = 3
+DEFAULT_MAX_FRAMES = 30
+
+
+class SessionLimitReached(Exception):
+    """Trop de sessions de reconnaissance actives."""
+
+
+class RecognitionSession:
+    """Reconnaissance d'un utilisateur sur une suite d'images.
+
+    L'embedding de référence est chargé une seule fois au démarrage. La
+    décision tombe dès `votes_required` correspondances consécutives
+    ('authenticated'), ou autant de refus consécutifs ('rejected') ; au-delà
+    de `max_frames` images sans décision, la session est refusée. Les images
+    sans visage ne comptent ni pour ni contre.
+    """
+
+    def __init__(self, user_id, reference_embedding, votes_required=DEFAULT_VOTES, max_frames=DEFAULT_MAX_FRAMES):
+        self.id = secrets.token_urlsafe(16)
+        self.user_id = user_id
+        self.reference_embedding = reference_embedding
+        self.votes_required = votes_required
+        self.max_frames = max_frames
+        # Une seule image traitée à la fois par session ; les suivantes sont refusées, pas mises en file
+        self.lock = threading.Lock()
+        self.roi = None
+        self.frames = 0
+        self.consecutive_matches = 0
+        self.consecutive_rejections = 0
+        self.best_distance = None
+        self.decision = None
+        self.last_seen = time.monotonic()
+
+    def record(self, result):
+        """Prend en compte le résultat d'une image ; retourne la décision (ou None)."""
+        self.frames += 1
+        if result['status'] == 'ok':
+            self.roi = result.get('roi')
+            distance = result['distance']
+            if self.best_distance is None or distance < self.best_distance:
+                self.best_distance = distance
+            if result['verified']:
+                self.consecutive_matches += 1
+                self.consecutive_rejections = 0
+            else:
+                self.consecutive_rejections += 1
+                self.consecutive_matches = 0
+        else:
+            # Visage perdu : la zone précédente n'est plus un bon point de départ
+            self.roi = None
+
+        if self.consecutive_matches >= self.votes_required:
+            self.decision = 'authenticated'
+        elif self.consecutive_rejections >= self.votes_required or self.frames >= self.max_frames:
+            self.decision = 'rejected'
+        return self.decision
+
+    def to_dict(self):
+        return {
+            'session_id': self.id,
+            'status': self.decision or 'pending',
+            'authenticated': self.decision == 'authenticated',
+            'frames': self.frames,
+            'votes': self.consecutive_matches,
+            'votes_required': self.votes_required,
+            'best_distance': self.best_distance
+        }
+
+
+class SessionStore:
+    """Sessions actives, expirées après `ttl` secondes d'inactivité, au plus `max_sessions`."""
+
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS, ttl=DEFAULT_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+
+    def _purge(self, now):
+        # Les sessions sont rangées par dernière activité : les expirées sont en tête
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_seen <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    def create(self, *args, **kwargs):
+        session = RecognitionSession(*args, **kwargs)
+        with self._lock:
+            self._purge(session.last_seen)
+            if len(self._sessions) >= self.max_sessions:
+                raise SessionLimitReached(f"Too many active recognition sessions (max {self.max_sessions})")
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        """Retourne la session et prolonge sa durée de vie, ou None si inconnue ou expirée."""
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_seen = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def close(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
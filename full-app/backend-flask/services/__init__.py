@@ -0,0 +1,74 @@
+# services/__init__.py
+"""Fabrique d'application Flask et blueprints du backend.
+
+Chaque service déployable choisit les blueprints qu'il sert :
+
+    app = create_app(["face_auth", "recognition", "dashboard"])  # app.py
+    app = create_app(["prediction", "ingest"])                   # machine_failure_predictor.py
+
+Les modules lourds (DeepFace/TensorFlow, OpenCV) ne sont importés qu'à la
+première utilisation, par les seuls blueprints qui en ont besoin.
+"""
+import importlib
+import os
+from datetime import datetime
+
+from flask import Flask, jsonify
+from flask_cors import CORS
+
+from instrumentation import Instrumentation
+
+BLUEPRINTS = ("face_auth", "recognition", "dashboard", "prediction", "ingest")
+
+DEFAULT_CONFIG = {
+    "MONGO_URI": os.environ.get("MONGO_URI", "mongodb://localhost:27017"),
+    "DB_NAME": os.environ.get("DB_NAME", "dashboardDB"),
+    # Secret des jetons JWT du backend Node (routes protégées : journal des connexions)
+    "JWT_SECRET": os.environ.get("JWT_SECRET"),
+    # Racine des photos de référence (faceIdPhoto est relatif au backend Node)
+    "FACE_IMAGE_ROOT": os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'Backend')),
+    # Démarrer le pool d'inférence (et charger les modèles) dès la création de l'application
+    "INFERENCE_PRELOAD": True,
+    # Créer les index des collections utilisées au démarrage des blueprints (MONGO_ENSURE_INDEXES=0 pour désactiver)
+    "MONGO_ENSURE_INDEXES": os.environ.get("MONGO_ENSURE_INDEXES", "1") != "0",
+}
+
+
+def create_app(blueprints=None, config=None, service_name="backend", mongo_client=None):
+    """Crée l'application avec les blueprints demandés (tous par défaut).
+
+    `blueprints` peut aussi venir de la variable FLASK_BLUEPRINTS
+    (liste séparée par des virgules). `mongo_client` permet d'injecter un
+    client existant (benchmarks).
+    """
+    if blueprints is None:
+        blueprints = os.environ.get("FLASK_BLUEPRINTS", ",".join(BLUEPRINTS)).split(',')
+    unknown = set(blueprints) - set(BLUEPRINTS)
+    if unknown:
+        raise ValueError(f"Unknown blueprints: {sorted(unknown)} (expected {BLUEPRINTS})")
+
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    app.config.update(config or {})
+    CORS(app)
+    if mongo_client is not None:
+        app.extensions["mongo_client"] = mongo_client
+
+    # Latences par route et par étape, exposées sur /api/metrics
+    app.extensions["instrumentation"] = Instrumentation(service_name)
+    app.extensions["instrumentation"].install(app)
+
+    for name in blueprints:
+        module = importlib.import_module(f"services.{name}")
+        module.init_app(app)
+        app.register_blueprint(module.bp)
+
+    @app.route('/api/health', methods=['GET'])
+    def health_check():
+        return jsonify({
+            'status': 'healthy',
+            'blueprints': list(blueprints),
+            'timestamp': datetime.now().isoformat()
+        }), 200
+
+    return app
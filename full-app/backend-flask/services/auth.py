@@ -0,0 +1,68 @@
+# services/auth.py
+"""Vérification des jetons JWT émis par le backend Node (HS256, {id, role}).
+
+Le secret est celui du backend Node (JWT_SECRET). Sans secret configuré,
+les routes protégées refusent toutes les requêtes.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+from flask import current_app, jsonify, request
+
+
+class InvalidToken(Exception):
+    """Jeton absent, mal formé, mal signé ou expiré."""
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+
+def decode_token(token, secret):
+    """Retourne le contenu d'un jeton HS256 après vérification de la signature et de l'expiration."""
+    try:
+        header_b64, payload_b64, signature_b64 = token.split('.')
+        header = json.loads(_b64decode(header_b64))
+        payload = json.loads(_b64decode(payload_b64))
+        signature = _b64decode(signature_b64)
+    except ValueError as e:
+        raise InvalidToken("Malformed token") from e
+    if not isinstance(header, dict) or not isinstance(payload, dict):
+        raise InvalidToken("Malformed token")
+    if header.get('alg') != 'HS256':
+        raise InvalidToken("Unsupported token algorithm")
+    expected = hmac.new(secret.encode(), f"{header_b64}.{payload_b64}".encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, signature):
+        raise InvalidToken("Invalid token signature")
+    if 'exp' in payload:
+        exp = payload['exp']
+        if isinstance(exp, bool) or not isinstance(exp, (int, float)):
+            raise InvalidToken("Malformed token expiration")
+        if time.time() >= exp:
+            raise InvalidToken("Token expired")
+    return payload
+
+
+def authenticated_user():
+    """Contenu du jeton « Authorization: Bearer » de la requête en cours."""
+    secret = current_app.config.get("JWT_SECRET")
+    if not secret:
+        raise InvalidToken("Authentication is not configured (JWT_SECRET)")
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        raise InvalidToken("No token provided")
+    return decode_token(header[len('Bearer '):], secret)
+
+
+def require_user_access(user_id):
+    """Réponse d'erreur si l'appelant n'est ni `user_id` ni un administrateur, sinon None."""
+    try:
+        user = authenticated_user()
+    except InvalidToken as e:
+        return jsonify({'error': str(e)}), 401
+    if str(user.get('id')) != str(user_id) and user.get('role') != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    return None
@@ -0,0 +1,156 @@
+# services/dashboard.py
+"""Prédiction de panne du poste supervisé (collection dashboards) : /api/predict-failure."""
+import math
+from datetime import datetime, timedelta
+
+from flask import Blueprint, jsonify, request
+
+from services.extensions import ensure_indexes, get_db, instrumentation
+
+bp = Blueprint("dashboard", __name__)
+
+DEFAULT_WINDOW_SIZE = 50
+
+
+def init_app(app):
+    ensure_indexes(["dashboards"], app)
+
+
+def metrics_collection():
+    return get_db()["dashboards"]
+
+
+# =============================
+#   PREDICTION DE PANNE (IA)
+# =============================
+def calculate_risk_percentage(value, thresholds):
+    """Calcule un pourcentage de risque basé sur des seuils."""
+    if value < thresholds['low']:
+        return 0
+    if value < thresholds['medium']:
+        # Risque linéaire de 1% à 40%
+        return 1 + 39 * (value - thresholds['low']) / (thresholds['medium'] - thresholds['low'])
+    if value < thresholds['high']:
+        # Risque linéaire de 40% à 80%
+        return 40 + 40 * (value - thresholds['medium']) / (thresholds['high'] - thresholds['medium'])
+    # Risque exponentiel de 80% à 100%
+    risk = 80 + 20 * (1 - math.exp(-0.1 * (value - thresholds['high'])))
+    return min(risk, 100)
+
+
+def aggregate_metrics_window(limit=None, seconds=None):
+    """Calcule côté MongoDB les moyennes cpu/ram/disk d'une fenêtre de métriques.
+
+    La fenêtre couvre les `limit` derniers échantillons et/ou les `seconds`
+    dernières secondes. Seuls les champs utiles sont projetés, et la dernière
+    valeur de batterie/charge est prise sur l'échantillon le plus récent.
+    Retourne None si la fenêtre est vide.
+    """
+    pipeline = []
+    if seconds:
+        since = datetime.utcnow() - timedelta(seconds=seconds)
+        pipeline.append({"$match": {"timestamp": {"$gte": since}}})
+    pipeline.append({"$sort": {"timestamp": -1}})
+    if limit:
+        pipeline.append({"$limit": limit})
+    pipeline += [
+        {"$project": {"_id": 0, "cpu": 1, "ram": 1, "disk": 1, "battery": 1, "charging": 1}},
+        {"$group": {
+            "_id": None,
+            # Les champs absents comptent pour 0, comme dans l'ancien calcul Python
+            "avg_cpu": {"$avg": {"$ifNull": ["$cpu", 0]}},
+            "avg_mem": {"$avg": {"$ifNull": ["$ram", 0]}},
+            "avg_disk": {"$avg": {"$ifNull": ["$disk", 0]}},
+            "battery": {"$first": "$battery"},
+            "charging": {"$first": "$charging"},
+            "count": {"$sum": 1}
+        }}
+    ]
+    results = list(metrics_collection().aggregate(pipeline))
+    return results[0] if results else None
+
+
+@bp.route('/api/predict-failure', methods=['GET'])
+def predict_failure():
+    try:
+        # Fenêtre : ?limit=N derniers échantillons et/ou ?seconds=T dernières secondes
+        seconds = request.args.get('seconds', type=int)
+        limit = request.args.get('limit', type=int)
+        if limit is None and seconds is None:
+            limit = DEFAULT_WINDOW_SIZE
+        if (limit is not None and limit <= 0) or (seconds is not None and seconds <= 0):
+            return jsonify({'error': 'limit and seconds must be positive'}), 400
+
+        with instrumentation().stage("mongo_aggregate"):
+            window = aggregate_metrics_window(limit, seconds)
+        if not window:
+            return jsonify({'predictions': []}), 200
+
+        # Correction: utiliser les noms de champs corrects ('cpu', 'ram', 'disk') venant de MQTT
+        avg_cpu = window['avg_cpu']
+        avg_mem = window['avg_mem']
+        avg_disk = window['avg_disk']
+        current_battery = window['battery'] if window.get('battery') is not None else 100
+        is_charging = window['charging'] if window.get('charging') is not None else False
+
+        # Seuils de risque (pourraient être affinés par un modèle ML)
+        cpu_thresholds = {'low': 50, 'medium': 75, 'high': 90}
+        mem_thresholds = {'low': 60, 'medium': 80, 'high': 95}
+        disk_thresholds = {'low': 70, 'medium': 85, 'high': 95}
+
+        # Calculer les pourcentages de risque
+        cpu_risk = calculate_risk_percentage(avg_cpu, cpu_thresholds)
+        mem_risk = calculate_risk_percentage(avg_mem, mem_thresholds)
+        disk_risk = calculate_risk_percentage(avg_disk, disk_thresholds)
+        
+        # --- Prédiction Batterie ---
+        battery_risk = 0
+        battery_message = f"Batterie à {current_battery:.0f}%. "
+        if is_charging:
+            battery_message += "En charge."
+        elif current_battery <= 25:
+            battery_risk = 85 # Risque élevé
+            battery_message += "Niveau critique. Branchez l'appareil."
+        elif current_battery <= 50:
+            battery_risk = 45 # Risque modéré
+            battery_message += "Niveau bas. Pensez à recharger."
+        else:
+            battery_message += "Niveau correct."
+
+        def get_message(component, risk, avg_value):
+            if risk == 0:
+                return f"L'utilisation de {component} ({avg_value:.1f}%) est dans les limites normales."
+            elif risk <= 40:
+                return f"L'utilisation de {component} ({avg_value:.1f}%) est modérée. Surveillance recommandée."
+            elif risk <= 80:
+                return f"L'utilisation de {component} ({avg_value:.1f}%) est élevée. Risque de dégradation des performances."
+            else:
+                return f"L'utilisation de {component} ({avg_value:.1f}%) est critique. Risque de panne imminent."
+
+        predictions = [
+            {
+                'component': 'CPU',
+                'risk_percent': round(cpu_risk, 2),
+                'message': get_message('CPU', cpu_risk, avg_cpu)
+            },
+            {
+                'component': 'Memory',
+                'risk_percent': round(mem_risk, 2),
+                'message': get_message('RAM', mem_risk, avg_mem)
+            },
+            {
+                'component': 'Disk',
+                'risk_percent': round(disk_risk, 2),
+                'message': get_message('le disque', disk_risk, avg_disk)
+            },
+            {
+                'component': 'Battery',
+                'risk_percent': round(battery_risk, 2),
+                'message': battery_message
+            }
+        ]
+
+        return jsonify({'predictions': predictions, 'sampleCount': window['count']}), 200
+    except Exception as e:
+        print(f"Error in /api/predict-failure: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,44 @@
+# services/extensions.py
+"""Ressources partagées entre blueprints, rattachées à l'application Flask."""
+import threading
+
+from flask import current_app
+
+_lock = threading.Lock()
+
+
+def get_db(app=None):
+    """Base MongoDB de l'application ; le client n'est créé qu'au premier appel."""
+    app = app or current_app
+    with _lock:
+        if "mongo_client" not in app.extensions:
+            from mongo_setup import create_client
+            app.extensions["mongo_client"] = create_client(app.config["MONGO_URI"])
+    return app.extensions["mongo_client"][app.config["DB_NAME"]]
+
+
+def ensure_indexes(collections, app=None):
+    """Crée les index de ces collections ; une base injoignable n'empêche pas le démarrage."""
+    app = app or current_app
+    if not app.config["MONGO_ENSURE_INDEXES"]:
+        return
+    import mongo_setup
+    try:
+        mongo_setup.ensure_indexes(get_db(app), collections)
+    except Exception as e:
+        print(f"Impossible de créer les index de {', '.join(collections)} : {e}")
+
+
+def get_extension(name, factory, app=None):
+    """Objet partagé `name`, créé une seule fois par application avec factory(app)."""
+    app = app or current_app
+    with _lock:
+        if name in app.extensions:
+            return app.extensions[name]
+    value = factory(app)
+    with _lock:
+        return app.extensions.setdefault(name, value)
+
+
+def instrumentation():
+    return current_app.extensions["instrumentation"]
@@ -0,0 +1,234 @@
+# services/face_auth.py
+"""Authentification faciale : /api/verify, /api/enroll-face et journal des connexions.
+
+Le processus Flask n'importe ni OpenCV ni DeepFace : ils sont chargés par
+les workers du pool d'inférence, ou à la première vérification si
+INFERENCE_WORKERS=0.
+"""
+import base64
+import multiprocessing
+import os
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from flask import Blueprint, current_app, jsonify, request
+
+from audit_log import AUDIT_COLLECTION, AuditWriter, recent_attempts
+from face_embeddings import EmbeddingStore
+from inference_pool import (InferencePool, InferenceBusy, InferenceTimeout, InferenceUnavailable,
+                            DEFAULT_WORKERS, REDUCE_FACTORS)
+from services.auth import require_user_access
+from services.extensions import ensure_indexes, get_db, get_extension, instrumentation
+
+bp = Blueprint("face_auth", __name__)
+
+
+class FaceAuthState:
+    def __init__(self, app):
+        db = get_db(app)
+        self.users_collection = db["users"]
+
+        # Journal des tentatives de connexion (collection dédiée, écritures groupées)
+        self.audit_collection = db[AUDIT_COLLECTION]
+        ensure_indexes([AUDIT_COLLECTION], app)
+        self.audit_writer = AuditWriter(self.audit_collection)
+
+        # Inférence DeepFace dans un pool de processus dédié (INFERENCE_WORKERS=0 : dans le thread de la requête)
+        self.inference_pool = InferencePool(
+            workers=int(os.environ.get("INFERENCE_WORKERS", DEFAULT_WORKERS)),
+            max_pending=int(os.environ.get("INFERENCE_MAX_PENDING", 0)) or None,
+            timeout=float(os.environ.get("INFERENCE_TIMEOUT", 10))
+        )
+        # Embeddings des photos de référence (évite de repasser VGG-Face sur la photo à chaque login)
+        self.embedding_store = EmbeddingStore(embed=self.inference_pool.embed)
+
+
+def state():
+    return get_extension("face_auth", FaceAuthState)
+
+
+def init_app(app):
+    face_auth = get_extension("face_auth", FaceAuthState, app)
+    # Démarrage anticipé dans le processus qui sert les requêtes uniquement : les workers
+    # (spawn) réimportent le module principal. Sinon, le pool démarre à la première demande.
+    if app.config["INFERENCE_PRELOAD"] and multiprocessing.parent_process() is None:
+        face_auth.inference_pool.start()
+
+
+def resolve_face_image_path(user):
+    """Chemin absolu de la photo de référence (faceIdPhoto) d'un utilisateur."""
+    base_path = current_app.config["FACE_IMAGE_ROOT"]
+    return os.path.normpath(os.path.join(base_path, user["faceIdPhoto"].lstrip('/')))
+
+
+def read_verify_request(id_field='user_id'):
+    """Extrait (identifiant, octets de l'image, facteur de réduction) de la requête.
+
+    Formats acceptés (id_field vaut 'user_id', ou 'session_id' pour /api/verify-face) :
+    - JSON {id_field, 'frame' en base64} (contrat historique) ;
+    - multipart/form-data avec un champ id_field et un fichier 'frame' ;
+    - corps brut image/jpeg, image/png ou application/octet-stream,
+      avec id_field dans la query string.
+
+    Sans ?reduce, les images binaires de plus de face_pipeline.OVERSIZED_FRAME_BYTES sont
+    décodées en demi-résolution ; le contrat JSON historique reste en pleine
+    résolution.
+    """
+    reduce = request.args.get('reduce', type=int)
+
+    if request.is_json:
+        data = request.get_json()
+        frame_base64 = data.get('frame')
+        frame_data = base64.b64decode(frame_base64) if frame_base64 else None
+        return data.get(id_field), frame_data, 1 if reduce is None else reduce
+
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('frame')
+        frame_data = upload.read() if upload else None
+        return request.form.get(id_field) or request.args.get(id_field), frame_data, reduce
+
+    return request.args.get(id_field), request.get_data(cache=False), reduce
+
+
+def busy_response(e, **body):
+    response = jsonify({'error': str(e), **body})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+# =============================
+#   VÉRIFIER LE VISAGE
+# =============================
+@bp.route('/api/verify', methods=['POST'])
+def verify_face():
+    try:
+        face_auth = state()
+        with instrumentation().stage("read_request"):
+            user_id, frame_data, reduce = read_verify_request()
+
+        if not user_id or not frame_data:
+            return jsonify({'error': 'user_id and frame are required'}), 400
+
+        if reduce is not None and reduce not in REDUCE_FACTORS:
+            return jsonify({'error': f'reduce must be one of {list(REDUCE_FACTORS)}'}), 400
+
+        # Récupérer l'image de référence
+        with instrumentation().stage("mongo_lookup"):
+            user = face_auth.users_collection.find_one({"_id": ObjectId(user_id)}, {"faceIdPhoto": 1})
+        if not user or "faceIdPhoto" not in user or not user["faceIdPhoto"]:
+            return jsonify({'error': 'Face image not found for user'}), 404
+
+        face_image_path = resolve_face_image_path(user)
+
+        if not os.path.exists(face_image_path):
+            return jsonify({'error': f'Image file not found at {face_image_path}'}), 404
+
+        # Décodage, détection et VGG-Face dans le pool ; la référence vient du cache
+        try:
+            with instrumentation().stage("reference_embedding"):
+                reference_embedding = face_auth.embedding_store.get(user_id, face_image_path)
+            with instrumentation().stage("inference"):
+                result = face_auth.inference_pool.verify(frame_data, reduce, reference_embedding)
+        except (InferenceBusy, InferenceTimeout) as e:
+            result = "unavailable" if isinstance(e, InferenceUnavailable) else "busy" if isinstance(e, InferenceBusy) else "timeout"
+            instrumentation().count("verify_results_total", result=result)
+            return busy_response(e, authenticated=False)
+
+        # Étapes mesurées dans le worker : décodage, détection, embedding
+        for stage, seconds in result.get('timings', {}).items():
+            instrumentation().observe_stage(stage, seconds)
+
+        if result['status'] != 'ok':
+            instrumentation().count("verify_results_total", result=result['status'])
+        if result['status'] == 'undecodable':
+            return jsonify({'error': 'Unable to decode frame'}), 400
+        if result['status'] == 'no_face':
+            return jsonify({'authenticated': False, 'error': 'No face detected'}), 200
+
+        instrumentation().count("verify_results_total", result="verified" if result['verified'] else "rejected")
+
+        # Journal d'audit : écrit en arrière-plan, la réponse n'attend pas Mongo
+        with instrumentation().stage("audit_enqueue"):
+            face_auth.audit_writer.record(user_id, result['verified'], ip=request.remote_addr, method="face")
+
+        return jsonify({
+            'authenticated': result['verified'],
+            'distance': result.get("distance")
+        }), 200
+
+    except Exception as e:
+        print(f"Error in /api/verify: {e}")
+        return jsonify({'error': str(e), 'authenticated': False}), 500
+
+
+# =============================
+#   JOURNAL DES CONNEXIONS
+# =============================
+@bp.route('/api/users/<user_id>/login-attempts', methods=['GET'])
+def get_login_attempts(user_id):
+    """Dernières tentatives d'un utilisateur (?limit, ?before en ISO 8601, ?success=true|false).
+
+    Réservé à l'utilisateur lui-même ou à un administrateur (jeton JWT du backend Node).
+    """
+    denied = require_user_access(user_id)
+    if denied:
+        return denied
+    try:
+        limit = request.args.get('limit', 50, type=int)
+        if limit <= 0:
+            return jsonify({'error': 'limit must be positive'}), 400
+
+        before = request.args.get('before')
+        if before:
+            try:
+                before = datetime.fromisoformat(before)
+            except ValueError:
+                return jsonify({'error': 'before must be an ISO 8601 date'}), 400
+
+        success = request.args.get('success')
+        if success is not None:
+            success = success.lower() == 'true'
+
+        attempts = recent_attempts(state().audit_collection, user_id, limit, before or None, success)
+        for attempt in attempts:
+            attempt['timestamp'] = attempt['timestamp'].isoformat()
+        return jsonify({'userId': user_id, 'attempts': attempts}), 200
+
+    except Exception as e:
+        print(f"Error in /api/users/{user_id}/login-attempts: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+# =============================
+#   ENRÔLEMENT DU VISAGE
+# =============================
+@bp.route('/api/enroll-face', methods=['POST'])
+def enroll_face():
+    """Précalcule l'embedding de référence après l'ajout ou le changement de photo."""
+    try:
+        face_auth = state()
+        data = request.get_json()
+        user_id = data.get('user_id') if data else None
+
+        if not user_id:
+            return jsonify({'error': 'user_id is required'}), 400
+
+        user = face_auth.users_collection.find_one({"_id": ObjectId(user_id)}, {"faceIdPhoto": 1})
+        if not user or not user.get("faceIdPhoto"):
+            face_auth.embedding_store.invalidate(user_id)
+            return jsonify({'error': 'Face image not found for user'}), 404
+
+        face_image_path = resolve_face_image_path(user)
+        if not os.path.exists(face_image_path):
+            face_auth.embedding_store.invalidate(user_id)
+            return jsonify({'error': f'Image file not found at {face_image_path}'}), 404
+
+        try:
+            face_auth.embedding_store.enroll(user_id, face_image_path)
+        except (InferenceBusy, InferenceTimeout) as e:
+            return busy_response(e)
+        return jsonify({'status': 'enrolled'}), 200
+
+    except Exception as e:
+        print(f"Error in /api/enroll-face: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,47 @@
+# services/ingest.py
+"""Ingestion des métriques des machines : /api/machine-metrics."""
+import time
+
+from flask import Blueprint, jsonify, request
+
+import metrics_storage
+from services.extensions import instrumentation
+from services.machine_state import machine_state
+
+bp = Blueprint("ingest", __name__)
+
+
+def init_app(app):
+    machine_state(app)
+
+
+@bp.route('/api/machine-metrics', methods=['POST'])
+def receive_machine_metrics():
+    """Endpoint pour recevoir les métriques des machines via MQTT"""
+    state = machine_state()
+    try:
+        data = request.get_json()
+        
+        if not data or "machineId" not in data:
+            return jsonify({'error': 'Invalid data format'}), 400
+            
+        # Ajouter un timestamp si non présent
+        if "timestamp" not in data:
+            data["timestamp"] = time.time()
+        if metrics_storage.timeseries_enabled():
+            data["timestamp"] = metrics_storage.to_datetime(data["timestamp"])
+
+        # Mettre à jour les fenêtres en mémoire puis insérer dans la base de données
+        state.claim_local(data)
+        with instrumentation().stage("store_ingest"):
+            state.metric_store.ingest(data["machineId"], data, data["timestamp"])
+        with instrumentation().stage("mongo_insert"):
+            state.metrics_collection.insert_one(data)
+        with instrumentation().stage("stream_publish"):
+            state.publish_prediction(str(data["machineId"]))
+        
+        return jsonify({'status': 'success'}), 200
+        
+    except Exception as e:
+        print(f"Error in /api/machine-metrics: {e}")
+        return jsonify({'error': str(e)}), 500
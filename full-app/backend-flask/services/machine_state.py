@@ -0,0 +1,175 @@
+# services/machine_state.py
+"""État partagé par les blueprints prediction et ingest : fenêtres glissantes,
+cache et écriture des prédictions, flux des changements.
+"""
+import math
+import os
+
+from bson.objectid import ObjectId
+
+import metrics_storage
+from metric_store import DEFAULT_SYNC_LOOKBACK, MAX_MACHINES, MachineMetricStore, MetricsFollower
+from prediction_cache import PredictionCache, PredictionWriter
+from prediction_stream import PredictionHub
+from services.extensions import ensure_indexes, get_db, get_extension
+
+
+class MachineState:
+    def __init__(self, app):
+        self.db = get_db(app)
+        self.machines_collection = self.db["machines"]
+        self.metrics_collection = self.db["machineMetrics"]  # Collection pour les métriques des machines
+        self.predictions_collection = self.db["predictions"]  # Collection pour stocker les prédictions
+        ensure_indexes(["machines", "machineMetrics", "predictions"], app)
+
+        # Stockage time-series avec agrégats 1 min / 1 h (opt-in : METRICS_STORAGE_MODE=timeseries)
+        if metrics_storage.timeseries_enabled():
+            self.metrics_collection = metrics_storage.ensure_collections(self.db)
+            metrics_storage.RollupScheduler(self.db).start()
+
+        # Résultats de prédiction en cache tant qu'aucune nouvelle métrique n'arrive,
+        # écritures groupées (et asynchrones avec PREDICTION_ASYNC_WRITES=1)
+        self.prediction_cache = PredictionCache(
+            max_entries=int(os.environ.get("PREDICTION_CACHE_SIZE", 1024)),
+            ttl=int(os.environ.get("PREDICTION_CACHE_TTL", 300))
+        )
+        self.prediction_writer = PredictionWriter(
+            self.machines_collection, self.predictions_collection,
+            asynchronous=os.environ.get("PREDICTION_ASYNC_WRITES") == "1"
+        )
+
+        # Flux de prédictions : recalcul à l'ingestion, envoi si un risque varie de plus de PREDICTION_STREAM_DELTA points
+        self.prediction_hub = PredictionHub(
+            delta=float(os.environ.get("PREDICTION_STREAM_DELTA", 2.0)),
+            max_streams=int(os.environ.get("PREDICTION_STREAM_MAX_CLIENTS", 50))
+        )
+        # Définitions des machines (composants, seuils) utilisées au recalcul, relues au plus toutes les 60 s
+        self.machine_definitions = PredictionCache(max_entries=10000, ttl=60)
+
+        # Fenêtres glissantes en mémoire, mises à jour à l'ingestion et reconstruites au démarrage
+        self.metric_store = MachineMetricStore(
+            window_size=50,
+            max_machines=int(os.environ.get("METRIC_STORE_MAX_MACHINES", MAX_MACHINES))
+        )
+        try:
+            print(f"Fenêtres de métriques reconstruites pour {self.metric_store.rebuild(self.metrics_collection)} machine(s).")
+        except Exception as e:
+            print(f"Impossible de reconstruire les fenêtres de métriques : {e}")
+
+        # Métriques écrites hors de ce processus (pont MQTT, autres workers gunicorn),
+        # relues toutes les METRICS_SYNC_INTERVAL secondes (0 : désactivé)
+        self.metrics_follower = None
+        sync_interval = float(os.environ.get("METRICS_SYNC_INTERVAL", 1.0))
+        if sync_interval > 0:
+            self.metrics_follower = MetricsFollower(
+                self.metrics_collection, self.apply_external_sample, interval=sync_interval,
+                lookback=float(os.environ.get("METRICS_SYNC_LOOKBACK", DEFAULT_SYNC_LOOKBACK))
+            )
+            self.metrics_follower.start()
+
+    def claim_local(self, sample):
+        """Attribue l'_id et l'horodatage d'ingestion d'un échantillon de ce processus, pour que le suivi ne le rejoue pas."""
+        sample["_id"] = ObjectId()
+        sample[metrics_storage.INGESTED_AT_FIELD] = metrics_storage.ingest_time()
+        if self.metrics_follower is not None:
+            self.metrics_follower.mark_local(sample["_id"], sample[metrics_storage.INGESTED_AT_FIELD])
+
+    def apply_external_sample(self, doc):
+        machine_id = str(doc["machineId"])
+        self.metric_store.ingest(machine_id, doc, doc.get("timestamp"))
+        self.publish_prediction(machine_id)
+
+    def publish_prediction(self, machine_id):
+        """Recalcule la prédiction d'une machine après ingestion et la publie sur le flux si elle a changé."""
+        machine = self.machine_definitions.get(machine_id)
+        if machine is None:
+            machine = ObjectId.is_valid(machine_id) and self.machines_collection.find_one(
+                {"_id": ObjectId(machine_id)}, {"name": 1, "components": 1}
+            )
+            # Les identifiants inconnus sont aussi mis en cache, pour ne pas relire Mongo à chaque métrique
+            self.machine_definitions.put(machine_id, machine or False)
+        if not machine:
+            return False
+
+        overall_health, predictions = compute_machine_prediction(machine, machine_id, self.metric_store)
+        return self.prediction_hub.publish(machine_id, {
+            'machineName': machine.get("name", "Unknown"),
+            'overallHealth': round(overall_health, 2),
+            'predictions': predictions
+        })
+
+
+def machine_state(app=None):
+    return get_extension("machine_state", MachineState, app)
+
+
+def calculate_component_risk(value, thresholds, unit='%'):
+    """Calcule un pourcentage de risque basé sur des seuils pour un composant."""
+    if value < thresholds['low']:
+        return 0
+    if value < thresholds['medium']:
+        # Risque linéaire de 1% à 40%
+        return 1 + 39 * (value - thresholds['low']) / (thresholds['medium'] - thresholds['low'])
+    if value < thresholds['high']:
+        # Risque linéaire de 40% à 80%
+        return 40 + 40 * (value - thresholds['medium']) / (thresholds['high'] - thresholds['medium'])
+    # Risque exponentiel de 80% à 100%
+    risk = 80 + 20 * (1 - math.exp(-0.1 * (value - thresholds['high'])))
+    return min(risk, 100)
+
+
+def get_component_message(component_name, risk, value, unit='%'):
+    """Génère un message contextuel pour un composant."""
+    if risk == 0:
+        return f"La valeur de {component_name} ({value}{unit}) est dans les limites normales."
+    elif risk <= 40:
+        return f"La valeur de {component_name} ({value}{unit}) est modérée. Surveillance recommandée."
+    elif risk <= 80:
+        return f"La valeur de {component_name} ({value}{unit}) est élevée. Risque de dégradation des performances."
+    else:
+        return f"La valeur de {component_name} ({value}{unit}) est critique. Risque de panne imminent."
+
+
+def compute_machine_prediction(machine, machine_id, metric_store, component_means=None):
+    """Santé globale et prédictions par composant, triées par risque décroissant.
+
+    Sans component_means, les moyennes viennent des fenêtres glissantes en mémoire.
+    """
+    predictions = []
+    total_risk = 0
+    component_count = 0
+
+    for component in machine["components"]:
+        comp_name = component["name"]
+        if component_means is not None:
+            avg_value = component_means.get(comp_name)
+        else:
+            stats = metric_store.get(machine_id, comp_name)
+            avg_value = stats['mean'] if stats else None
+        if avg_value is not None:
+            thresholds = component.get("thresholds", {
+                'low': 30, 'medium': 60, 'high': 85, 'critical': 95
+            })
+            unit = component.get("unit", "%")
+
+            # Calculer le risque
+            risk = calculate_component_risk(avg_value, thresholds, unit)
+            total_risk += risk
+            component_count += 1
+
+            # Ajouter la prédiction
+            predictions.append({
+                'component': comp_name,
+                'componentType': component.get("type", "unknown"),
+                'risk_percent': round(risk, 2),
+                'value': round(avg_value, 2),
+                'unit': unit,
+                'message': get_component_message(comp_name, risk, avg_value, unit)
+            })
+
+    # Calculer la santé globale de la machine
+    overall_health = 100 - (total_risk / component_count if component_count > 0 else 0)
+
+    # Trier les prédictions par risque décroissant
+    predictions.sort(key=lambda x: x['risk_percent'], reverse=True)
+    return overall_health, predictions
@@ -0,0 +1,252 @@
+# services/prediction.py
+"""Prédiction de panne des machines : par machine, flotte, historique et flux des changements."""
+import time
+
+from bson.objectid import ObjectId
+from flask import Blueprint, Response, jsonify, request
+
+import metrics_storage
+from fleet_prediction import load_fleet_windows, predict_fleet
+from prediction_stream import sse_stream
+from services.extensions import instrumentation
+from services.machine_state import compute_machine_prediction, machine_state
+
+bp = Blueprint("prediction", __name__)
+
+MAX_FLEET_WINDOW = 1000
+
+
+def init_app(app):
+    # Fenêtres reconstruites au démarrage du service, pas à la première requête
+    machine_state(app)
+
+
+@bp.route('/api/predict-machine-failure', methods=['GET'])
+def predict_machine_failure():
+    state = machine_state()
+    try:
+        machine_id = request.args.get('machineId')
+        
+        if not machine_id:
+            return jsonify({'error': 'machineId parameter is required'}), 400
+            
+        # Récupérer les informations de la machine
+        with instrumentation().stage("mongo_lookup"):
+            machine = state.machines_collection.find_one({"_id": ObjectId(machine_id)})
+        if not machine:
+            return jsonify({'error': 'Machine not found'}), 404
+            
+        # Même machine, même configuration, aucune nouvelle métrique : même résultat
+        window_seconds = request.args.get('seconds', type=int)
+        cache_key = (
+            machine_id, window_seconds,
+            state.metric_store.latest_timestamp(machine_id), machine.get("updatedAt")
+        )
+        cached = state.prediction_cache.get(cache_key)
+        instrumentation().count("prediction_cache_total", result="hit" if cached is not None else "miss")
+        if cached is not None:
+            return jsonify(cached), 200
+
+        # Fenêtre temporelle explicite : lue sur le niveau d'agrégat adapté
+        if window_seconds is not None:
+            if not metrics_storage.timeseries_enabled():
+                return jsonify({'error': 'seconds requires METRICS_STORAGE_MODE=timeseries'}), 400
+            with instrumentation().stage("window_means"):
+                _, component_means = metrics_storage.window_means(state.db, machine_id, window_seconds)
+        # Sinon, les 50 dernières valeurs de chaque composant sont agrégées en mémoire
+        # (rechargées depuis Mongo si la machine en a été retirée)
+        else:
+            if not state.metric_store.has_machine(machine_id):
+                with instrumentation().stage("metric_store_load"):
+                    loaded = state.metric_store.load(state.metrics_collection, machine_id)
+                if not loaded:
+                    return jsonify({'predictions': [], 'machineId': machine_id}), 200
+            component_means = None
+
+        risk_start = time.perf_counter()
+        overall_health, predictions = compute_machine_prediction(machine, machine_id, state.metric_store, component_means)
+        instrumentation().observe_stage("compute_risk", time.perf_counter() - risk_start)
+
+        # Persister la santé globale et les prédictions seulement si elles ont changé
+        with instrumentation().stage("persist"):
+            state.prediction_writer.submit(machine_id, ObjectId(machine_id), round(overall_health, 2), predictions)
+
+        result = {
+            'machineId': machine_id,
+            'machineName': machine.get("name", "Unknown"),
+            'overallHealth': round(overall_health, 2),
+            'predictions': predictions
+        }
+        state.prediction_cache.put(cache_key, result)
+        return jsonify(result), 200
+        
+    except Exception as e:
+        print(f"Error in /api/predict-machine-failure: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/predict-fleet', methods=['GET'])
+def predict_fleet_health():
+    """Santé de toute la flotte (ou des machines filtrées) en une seule requête.
+
+    Paramètres : machineIds (liste séparée par des virgules), status, window,
+    sort (risk, health ou name), page et pageSize.
+    """
+    state = machine_state()
+    try:
+        query = {}
+        machine_ids = request.args.get('machineIds')
+        if machine_ids:
+            machine_ids = [m for m in machine_ids.split(',') if m]
+            if not all(ObjectId.is_valid(m) for m in machine_ids):
+                return jsonify({'error': 'machineIds must be valid ObjectIds'}), 400
+            query["_id"] = {"$in": [ObjectId(m) for m in machine_ids]}
+        if request.args.get('status'):
+            query["status"] = request.args.get('status')
+
+        window = request.args.get('window', default='50')
+        if not window.isdigit() or not 0 < int(window) <= MAX_FLEET_WINDOW:
+            return jsonify({'error': f'window must be an integer between 1 and {MAX_FLEET_WINDOW}'}), 400
+        window = int(window)
+        sort = request.args.get('sort', default='risk')
+        page = max(request.args.get('page', default=1, type=int), 1)
+        page_size = min(max(request.args.get('pageSize', default=50, type=int), 1), 500)
+        if sort not in ('risk', 'health', 'name'):
+            return jsonify({'error': 'sort must be one of risk, health, name'}), 400
+
+        with instrumentation().stage("mongo_lookup"):
+            machines = list(state.machines_collection.find(query, {"name": 1, "components": 1}))
+        with instrumentation().stage("load_windows"):
+            means = load_fleet_windows(
+                state.machines_collection, state.metrics_collection, [m["_id"] for m in machines], window
+            )
+        with instrumentation().stage("compute_risk"):
+            results = predict_fleet(machines, means)
+
+        # Les machines sans métriques sont toujours placées en fin de liste
+        if sort == 'name':
+            results.sort(key=lambda r: r['machineName'])
+        elif sort == 'health':
+            results.sort(key=lambda r: (r['overallHealth'] is None, r['overallHealth'] or 0))
+        else:
+            results.sort(key=lambda r: (r['maxRisk'] is None, -(r['maxRisk'] or 0)))
+
+        start = (page - 1) * page_size
+        return jsonify({
+            'total': len(results),
+            'page': page,
+            'pageSize': page_size,
+            'machines': results[start:start + page_size]
+        }), 200
+
+    except Exception as e:
+        print(f"Error in /api/predict-fleet: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+def requested_machine_ids():
+    """Machines demandées (?machineIds=a,b ou ?machineId=a), ou None pour toute la flotte."""
+    machine_ids = request.args.get('machineIds') or request.args.get('machineId')
+    if not machine_ids:
+        return None
+    return {m for m in machine_ids.split(',') if m}
+
+
+def stream_limit_response(hub):
+    response = jsonify({'error': f'Too many prediction subscribers (max {hub.max_streams})'})
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
+
+@bp.route('/api/predictions/stream', methods=['GET'])
+def prediction_stream():
+    """Flux SSE des prédictions (une machine, une liste ou toute la flotte).
+
+    Un nouveau client reçoit d'abord l'état courant (événements « snapshot »),
+    puis un événement « prediction » à chaque changement significatif. En cas
+    de reconnexion, l'en-tête Last-Event-ID permet de reprendre sans perte.
+    Chaque flux occupe un thread : au-delà de PREDICTION_STREAM_MAX_CLIENTS, 503.
+    """
+    state = machine_state()
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    if not state.prediction_hub.open_stream():
+        return stream_limit_response(state.prediction_hub)
+    response = Response(
+        sse_stream(state.prediction_hub, requested_machine_ids(), last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Appelé à la déconnexion du client, même si le flux n'a jamais été itéré
+    response.call_on_close(state.prediction_hub.close_stream)
+    return response
+
+
+@bp.route('/api/predictions/poll', methods=['GET'])
+def prediction_poll():
+    """Long-poll, pour les clients sans EventSource.
+
+    Sans ?since, retourne l'état courant et le curseur à repasser au prochain
+    appel. Avec ?since, attend jusqu'à ?timeout secondes (30 max) un changement.
+    """
+    state = machine_state()
+    try:
+        machine_ids = requested_machine_ids()
+        since = request.args.get('since', type=int)
+        # Curseur d'avant un redémarrage : repartir de l'état courant
+        if since is None or state.prediction_hub.is_stale(since):
+            return jsonify({
+                'cursor': state.prediction_hub.cursor,
+                'events': [{'machineId': m, **r} for m, r in state.prediction_hub.snapshot(machine_ids).items()]
+            }), 200
+
+        timeout = min(max(request.args.get('timeout', default=25, type=float), 0), 30)
+        if not state.prediction_hub.open_stream():
+            return stream_limit_response(state.prediction_hub)
+        try:
+            events, cursor = state.prediction_hub.wait(since, machine_ids, timeout)
+        finally:
+            state.prediction_hub.close_stream()
+        return jsonify({
+            'cursor': cursor,
+            'events': [{'id': seq, 'machineId': m, **r} for seq, m, r in events]
+        }), 200
+
+    except Exception as e:
+        print(f"Error in /api/predictions/poll: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/machine-metrics/history', methods=['GET'])
+def machine_metrics_history():
+    """Historique d'une machine, lu sur le niveau le plus grossier adapté à la fenêtre."""
+    state = machine_state()
+    try:
+        machine_id = request.args.get('machineId')
+        window_seconds = request.args.get('seconds', default=3600, type=int)
+
+        if not machine_id:
+            return jsonify({'error': 'machineId parameter is required'}), 400
+        if not metrics_storage.timeseries_enabled():
+            return jsonify({'error': 'history requires METRICS_STORAGE_MODE=timeseries'}), 400
+
+        tier, points = metrics_storage.history(state.db, machine_id, window_seconds)
+        return jsonify({'machineId': machine_id, 'resolution': tier.name, 'points': points}), 200
+
+    except Exception as e:
+        print(f"Error in /api/machine-metrics/history: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/metric-store', methods=['GET'])
+def metric_store_usage():
+    """Mémoire occupée par les fenêtres glissantes, par machine."""
+    state = machine_state()
+    usage = state.metric_store.memory_usage()
+    return jsonify({
+        'windowSize': state.metric_store.window_size,
+        'maxMachines': state.metric_store.max_machines,
+        'evicted': state.metric_store.evicted,
+        'totalBytes': sum(m['bytes'] for m in usage.values()),
+        'machines': usage
+    }), 200
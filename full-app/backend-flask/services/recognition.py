@@ -0,0 +1,158 @@
+# services/recognition.py
+"""Reconnaissance par session : /api/start-recognition puis /api/verify-face image par image.
+
+La session garde l'embedding de référence de l'utilisateur et la position
+du dernier visage (point de départ de la détection suivante) ; elle rend
+sa décision dès que le nombre de votes consécutifs requis est atteint.
+"""
+import os
+
+from bson.objectid import ObjectId
+from flask import Blueprint, jsonify, request
+
+from inference_pool import InferenceBusy, InferenceTimeout, REDUCE_FACTORS
+from recognition_sessions import SessionStore, SessionLimitReached
+from services.extensions import get_extension, instrumentation
+from services.face_auth import FaceAuthState, busy_response, read_verify_request, resolve_face_image_path
+
+bp = Blueprint("recognition", __name__)
+
+MAX_VOTES = 10
+
+
+def create_session_store(app):
+    return SessionStore(
+        max_sessions=int(os.environ.get("RECOGNITION_MAX_SESSIONS", 100)),
+        ttl=float(os.environ.get("RECOGNITION_SESSION_TTL", 60))
+    )
+
+
+def init_app(app):
+    get_extension("face_auth", FaceAuthState, app)
+    get_extension("recognition_sessions", create_session_store, app)
+
+
+def sessions():
+    return get_extension("recognition_sessions", create_session_store)
+
+
+def face_auth():
+    return get_extension("face_auth", FaceAuthState)
+
+
+# =============================
+#   DÉMARRER UNE SESSION
+# =============================
+@bp.route('/api/start-recognition', methods=['POST'])
+def start_recognition():
+    """Ouvre une session pour {'user_id'} ; 'votes' et 'max_frames' sont optionnels."""
+    try:
+        data = request.get_json(silent=True) or {}
+        user_id = data.get('user_id')
+        votes = int(data.get('votes', os.environ.get("RECOGNITION_VOTES", 3)))
+        max_frames = int(data.get('max_frames', os.environ.get("RECOGNITION_MAX_FRAMES", 30)))
+
+        if not user_id:
+            return jsonify({'error': 'user_id is required'}), 400
+        if not 1 <= votes <= MAX_VOTES or max_frames < votes:
+            return jsonify({'error': f'votes must be between 1 and {MAX_VOTES}, max_frames at least votes'}), 400
+
+        # Utilisateur, photo et embedding de référence : une seule fois par session
+        with instrumentation().stage("mongo_lookup"):
+            user = face_auth().users_collection.find_one({"_id": ObjectId(user_id)}, {"faceIdPhoto": 1})
+        if not user or not user.get("faceIdPhoto"):
+            return jsonify({'error': 'Face image not found for user'}), 404
+
+        face_image_path = resolve_face_image_path(user)
+        if not os.path.exists(face_image_path):
+            return jsonify({'error': f'Image file not found at {face_image_path}'}), 404
+
+        try:
+            with instrumentation().stage("reference_embedding"):
+                reference_embedding = face_auth().embedding_store.get(user_id, face_image_path)
+        except (InferenceBusy, InferenceTimeout) as e:
+            return busy_response(e)
+
+        try:
+            session = sessions().create(user_id, reference_embedding, votes, max_frames)
+        except SessionLimitReached as e:
+            return busy_response(e)
+
+        instrumentation().count("recognition_sessions_total", event="started")
+        return jsonify({**session.to_dict(), 'expires_in': sessions().ttl}), 200
+
+    except Exception as e:
+        print(f"Error in /api/start-recognition: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+# =============================
+#   IMAGE D'UNE SESSION
+# =============================
+@bp.route('/api/verify-face', methods=['POST'])
+def verify_face_frame():
+    try:
+        with instrumentation().stage("read_request"):
+            session_id, frame_data, reduce = read_verify_request('session_id')
+
+        if not session_id or not frame_data:
+            return jsonify({'error': 'session_id and frame are required'}), 400
+        if reduce is not None and reduce not in REDUCE_FACTORS:
+            return jsonify({'error': f'reduce must be one of {list(REDUCE_FACTORS)}'}), 400
+
+        session = sessions().get(session_id)
+        if session is None:
+            return jsonify({'error': 'Unknown or expired session'}), 404
+
+        # Image précédente encore en cours : celle-ci est abandonnée plutôt que mise en file
+        if not session.lock.acquire(blocking=False):
+            instrumentation().count("recognition_frames_total", result="dropped")
+            return jsonify({'error': 'Previous frame still processing', **session.to_dict()}), 429
+        try:
+            if session.decision is not None:
+                return jsonify(session.to_dict()), 200
+
+            try:
+                with instrumentation().stage("inference"):
+                    result = face_auth().inference_pool.verify(
+                        frame_data, reduce, session.reference_embedding, session.roi
+                    )
+            except (InferenceBusy, InferenceTimeout) as e:
+                return busy_response(e, **session.to_dict())
+
+            for stage, seconds in result.get('timings', {}).items():
+                instrumentation().observe_stage(stage, seconds)
+            if result['status'] == 'undecodable':
+                return jsonify({'error': 'Unable to decode frame', **session.to_dict()}), 400
+
+            hinted = session.roi is not None
+            decision = session.record(result)
+            instrumentation().count("recognition_frames_total", result=result['status'], hinted=str(hinted).lower())
+        finally:
+            session.lock.release()
+
+        response = session.to_dict()
+        response['face_detected'] = result['status'] == 'ok'
+        if result['status'] == 'ok':
+            response['distance'] = result['distance']
+
+        if decision is not None:
+            instrumentation().count("recognition_sessions_total", event=decision)
+            face_auth().audit_writer.record(
+                session.user_id, decision == 'authenticated', ip=request.remote_addr,
+                method="face-session", frames=session.frames
+            )
+        return jsonify(response), 200
+
+    except Exception as e:
+        print(f"Error in /api/verify-face: {e}")
+        return jsonify({'error': str(e), 'authenticated': False}), 500
+
+
+@bp.route('/api/recognition/<session_id>', methods=['GET', 'DELETE'])
+def recognition_session(session_id):
+    """État d'une session (GET) ou fermeture anticipée (DELETE)."""
+    session = sessions().close(session_id) if request.method == 'DELETE' else sessions().get(session_id)
+    if session is None:
+        return jsonify({'error': 'Unknown or expired session'}), 404
+    return jsonify(session.to_dict()), 200
@@ -2,31 +2,46 @@ import requests
 import cv2
 import base64
 import json
+import sys
+
+# Usage : python test_recognition.py <user_id> [nombre d'images max]
+if len(sys.argv) < 2:
+    print("Usage : python test_recognition.py <user_id> [max_images]")
+    sys.exit(1)
+user_id = sys.argv[1]
+max_images = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+# Démarrer une session (l'embedding de référence est chargé une seule fois)
+response = requests.post('http://localhost:5000/api/start-recognition', json={'user_id': user_id})
+session_data = response.json()
+if 'session_id' not in session_data:
+    print(f"Impossible de démarrer la session : {session_data}")
+    sys.exit(1)
+session_id = session_data['session_id']
+
+print(f"Session ID: {session_id}")
 
-# Capturer une image de test
 cap = cv2.VideoCapture(0)
-ret, frame = cap.read()
-cap.release()
+result = session_data
+for _ in range(max_images):
+    ret, frame = cap.read()
+    if not ret:
+        print("Impossible de capturer une image")
+        break
 
-if ret:
     # Encoder l'image
     _, buffer = cv2.imencode('.jpg', frame)
     frame_base64 = base64.b64encode(buffer).decode('utf-8')
-    
-    # Démarrer une session
-    response = requests.post('http://localhost:5000/api/start-recognition')
-    session_data = response.json()
-    session_id = session_data['session_id']
-    
-    print(f"Session ID: {session_id}")
-    
-    # Tester la reconnaissance
+
+    # Envoyer l'image : la session répond dès que la décision est prise
     response = requests.post('http://localhost:5000/api/verify-face', json={
         'session_id': session_id,
         'frame': frame_base64
     })
-    
     result = response.json()
-    print(f"Result: {json.dumps(result, indent=2)}")
-else:
-    print("Impossible de capturer une image")
\ No newline at end of file
+    print(f"Image {result.get('frames')}: {result.get('status')} (votes {result.get('votes')}/{result.get('votes_required')})")
+    if result.get('status') in ('authenticated', 'rejected'):
+        break
+cap.release()
+
+print(f"Result: {json.dumps(result, indent=2)}")
@@ -0,0 +1,78 @@
+# tests/test_face_embeddings.py
+import os
+
+import numpy as np
+import pytest
+
+from face_embeddings import EmbeddingStore, cosine_distance
+
+
+class CountingEmbed:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, image_path):
+        self.calls.append(image_path)
+        return np.full(4, len(self.calls), dtype=np.float32)
+
+
+@pytest.fixture
+def photo(tmp_path):
+    path = tmp_path / "face.jpg"
+    path.write_bytes(b"jpeg")
+    return path
+
+
+def test_cache_hit_does_not_recompute(photo):
+    embed = CountingEmbed()
+    store = EmbeddingStore(embed=embed)
+    first = store.get("u1", str(photo))
+    assert store.get("u1", str(photo)) is first
+    assert len(embed.calls) == 1
+    assert len(store) == 1
+
+
+def test_rewritten_photo_is_reembedded(photo):
+    embed = CountingEmbed()
+    store = EmbeddingStore(embed=embed)
+    store.get("u1", str(photo))
+    # Même taille, mtime différent
+    stat = photo.stat()
+    os.utime(photo, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    store.get("u1", str(photo))
+    assert len(embed.calls) == 2
+
+
+def test_resized_photo_is_reembedded(photo):
+    embed = CountingEmbed()
+    store = EmbeddingStore(embed=embed)
+    store.get("u1", str(photo))
+    stat = photo.stat()
+    photo.write_bytes(b"a larger jpeg")
+    os.utime(photo, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    store.get("u1", str(photo))
+    assert len(embed.calls) == 2
+
+
+def test_invalidate_forces_recompute(photo):
+    embed = CountingEmbed()
+    store = EmbeddingStore(embed=embed)
+    store.get("u1", str(photo))
+    store.invalidate("u1")
+    assert len(store) == 0
+    store.get("u1", str(photo))
+    assert len(embed.calls) == 2
+
+
+def test_users_are_cached_separately(photo):
+    embed = CountingEmbed()
+    store = EmbeddingStore(embed=embed)
+    store.get("u1", str(photo))
+    store.get(2, str(photo))
+    assert store.get("2", str(photo))[0] == 2
+    assert len(embed.calls) == 2
+
+
+def test_cosine_distance():
+    assert cosine_distance(np.array([1.0, 0.0]), np.array([1.0, 0.0])) == pytest.approx(0.0)
+    assert cosine_distance(np.array([1.0, 0.0]), np.array([0.0, 1.0])) == pytest.approx(1.0)
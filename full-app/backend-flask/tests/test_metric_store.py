@@ -0,0 +1,117 @@
+# tests/test_metric_store.py
+from datetime import timedelta
+
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+
+from metric_store import MachineMetricStore, MetricsFollower, RollingWindow
+from metrics_storage import INGESTED_AT_FIELD, ingest_time
+
+
+def test_rolling_window_stats():
+    window = RollingWindow(size=3, alpha=0.5)
+    for value in (1, 2, 3, 4):
+        window.push(value)
+    assert window.count == 3
+    assert window.mean == pytest.approx(3.0)
+    assert (window.min, window.max) == (2.0, 4.0)
+    assert window.ewma == pytest.approx(3.125)
+
+
+def test_empty_window_stats():
+    assert RollingWindow().stats() == {"mean": None, "min": None, "max": None, "ewma": None, "count": 0}
+
+
+def test_ingest_ignores_reserved_and_non_numeric_fields():
+    store = MachineMetricStore(window_size=5)
+    store.ingest("m1", {"_id": 1, "machineId": "m1", "timestamp": 10, "cpu": 50, "charging": True, "name": "x"}, 10)
+    assert store.get("m1", "cpu")["mean"] == 50
+    assert store.get("m1", "charging") is None
+    assert store.get("m1", "timestamp") is None
+    assert store.latest_timestamp("m1") == 10
+
+
+def test_components_per_machine_are_capped():
+    store = MachineMetricStore(max_components=2)
+    store.ingest("m1", {"a": 1, "b": 2, "c": 3})
+    assert store.memory_usage()["m1"]["components"] == 2
+
+
+def test_least_recently_fed_machine_is_evicted():
+    store = MachineMetricStore(max_machines=2)
+    store.ingest("m1", {"cpu": 1}, 1)
+    store.ingest("m2", {"cpu": 1}, 2)
+    store.ingest("m1", {"cpu": 2}, 3)
+    store.ingest("m3", {"cpu": 1}, 4)
+    assert not store.has_machine("m2")
+    assert store.latest_timestamp("m2") is None
+    assert store.has_machine("m1") and store.has_machine("m3")
+    assert store.evicted == 1
+
+
+def test_rebuild_keeps_latest_window():
+    collection = mongomock.MongoClient().db.machineMetrics
+    collection.insert_many([{"machineId": "m1", "timestamp": t, "cpu": t} for t in range(10)])
+    store = MachineMetricStore(window_size=3)
+    assert store.rebuild(collection) == 1
+    assert store.get("m1", "cpu")["mean"] == pytest.approx(8.0)
+    assert store.latest_timestamp("m1") == 9
+
+
+
+def test_load_restores_evicted_machine():
+    collection = mongomock.MongoClient().db.machineMetrics
+    collection.insert_many([{"machineId": "m1", "timestamp": t, "cpu": t} for t in range(10)])
+    store = MachineMetricStore(window_size=3, max_machines=1)
+    store.ingest("m1", {"cpu": 100}, 100)
+    store.ingest("m2", {"cpu": 1}, 1)
+    assert not store.has_machine("m1")
+    assert store.load(collection, "m1")
+    assert store.get("m1", "cpu")["mean"] == pytest.approx(8.0)
+    assert not store.load(collection, "unknown")
+
+
+def test_load_keeps_windows_fed_concurrently():
+    collection = mongomock.MongoClient().db.machineMetrics
+    collection.insert_one({"machineId": "m1", "timestamp": 1, "cpu": 10})
+    store = MachineMetricStore()
+    store.ingest("m1", {"cpu": 50}, 2)
+    assert store.load(collection, "m1")
+    assert store.get("m1", "cpu")["count"] == 1
+
+
+def test_follower_applies_external_documents_once():
+    collection = mongomock.MongoClient().db.machineMetrics
+    applied = []
+    follower = MetricsFollower(collection, applied.append)
+
+    external = collection.insert_one({"machineId": "m1", "cpu": 10, INGESTED_AT_FIELD: ingest_time()}).inserted_id
+    local, local_at = ObjectId(), ingest_time()
+    follower.mark_local(local, local_at)
+    collection.insert_one({"_id": local, "machineId": "m1", "cpu": 20, INGESTED_AT_FIELD: local_at})
+
+    assert follower.poll() == 1
+    assert [doc["_id"] for doc in applied] == [external]
+    assert follower.poll() == 0
+    assert follower.applied == 1
+
+
+def test_follower_catches_slow_insert_behind_the_mark():
+    collection = mongomock.MongoClient().db.machineMetrics
+    applied = []
+    follower = MetricsFollower(collection, applied.append, lookback=30)
+    stamped = ingest_time()
+    collection.insert_one({"machineId": "m1", "cpu": 10, INGESTED_AT_FIELD: stamped + timedelta(seconds=10)})
+    assert follower.poll() == 1
+    # Lot horodaté avant le repère, visible seulement maintenant (insert_many lent)
+    collection.insert_one({"machineId": "m2", "cpu": 20, INGESTED_AT_FIELD: stamped + timedelta(seconds=1)})
+    assert follower.poll() == 1
+    assert [doc["machineId"] for doc in applied] == ["m1", "m2"]
+
+
+def test_follower_ignores_documents_from_before_start():
+    collection = mongomock.MongoClient().db.machineMetrics
+    collection.insert_one({"machineId": "m1", "cpu": 10, INGESTED_AT_FIELD: ingest_time() - timedelta(seconds=5)})
+    follower = MetricsFollower(collection, lambda doc: None)
+    assert follower.poll() == 0
@@ -0,0 +1,71 @@
+# tests/test_metrics_codec.py
+import pytest
+
+from metrics_codec import HEADER, MetricsDecoder, MetricsEncoder
+
+SAMPLE = {
+    "cpu": 12.5, "ram": 40.25, "disk": 70.0,
+    "bytesSent": 123456789, "bytesReceived": 987654321,
+    "bytesSentPerSec": 1500.5, "bytesReceivedPerSec": 3000.25,
+    "gpu": 5.0, "gpuMem": 20.0, "battery": 80.0, "charging": True,
+    "collectorMs": 3.25, "collectorCpuPercent": 0.5,
+    "bufferDepth": 0, "replayLagSeconds": 0.0,
+}
+
+
+def test_keyframe_round_trip():
+    payload = MetricsEncoder().encode(SAMPLE, timestamp=1000.0)
+    decoded = MetricsDecoder().decode(payload)
+    assert decoded == {**SAMPLE, "timestamp": 1000.0}
+
+
+def test_delta_carries_only_changed_fields():
+    encoder, decoder = MetricsEncoder(), MetricsDecoder()
+    decoder.decode(encoder.encode(SAMPLE, timestamp=1000.0))
+    changed = {**SAMPLE, "cpu": 13.0}
+    payload = encoder.encode(changed, timestamp=1001.0)
+    # En-tête + un seul float
+    assert len(payload) == HEADER.size + 4
+    assert decoder.decode(payload) == {**changed, "timestamp": 1001.0}
+
+
+def test_delta_after_lost_delta_still_decodes():
+    encoder, decoder = MetricsEncoder(), MetricsDecoder()
+    decoder.decode(encoder.encode(SAMPLE, timestamp=1000.0))
+    encoder.encode({**SAMPLE, "cpu": 13.0}, timestamp=1001.0)
+    later = {**SAMPLE, "ram": 41.0}
+    assert decoder.decode(encoder.encode(later, timestamp=1002.0)) == {**later, "timestamp": 1002.0}
+
+
+def test_delta_without_its_keyframe_is_dropped():
+    encoder = MetricsEncoder()
+    encoder.encode(SAMPLE, timestamp=1000.0)
+    decoder = MetricsDecoder()
+    assert decoder.decode(encoder.encode({**SAMPLE, "cpu": 13.0}, timestamp=1001.0)) is None
+
+
+def test_delta_against_previous_keyframe_is_dropped():
+    encoder, decoder = MetricsEncoder(keyframe_interval=2), MetricsDecoder()
+    decoder.decode(encoder.encode(SAMPLE, timestamp=1000.0))
+    encoder.encode(SAMPLE, timestamp=1001.0)
+    # Keyframe suivante perdue : ses deltas ne doivent pas s'appliquer à l'ancienne
+    encoder.encode(SAMPLE, timestamp=1002.0)
+    assert decoder.decode(encoder.encode({**SAMPLE, "cpu": 13.0}, timestamp=1003.0)) is None
+
+
+def test_reset_forces_a_keyframe():
+    encoder, decoder = MetricsEncoder(), MetricsDecoder()
+    encoder.encode(SAMPLE, timestamp=1000.0)
+    encoder.reset()
+    assert decoder.decode(encoder.encode(SAMPLE, timestamp=1001.0)) == {**SAMPLE, "timestamp": 1001.0}
+
+
+def test_json_payload_passes_through():
+    assert MetricsDecoder().decode(b'[{"cpu": 1}]') == [{"cpu": 1}]
+
+
+def test_unknown_version_is_rejected():
+    payload = bytearray(MetricsEncoder().encode(SAMPLE))
+    payload[1] = 99
+    with pytest.raises(ValueError):
+        MetricsDecoder().decode(bytes(payload))
@@ -0,0 +1,39 @@
+# tests/test_mqtt_bridge.py
+import mongomock
+import pytest
+
+from mqtt_bridge import MachineResolver, validate
+
+
+@pytest.fixture
+def machines():
+    return mongomock.MongoClient().db.machines
+
+
+def test_topic_resolves_to_machine_id(machines):
+    machine_id = machines.insert_one({"name": "pc", "mqttTopic": "system/metrics/rouzd-pc"}).inserted_id
+    resolve = MachineResolver(machines)
+    for topic in ("system/metrics/rouzd-pc", "system/metrics/rouzd-pc/replay"):
+        assert validate({"cpu": 1, "timestamp": 1.0}, topic, 1.0, resolve)["machineId"] == str(machine_id)
+
+
+def test_short_mqtt_topic_matches_last_segment(machines):
+    machine_id = machines.insert_one({"name": "pc", "mqttTopic": "rouzd-pc"}).inserted_id
+    doc = validate({"cpu": 1}, "system/metrics/rouzd-pc", 5.0, MachineResolver(machines))
+    assert doc["machineId"] == str(machine_id)
+    assert doc["timestamp"] == 5.0
+
+
+def test_unknown_topic_keeps_last_segment(machines):
+    assert validate({"cpu": 1}, "system/metrics/unknown", 1.0, MachineResolver(machines))["machineId"] == "unknown"
+
+
+def test_explicit_machine_id_wins(machines):
+    machines.insert_one({"name": "pc", "mqttTopic": "system/metrics/rouzd-pc"})
+    doc = validate({"machineId": "abc", "cpu": 1}, "system/metrics/rouzd-pc", 1.0, MachineResolver(machines))
+    assert doc["machineId"] == "abc"
+
+
+def test_invalid_samples_are_rejected():
+    assert validate([1, 2], "system/metrics/pc", 1.0) is None
+    assert validate({"cpu": 1, "timestamp": "now"}, "system/metrics/pc", 1.0) is None
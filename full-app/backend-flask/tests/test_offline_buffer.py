@@ -0,0 +1,119 @@
+# tests/test_offline_buffer.py
+import json
+
+from offline_buffer import OfflineBuffer, Replayer
+
+
+def test_peek_commit_in_order(tmp_path):
+    buffer = OfflineBuffer(str(tmp_path))
+    for i in range(5):
+        buffer.append({"seq": i})
+    samples, token = buffer.peek(3)
+    assert [s["seq"] for s in samples] == [0, 1, 2]
+    buffer.commit(token)
+    assert buffer.depth == 2
+    samples, _ = buffer.peek(10)
+    assert [s["seq"] for s in samples] == [3, 4]
+
+
+def test_peek_without_commit_replays_same_samples(tmp_path):
+    buffer = OfflineBuffer(str(tmp_path))
+    buffer.append({"seq": 0})
+    assert buffer.peek(1)[0] == buffer.peek(1)[0] == [{"seq": 0}]
+
+
+def test_cursor_survives_restart(tmp_path):
+    buffer = OfflineBuffer(str(tmp_path))
+    for i in range(4):
+        buffer.append({"seq": i})
+    buffer.commit(buffer.peek(2)[1])
+
+    reopened = OfflineBuffer(str(tmp_path))
+    assert reopened.depth == 2
+    assert [s["seq"] for s in reopened.peek(10)[0]] == [2, 3]
+
+
+def test_samples_span_segments(tmp_path):
+    buffer = OfflineBuffer(str(tmp_path), segment_bytes=64)
+    for i in range(20):
+        buffer.append({"seq": i})
+    samples, token = buffer.peek(20)
+    assert [s["seq"] for s in samples] == list(range(20))
+    buffer.commit(token)
+    assert buffer.depth == 0
+    # Les segments entièrement rejoués sont supprimés
+    assert len([n for n in tmp_path.iterdir() if n.name.startswith("segment-")]) == 1
+
+
+def test_oldest_segments_dropped_over_limit(tmp_path):
+    buffer = OfflineBuffer(str(tmp_path), max_bytes=256, segment_bytes=64)
+    for i in range(50):
+        buffer.append({"seq": i})
+    samples, _ = buffer.peek(100)
+    assert buffer.dropped > 0
+    assert buffer.depth == len(samples) == 50 - buffer.dropped
+    assert samples[-1]["seq"] == 49
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    buffer = OfflineBuffer(str(tmp_path))
+    buffer.append({"seq": 0})
+    buffer.append({"seq": 1})
+    segment = next(n for n in tmp_path.iterdir() if n.name.startswith("segment-"))
+    segment.write_bytes(segment.read_bytes()[:-3])
+
+    reopened = OfflineBuffer(str(tmp_path))
+    assert reopened.peek(10)[0] == [{"seq": 0}]
+    # Les ajouts suivants ne doivent pas se coller aux octets partiels
+    reopened.append({"seq": 2})
+    reopened.append({"seq": 3})
+    assert reopened.depth == 3
+    assert [s["seq"] for s in reopened.peek(10)[0]] == [0, 2, 3]
+
+
+def test_unreadable_record_is_skipped(tmp_path):
+    buffer = OfflineBuffer(str(tmp_path))
+    buffer.append({"seq": 0})
+    segment = next(n for n in tmp_path.iterdir() if n.name.startswith("segment-"))
+    with open(segment, "ab") as f:
+        f.write(b"\x03\x00\x00\x00{{{")
+
+    reopened = OfflineBuffer(str(tmp_path))
+    reopened.append({"seq": 1})
+    samples, token = reopened.peek(10)
+    assert [s["seq"] for s in samples] == [0, 1]
+    reopened.commit(token)
+    assert reopened.depth == 0
+    assert reopened.corrupted == 1
+
+
+def test_replay_lag(tmp_path):
+    buffer = OfflineBuffer(str(tmp_path))
+    assert buffer.replay_lag() == 0.0
+    buffer.append({"timestamp": 0})
+    assert buffer.replay_lag() > 0
+
+
+def test_replayer_publishes_on_replay_topic_and_commits(tmp_path):
+    class Info:
+        def wait_for_publish(self, timeout):
+            pass
+
+        def is_published(self):
+            return True
+
+    class Client:
+        def __init__(self):
+            self.published = []
+
+        def publish(self, topic, payload, qos):
+            self.published.append((topic, json.loads(payload)))
+            return Info()
+
+    buffer = OfflineBuffer(str(tmp_path))
+    buffer.append({"seq": 0})
+    client = Client()
+    replayer = Replayer(client, "system/metrics/pc", buffer, lambda: True)
+    replayer._replay_batch()
+    assert client.published == [("system/metrics/pc/replay", [{"seq": 0}])]
+    assert buffer.depth == 0 and replayer.replayed == 1
@@ -0,0 +1,74 @@
+# tests/test_prediction_cache.py
+import mongomock
+import pytest
+
+from prediction_cache import PredictionCache, PredictionWriter
+
+PREDICTIONS = [{"component": "cpu", "risk_percent": 12.0, "value": 40.0, "unit": "%", "message": "ok"}]
+
+
+def test_cache_hit_and_miss():
+    cache = PredictionCache()
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PredictionCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_cache_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("prediction_cache.time.monotonic", lambda: now[0])
+    cache = PredictionCache(ttl=10)
+    cache.put("a", 1)
+    now[0] += 11
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+@pytest.fixture
+def collections():
+    db = mongomock.MongoClient().db
+    machine_id = db.machines.insert_one({"name": "m1"}).inserted_id
+    return db.machines, db.predictions, machine_id
+
+
+def test_writer_skips_unchanged_results(collections):
+    machines, predictions, object_id = collections
+    writer = PredictionWriter(machines, predictions)
+    assert writer.submit(str(object_id), object_id, 88.0, PREDICTIONS)
+    assert not writer.submit(str(object_id), object_id, 88.0, PREDICTIONS)
+    assert predictions.count_documents({}) == 1
+    assert machines.find_one({"_id": object_id})["overallHealth"] == 88.0
+
+    changed = [{**PREDICTIONS[0], "risk_percent": 30.0}]
+    assert writer.submit(str(object_id), object_id, 70.0, changed)
+    assert predictions.count_documents({}) == 2
+
+
+def test_writer_rewrites_after_failed_write(collections):
+    machines, predictions, object_id = collections
+
+    class FailingOnce:
+        calls = 0
+
+        def insert_many(self, docs):
+            FailingOnce.calls += 1
+            if FailingOnce.calls == 1:
+                raise RuntimeError("mongo down")
+            return predictions.insert_many(docs)
+
+    writer = PredictionWriter(machines, FailingOnce())
+    with pytest.raises(RuntimeError):
+        writer.submit(str(object_id), object_id, 88.0, PREDICTIONS)
+    assert writer.submit(str(object_id), object_id, 88.0, PREDICTIONS)
+    assert predictions.count_documents({}) == 1
@@ -0,0 +1,76 @@
+# tests/test_prediction_stream.py
+import threading
+
+from prediction_stream import PredictionHub, sse_stream
+
+
+def result(risk, component="cpu"):
+    return {"overallHealth": 100 - risk, "predictions": [{"component": component, "risk_percent": risk}]}
+
+
+def test_publish_suppresses_small_changes():
+    hub = PredictionHub(delta=2.0)
+    assert hub.publish("m1", result(10))
+    assert not hub.publish("m1", result(11))
+    assert hub.publish("m1", result(13))
+    assert (hub.published, hub.suppressed) == (2, 1)
+    # Le dernier résultat est conservé même s'il n'est pas diffusé
+    hub.publish("m1", result(14))
+    assert hub.snapshot()["m1"] == result(14)
+
+
+def test_new_component_is_published():
+    hub = PredictionHub()
+    hub.publish("m1", result(10))
+    assert hub.publish("m1", {"predictions": [{"component": "ram", "risk_percent": 10}]})
+
+
+def test_wait_filters_by_machine():
+    hub = PredictionHub()
+    hub.publish("m1", result(10))
+    hub.publish("m2", result(10))
+    events, cursor = hub.wait(0, {"m2"}, timeout=0)
+    assert [event[1] for event in events] == ["m2"]
+    assert cursor == 2
+
+
+def test_wait_times_out_without_events():
+    hub = PredictionHub()
+    hub.publish("m1", result(10))
+    events, cursor = hub.wait(hub.cursor, timeout=0.01)
+    assert events == [] and cursor == 1
+
+
+def test_wait_wakes_on_publish():
+    hub = PredictionHub()
+    timer = threading.Timer(0.05, hub.publish, args=("m1", result(10)))
+    timer.start()
+    events, _ = hub.wait(0, timeout=5)
+    timer.join()
+    assert [event[1] for event in events] == ["m1"]
+
+
+def test_slow_client_skips_to_oldest_buffered_event():
+    hub = PredictionHub(history=2)
+    for risk in (10, 20, 30):
+        hub.publish("m1", result(risk))
+    events, _ = hub.wait(0, timeout=0)
+    assert [event[0] for event in events] == [2, 3]
+
+
+def test_stale_event_id_is_treated_as_new_client():
+    hub = PredictionHub()
+    hub.publish("m1", result(10))
+    assert hub.is_stale(500)
+    stream = sse_stream(hub, last_event_id=500)
+    assert next(stream).startswith("event: snapshot\n")
+    events, _ = hub.wait(500, timeout=0)
+    assert [event[0] for event in events] == [1]
+
+
+def test_stream_limit():
+    hub = PredictionHub(max_streams=1)
+    assert hub.open_stream()
+    assert not hub.open_stream()
+    hub.close_stream()
+    assert hub.open_stream()
@@ -0,0 +1,64 @@
+# tests/test_recognition_sessions.py
+import pytest
+
+from recognition_sessions import RecognitionSession, SessionLimitReached, SessionStore
+
+MATCH = {"status": "ok", "verified": True, "distance": 0.2, "roi": (1, 2, 3, 4)}
+MISMATCH = {"status": "ok", "verified": False, "distance": 0.8, "roi": (1, 2, 3, 4)}
+NO_FACE = {"status": "no_face"}
+
+
+def test_consecutive_matches_authenticate():
+    session = RecognitionSession("u1", None, votes_required=2)
+    assert session.record(MATCH) is None
+    assert session.roi == (1, 2, 3, 4)
+    assert session.record(MATCH) == "authenticated"
+    assert session.to_dict()["authenticated"]
+    assert session.best_distance == 0.2
+
+
+def test_mismatch_resets_votes():
+    session = RecognitionSession("u1", None, votes_required=2)
+    session.record(MATCH)
+    session.record(MISMATCH)
+    assert session.consecutive_matches == 0
+    assert session.record(MATCH) is None
+
+
+def test_consecutive_mismatches_reject():
+    session = RecognitionSession("u1", None, votes_required=2)
+    session.record(MISMATCH)
+    assert session.record(MISMATCH) == "rejected"
+
+
+def test_frames_without_face_do_not_vote_but_count_towards_limit():
+    session = RecognitionSession("u1", None, votes_required=2, max_frames=3)
+    session.record(MATCH)
+    assert session.record(NO_FACE) is None
+    assert session.roi is None
+    assert session.consecutive_matches == 1
+    assert session.record(NO_FACE) == "rejected"
+
+
+def test_store_limit_and_close():
+    store = SessionStore(max_sessions=1)
+    session = store.create("u1", None)
+    with pytest.raises(SessionLimitReached):
+        store.create("u2", None)
+    assert store.get(session.id) is session
+    assert store.close(session.id) is session
+    assert store.get(session.id) is None
+    store.create("u2", None)
+
+
+def test_store_expires_inactive_sessions(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("recognition_sessions.time.monotonic", lambda: now[0])
+    store = SessionStore(max_sessions=1, ttl=60)
+    session = store.create("u1", None)
+    now[0] += 30
+    assert store.get(session.id) is session
+    now[0] += 61
+    assert store.get(session.id) is None
+    assert store.expired == 1
+    store.create("u2", None)